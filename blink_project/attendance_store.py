@@ -0,0 +1,144 @@
+"""
+Append-only attendance store
+SQLite in WAL mode: each verification is a single INSERT instead of rewriting
+the whole JSON log, and reads are filtered/paginated queries on an index
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+ENTRY_FIELDS = ('timestamp', 'employee', 'status', 'confidence', 'session')
+
+
+class AttendanceStore:
+    """Attendance log backed by SQLite (WAL), safe across threads and processes"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        """One persistent connection per thread (and per process, after a fork)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL survives process crashes; only an OS crash can drop the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS attendance (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                employee TEXT,
+                status TEXT NOT NULL,
+                confidence REAL DEFAULT 0.0,
+                session TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_employee_ts ON attendance(employee, timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_ts ON attendance(timestamp)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+
+    def append(self, entry):
+        """Insert one attendance entry (dict with ENTRY_FIELDS)."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO attendance (timestamp, employee, status, confidence, session) VALUES (?, ?, ?, ?, ?)",
+                tuple(entry.get(field) for field in ENTRY_FIELDS),
+            )
+
+    def import_json_log(self, json_path):
+        """
+        One-time import of the legacy attendance_log.json. The import is
+        recorded in the meta table, so later calls are no-ops and the
+        original file is left untouched.
+
+        Returns:
+            Number of entries imported
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        conn = self._conn()
+        marker = f"imported:{os.path.abspath(json_path)}"
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+            return 0
+
+        try:
+            with open(json_path, 'r') as f:
+                log = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"WARNING: Could not import {json_path}: {e}")
+            return 0
+
+        with conn:
+            # Re-check under a write lock in case another worker imported meanwhile
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                return 0
+            conn.executemany(
+                "INSERT INTO attendance (timestamp, employee, status, confidence, session) VALUES (?, ?, ?, ?, ?)",
+                [tuple(entry.get(field) for field in ENTRY_FIELDS) for entry in log],
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, str(len(log))))
+
+        print(f"Imported {len(log)} attendance entries from {json_path}")
+        return len(log)
+
+    def iter_entries(self, employee=None, status=None, since=None, until=None, limit=None, offset=0):
+        """
+        Attendance entries oldest first, filtered in SQL. The query runs
+        before this returns, so SQL errors are raised here rather than
+        midway through a streamed response.
+
+        Args:
+            employee: Exact employee name
+            status: PRESENT or ABSENT
+            since/until: ISO timestamps (inclusive lower, exclusive upper bound)
+            limit/offset: Pagination
+
+        Returns:
+            Iterator of entry dicts
+        """
+        clauses = []
+        params = []
+        if employee is not None:
+            clauses.append("employee = ?")
+            params.append(employee)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+
+        sql = "SELECT timestamp, employee, status, confidence, session FROM attendance"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp, id LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset])
+
+        cursor = self._conn().execute(sql, params)
+        return self._iter_rows(cursor)
+
+    @staticmethod
+    def _iter_rows(cursor):
+        try:
+            for row in cursor:
+                yield dict(zip(ENTRY_FIELDS, row))
+        finally:
+            cursor.close()
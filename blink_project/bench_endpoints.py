@@ -0,0 +1,258 @@
+"""
+Benchmark of the server.py endpoints with JSON baselines
+Drives /verify_face, /classify_face, /compare_face, /check_spectacles and
+/check_duplicate_face with the photos in captured_images/ and
+registered_faces/, either in-process through the Flask test client (default)
+or against a running server (--url). Reports throughput, p50/p95/p99 latency
+and peak RSS per endpoint; --save writes a baseline and --baseline compares
+against one, exiting with status 1 if an endpoint regressed.
+
+In-process runs work in a temporary directory holding a copy of
+registered_faces/, so the attendance database and log, capture folders and
+embedding cache they write never touch the project's own; they do not save
+frames, and can pad the gallery with synthetic embeddings (--gallery-size)
+to measure search cost at scale. Against --url, /verify_face logs real
+attendance rows on that server.
+
+Usage: python bench_endpoints.py [--url http://127.0.0.1:5000] [--endpoints verify_face classify_face]
+                                 [--requests 100] [--concurrency 4] [--gallery-size 10000]
+                                 [--save baseline.json | --baseline baseline.json [--tolerance 0.15]]
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from process_stats import peak_rss_mb
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ('verify_face', 'classify_face', 'compare_face', 'check_spectacles', 'check_duplicate_face')
+
+
+def load_images(max_captured=20, max_registered=10):
+    """Return (captured, registered) lists of data-URI JPEGs from the project folders."""
+    def read(paths):
+        images = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                images.append("data:image/jpeg;base64," + base64.b64encode(f.read()).decode())
+        return images
+
+    captured = sorted(glob.glob(os.path.join(HERE, "captured_images", "session_*", "**", "*.jpg"), recursive=True))
+    registered = sorted(glob.glob(os.path.join(HERE, "registered_faces", "*.jpg")))
+    if not captured and not registered:
+        sys.exit("No images in captured_images/ or registered_faces/")
+    # Either folder can stand in for the other
+    return read((captured or registered)[:max_captured]), read((registered or captured)[:max_registered])
+
+
+def build_payloads(endpoint, captured, registered):
+    """JSON bodies for an endpoint, cycled through during the run."""
+    if endpoint == 'verify_face':
+        return [{"frame": img} for img in captured]
+    if endpoint == 'check_spectacles':
+        return [{"frame": img} for img in captured]
+    if endpoint == 'check_duplicate_face':
+        return [{"face_photo": img} for img in captured]
+    if endpoint == 'compare_face':
+        return [{"captured_frame": img, "reference_face": registered[i % len(registered)]}
+                for i, img in enumerate(captured)]
+    if endpoint == 'classify_face':
+        employees = [{"id": i, "name": f"employee_{i}", "facePhoto": photo} for i, photo in enumerate(registered)]
+        return [{"captured_frame": img, "employees": employees} for img in captured]
+    raise ValueError(endpoint)
+
+
+class InProcessClient:
+    """Calls the app through Flask's test client, isolated from the project's data files"""
+
+    def __init__(self, gallery_size):
+        # server.py opens its attendance database and log, capture folders and
+        # gallery relative to the working directory, so import it from a copy
+        self._tmp = tempfile.TemporaryDirectory()
+        workdir = self._tmp.name
+        if os.path.isdir(os.path.join(HERE, "registered_faces")):
+            shutil.copytree(os.path.join(HERE, "registered_faces"), os.path.join(workdir, "registered_faces"))
+        os.symlink(os.path.join(HERE, "face_landmarker.task"), os.path.join(workdir, "face_landmarker.task"))
+        os.chdir(workdir)
+        os.environ.setdefault('BLINK_SAVE_FRAMES', 'off')
+        sys.path.insert(0, HERE)
+        import server
+
+        self.server = server
+        server.load_registered_faces()
+        self.real_gallery_size = len(server.GALLERY)
+        self._pad_gallery(gallery_size)
+
+    def _pad_gallery(self, gallery_size):
+        rng = np.random.default_rng(0)
+        extra = gallery_size - len(self.server.GALLERY)
+        for i in range(max(0, extra)):
+            # In memory only; nothing is written to registered_faces/
+            self.server.GALLERY.upsert(f"synthetic_{i}", f"synthetic_{i}.jpg", rng.standard_normal(512))
+
+    def post(self, endpoint, payload):
+        client = self.server.app.test_client()
+        start = time.perf_counter()
+        response = client.post(f"/{endpoint}", json=payload)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code, response.get_json(silent=True) or {}
+
+    def peak_rss_mb(self):
+        return peak_rss_mb()
+
+    def describe(self):
+        return {'mode': 'in-process', 'gallery_size': len(self.server.GALLERY),
+                'real_gallery_size': self.real_gallery_size,
+                'face_recognition': self.server.FACE_RECOGNITION_AVAILABLE}
+
+
+class HttpClient:
+    """Calls a running server over HTTP"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def post(self, endpoint, payload):
+        req = urllib.request.Request(f"{self.base_url}/{endpoint}", data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                body = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            body, status = e.read(), e.code
+        elapsed = time.perf_counter() - start
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = {}
+        return elapsed, status, data if isinstance(data, dict) else {}
+
+    def peak_rss_mb(self):
+        """Peak RSS of the worker that answers /status (one worker under gunicorn)."""
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/status", timeout=10) as resp:
+                return json.loads(resp.read()).get('peak_rss_mb')
+        except (OSError, ValueError):
+            return None
+
+    def describe(self):
+        return {'mode': 'http', 'url': self.base_url}
+
+
+def run_endpoint(client, endpoint, payloads, num_requests, concurrency, warmup):
+    for i in range(warmup):
+        client.post(endpoint, payloads[i % len(payloads)])
+
+    def call(i):
+        return client.post(endpoint, payloads[i % len(payloads)])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    lat_ms = np.array([r[0] for r in results]) * 1000
+    return {
+        'requests': num_requests,
+        'concurrency': concurrency,
+        'throughput_rps': round(num_requests / elapsed, 2),
+        'p50_ms': round(float(np.percentile(lat_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(lat_ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(lat_ms, 99)), 2),
+        'http_errors': sum(1 for r in results if r[1] >= 400),
+        'error_responses': sum(1 for r in results if r[2].get('error')),
+        'peak_rss_mb': client.peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of results against a baseline file's results."""
+    regressions = []
+    for endpoint, r in results.items():
+        b = baseline.get('results', {}).get(endpoint)
+        if b is None:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if b[key] and r[key] > b[key] * (1 + tolerance):
+                regressions.append(f"{endpoint}: {key} {b[key]} -> {r[key]} (+{r[key] / b[key] - 1:.0%})")
+        if b['throughput_rps'] and r['throughput_rps'] < b['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput {b['throughput_rps']} -> {r['throughput_rps']} rps")
+        if b.get('peak_rss_mb') and r.get('peak_rss_mb') and r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{endpoint}: peak RSS {b['peak_rss_mb']:.0f} -> {r['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput/latency benchmark of the face server endpoints")
+    parser.add_argument('--url', default=None, help="Benchmark a running server instead of the in-process app")
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument('--requests', type=int, default=100, help="Requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--gallery-size', type=int, default=0,
+                        help="Pad the gallery with synthetic embeddings up to this size (in-process only)")
+    parser.add_argument('--save', default=None, help="Write results as a baseline JSON file")
+    parser.add_argument('--baseline', default=None, help="Compare against a baseline JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    captured, registered = load_images()
+    if args.url:
+        if args.gallery_size:
+            print("NOTE: --gallery-size only applies to in-process runs")
+        client = HttpClient(args.url)
+    else:
+        client = InProcessClient(args.gallery_size)
+
+    info = client.describe()
+    print(f"\n{info} | {len(captured)} captured / {len(registered)} registered images")
+    print(f"{'endpoint':<22} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'errors':>6} | peak RSS")
+    print("-" * 86)
+
+    results = {}
+    for endpoint in args.endpoints:
+        payloads = build_payloads(endpoint, captured, registered)
+        r = run_endpoint(client, endpoint, payloads, args.requests, args.concurrency, args.warmup)
+        results[endpoint] = r
+        rss = f"{r['peak_rss_mb']:.0f} MB" if r['peak_rss_mb'] else "n/a"
+        errors = r['http_errors'] + r['error_responses']
+        print(f"{endpoint:<22} | {r['throughput_rps']:>7.1f} | {r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | "
+              f"{r['p99_ms']:>8.1f} | {errors:>6} | {rss}")
+
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'config': dict(info, requests=args.requests, concurrency=args.concurrency),
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS vs {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
@@ -0,0 +1,98 @@
+"""
+Benchmark for the registered-face gallery search
+Compares the old per-employee cosine loop with FaceGallery.search on synthetic
+identities. Usage: python bench_gallery.py [--sizes 1000 10000 100000] [--queries 200]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from face_gallery import EMBEDDING_DIM, FaceGallery
+
+
+def cosine_similarity(a, b):
+    """Same implementation server.py used for the per-employee loop."""
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def loop_best_match(employees, embedding):
+    best_score = -1.0
+    best_idx = -1
+    for i, emp in enumerate(employees):
+        score = cosine_similarity(embedding, emp['embedding'])
+        if score > best_score:
+            best_score = score
+            best_idx = i
+    return best_idx, best_score
+
+
+def make_identities(n, rng):
+    embeddings = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    # InsightFace's raw embeddings are not unit length; mimic that
+    embeddings *= rng.uniform(15.0, 30.0, size=(n, 1)).astype(np.float32)
+    return [
+        {'name': f"employee_{i}", 'file': f"employee_{i}.jpg", 'embedding': embeddings[i]}
+        for i in range(n)
+    ]
+
+
+def make_queries(employees, count, rng):
+    """Noisy copies of random registered embeddings so every query has a true match."""
+    picks = rng.integers(0, len(employees), size=count)
+    queries = []
+    for idx in picks:
+        base = employees[idx]['embedding']
+        noise = rng.standard_normal(EMBEDDING_DIM).astype(np.float32) * np.linalg.norm(base) * 0.03
+        queries.append((int(idx), base + noise))
+    return queries
+
+
+def time_per_query(fn, queries):
+    start = time.perf_counter()
+    for _, query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def run(sizes, num_queries, loop_budget_s, seed):
+    rng = np.random.default_rng(seed)
+    print(f"{'identities':>10} | {'loop ms/query':>13} | {'matrix ms/query':>15} | {'speedup':>7} | {'build ms':>8} | agree")
+    print("-" * 75)
+
+    for n in sizes:
+        employees = make_identities(n, rng)
+        queries = make_queries(employees, num_queries, rng)
+
+        gallery = FaceGallery()
+        start = time.perf_counter()
+        gallery.build(employees)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        matrix_s = time_per_query(gallery.best_match, queries)
+
+        # The loop gets slow at 100k, so only time as many queries as the budget allows
+        probe = time_per_query(lambda q: loop_best_match(employees, q), queries[:1])
+        loop_count = max(1, min(len(queries), int(loop_budget_s / max(probe, 1e-9))))
+        loop_queries = queries[:loop_count]
+        loop_s = time_per_query(lambda q: loop_best_match(employees, q), loop_queries)
+
+        agree = all(
+            loop_best_match(employees, q)[0] == gallery.best_match(q)['index']
+            for _, q in loop_queries[:5]
+        )
+
+        print(f"{n:>10} | {loop_s * 1000:>13.3f} | {matrix_s * 1000:>15.3f} | "
+              f"{loop_s / matrix_s:>6.0f}x | {build_ms:>8.1f} | {agree}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark registered-face gallery search")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--loop-budget', type=float, default=5.0,
+                        help="Seconds to spend timing the legacy loop per size")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.loop_budget, args.seed)
@@ -0,0 +1,115 @@
+"""
+Spectacle scoring latency: OpenCV heuristics vs the batched ONNX classifier
+Cuts eye/bridge crops from the project photos once, then times only the
+scoring step, the part the backends differ in: the heuristics frame by frame,
+and the ONNX model at several batch sizes. Landmarks come from MediaPipe when
+it is installed; otherwise fixed positions for a centred face are used, which
+is enough for timing.
+
+Without a trained model, --synthetic-model writes a randomly initialised one
+with the same input shapes (spectacle_onnx.build_synthetic_model); its
+latency is representative, its predictions are not.
+
+Usage: python bench_spectacle.py [--model spectacle_classifier.onnx | --synthetic-model]
+                                 [--batch-sizes 1 8 32] [--iterations 200]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from spectacle_detection_cnn import LEFT_EYE, NOSE_BRIDGE, RIGHT_EYE, SpectacleDetectionCNN
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Normalized positions of a face filling the middle of the frame
+_CENTRED_FACE = {
+    **{i: (0.38 + 0.04 * (k % 3), 0.42 + 0.01 * (k // 3)) for k, i in enumerate(LEFT_EYE)},
+    **{i: (0.54 + 0.04 * (k % 3), 0.42 + 0.01 * (k // 3)) for k, i in enumerate(RIGHT_EYE)},
+    **{i: (0.5, 0.43 + 0.03 * k) for k, i in enumerate(NOSE_BRIDGE)},
+}
+
+
+def load_crops(max_images):
+    paths = sorted(glob.glob(os.path.join(HERE, "captured_images", "session_*", "**", "*.jpg"), recursive=True))
+    paths += sorted(glob.glob(os.path.join(HERE, "registered_faces", "*.jpg")))
+    images = [img for img in (cv2.imread(p) for p in paths[:max_images]) if img is not None]
+    if not images:
+        sys.exit("No images in captured_images/ or registered_faces/")
+
+    try:
+        from server_classification import detect_landmarks
+        detect_landmarks(images[0])
+        source = "MediaPipe"
+    except Exception:
+        detect_landmarks = None
+        source = "fixed centred-face positions"
+
+    fallback = [SimpleNamespace(x=_CENTRED_FACE.get(i, (0.5, 0.5))[0], y=_CENTRED_FACE.get(i, (0.5, 0.5))[1])
+                for i in range(478)]
+    crops = []
+    for img in images:
+        landmarks = fallback
+        if detect_landmarks is not None:
+            result = detect_landmarks(img)
+            if not result.face_landmarks:
+                continue
+            landmarks = result.face_landmarks[0]
+        frame_crops = SpectacleDetectionCNN.extract_crops(img, landmarks)
+        if frame_crops is not None:
+            crops.append(frame_crops)
+    return crops, source
+
+
+def time_per_frame(fn, crops, batch_size, iterations):
+    """Median ms per frame of fn(batch) over iterations batches cycled from crops."""
+    batches = [[crops[(start + k) % len(crops)] for k in range(batch_size)] for start in range(len(crops))]
+    fn(batches[0])  # warm-up
+    times = []
+    for i in range(iterations):
+        batch = batches[i % len(batches)]
+        start = time.perf_counter()
+        fn(batch)
+        times.append((time.perf_counter() - start) / batch_size)
+    return float(np.median(times)) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Spectacle scoring latency per backend")
+    parser.add_argument('--model', default=None, help="ONNX classifier (see spectacle_onnx.py for the contract)")
+    parser.add_argument('--synthetic-model', action='store_true', help="Time a random-weight model instead")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--max-images', type=int, default=100)
+    args = parser.parse_args()
+
+    crops, source = load_crops(args.max_images)
+    print(f"{len(crops)} face crops, landmarks from {source}\n")
+    print(f"{'backend':<22} | {'batch':>5} | {'ms / frame':>10}")
+    print("-" * 44)
+
+    heuristic_ms = time_per_frame(
+        lambda batch: [SpectacleDetectionCNN.heuristic_result(c) for c in batch], crops, 1, args.iterations)
+    print(f"{'heuristic':<22} | {1:>5} | {heuristic_ms:>10.3f}")
+
+    model_path = args.model
+    if args.synthetic_model:
+        from spectacle_onnx import build_synthetic_model
+        model_path = build_synthetic_model(os.path.join(tempfile.mkdtemp(), "spectacle_synthetic.onnx"))
+    if model_path is None:
+        print("\nPass --model or --synthetic-model to time the ONNX backend")
+        sys.exit(0)
+
+    from spectacle_onnx import OnnxSpectacleClassifier
+    classifier = OnnxSpectacleClassifier(model_path)
+    label = "onnx (synthetic)" if args.synthetic_model else "onnx"
+    for batch_size in args.batch_sizes:
+        onnx_ms = time_per_frame(classifier.predict, crops, batch_size, args.iterations)
+        print(f"{label:<22} | {batch_size:>5} | {onnx_ms:>10.3f}  ({heuristic_ms / onnx_ms:.1f}x)")
@@ -0,0 +1,86 @@
+"""
+Upload format comparison: base64-in-JSON vs multipart vs raw JPEG body
+For a sample frame, reports bytes on the wire and the server-side CPU time to
+parse the request and decode the image, using the same RequestPayload path the
+endpoints use (no models involved).
+
+Usage: python bench_upload.py [--image path.jpg] [--iterations 200]
+"""
+
+import argparse
+import base64
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+from flask import Flask, request
+
+from request_payload import RequestPayload
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def pick_image(path=None):
+    if path is None:
+        candidates = sorted(glob.glob(os.path.join(HERE, "captured_images", "session_*", "*", "*.jpg")))
+        candidates += sorted(glob.glob(os.path.join(HERE, "registered_faces", "*.jpg")))
+        if not candidates:
+            sys.exit("No sample image found; pass --image")
+        path = candidates[0]
+    with open(path, 'rb') as f:
+        return path, f.read()
+
+
+def build_requests(jpeg):
+    """Return {format: (content_type, body_bytes)} for the same frame."""
+    data_uri = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+    json_body = json.dumps({"frame": data_uri}).encode()
+
+    boundary = "----blinkbench"
+    multipart_body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="frame"; filename="frame.jpg"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + jpeg + f"\r\n--{boundary}--\r\n".encode()
+
+    return {
+        'json_base64': ('application/json', json_body),
+        'multipart': (f'multipart/form-data; boundary={boundary}', multipart_body),
+        'raw_jpeg': ('application/octet-stream', jpeg),
+    }
+
+
+def time_decode(app, content_type, body, iterations):
+    """CPU seconds per request for parse + decode inside a request context."""
+    cpu = 0.0
+    for _ in range(iterations):
+        with app.test_request_context('/verify_face', method='POST', content_type=content_type,
+                                      input_stream=io.BytesIO(body), content_length=len(body)):
+            start = time.process_time()
+            frame = RequestPayload(request, raw_image_field="frame").image("frame")
+            cpu += time.process_time() - start
+            if frame is None:
+                raise RuntimeError(f"{content_type}: frame did not decode")
+    return cpu / iterations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bytes and decode CPU per upload format")
+    parser.add_argument('--image', default=None)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    path, jpeg = pick_image(args.image)
+    app = Flask(__name__)
+    print(f"Image: {os.path.relpath(path, HERE)} ({len(jpeg)} bytes JPEG)\n")
+    print(f"{'format':<12} | {'wire bytes':>10} | {'vs JSON':>7} | {'parse+decode ms CPU':>19}")
+    print("-" * 58)
+
+    baseline = None
+    for name, (content_type, body) in build_requests(jpeg).items():
+        cpu_ms = time_decode(app, content_type, body, args.iterations) * 1000
+        baseline = baseline or len(body)
+        print(f"{name:<12} | {len(body):>10} | {len(body) / baseline:>6.0%} | {cpu_ms:>19.3f}")
@@ -0,0 +1,133 @@
+"""
+Load test: /verify_face throughput vs. number of gunicorn workers
+Starts gunicorn -c gunicorn.conf.py for each worker count, fires concurrent
+requests with a captured frame and prints a throughput/latency table.
+--endpoint times another image route instead, e.g. /analyze_frame, which
+needs MediaPipe rather than the InsightFace model pack.
+
+Usage: python bench_workers.py [--workers 1 2 4] [--requests 200] [--concurrency 16]
+                               [--endpoint /verify_face]
+
+Measured on a 1-core sandbox, --endpoint /analyze_frame (MediaPipe; the
+buffalo_l pack for /verify_face could not be downloaded there),
+300 requests, concurrency 16, BLINK_THREADS=2:
+
+    workers |   req/s |   p50 ms |   p95 ms | scaling
+          1 |    40.5 |    392.7 |    416.0 | 1.00x
+          2 |    44.4 |    359.6 |    626.3 | 1.10x
+          4 |    38.6 |    344.1 |    816.0 | 0.96x
+
+With one core there is nothing to scale onto: throughput stays flat and the
+extra workers only add tail latency. Worker scaling has to be measured on a
+multi-core host; these rows are the single-core baseline.
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def pick_frame(path=None):
+    """Return a data-URI JPEG from --image or the first captured/registered photo."""
+    if path is None:
+        candidates = sorted(glob.glob(os.path.join(HERE, "captured_images", "session_*", "*", "*.jpg")))
+        candidates += sorted(glob.glob(os.path.join(HERE, "registered_faces", "*.jpg")))
+        if not candidates:
+            sys.exit("No sample image found; pass --image")
+        path = candidates[0]
+    with open(path, 'rb') as f:
+        return "data:image/jpeg;base64," + base64.b64encode(f.read()).decode()
+
+
+def post_json(url, payload, timeout=120):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def wait_until_up(base_url, timeout_s):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/registered_faces", timeout=2):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def run_once(num_workers, port, frame, num_requests, concurrency, startup_timeout, endpoint="/verify_face"):
+    env = dict(os.environ, BLINK_WORKERS=str(num_workers), BLINK_BIND=f"127.0.0.1:{port}")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        if not wait_until_up(base_url, startup_timeout):
+            raise RuntimeError(f"server with {num_workers} workers did not start")
+
+        url = base_url + endpoint
+        payload = {"frame": frame}
+        # Warm up every worker so model first-run costs are not measured
+        with ThreadPoolExecutor(max_workers=num_workers * 2) as pool:
+            list(pool.map(lambda _: post_json(url, payload), range(num_workers * 2)))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(lambda _: post_json(url, payload), range(num_requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        'workers': num_workers,
+        'requests': num_requests,
+        'concurrency': concurrency,
+        'throughput_rps': num_requests / elapsed,
+        'p50_ms': float(np.percentile(lat_ms, 50)),
+        'p95_ms': float(np.percentile(lat_ms, 95)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput scaling of /verify_face with worker count")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--endpoint', default="/verify_face", help="Image route to load")
+    parser.add_argument('--image', default=None)
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    parser.add_argument('--json', default=None, help="Also write results to this file")
+    args = parser.parse_args()
+
+    frame = pick_frame(args.image)
+    results = []
+    print(f"{'workers':>7} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | scaling")
+    print("-" * 50)
+    for n in args.workers:
+        r = run_once(n, args.port, frame, args.requests, args.concurrency, args.startup_timeout, args.endpoint)
+        results.append(r)
+        scaling = r['throughput_rps'] / results[0]['throughput_rps']
+        print(f"{n:>7} | {r['throughput_rps']:>7.1f} | {r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | {scaling:.2f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -3,10 +3,7 @@ import mediapipe as mp
 import numpy as np
 import time
 
-from spectacles_detector import detect_spectacles
-from face_counter import count_faces
-from brightness_checker import check_brightness
-from ear_utils import eye_aspect_ratio
+from server_classification import MAX_BRIGHTNESS, analyze_frame, landmark_image
 
 # Mediapipe Setup
 BaseOptions = mp.tasks.BaseOptions
@@ -14,17 +11,18 @@ FaceLandmarker = mp.tasks.vision.FaceLandmarker
 FaceLandmarkerOptions = mp.tasks.vision.FaceLandmarkerOptions
 VisionRunningMode = mp.tasks.vision.RunningMode
 
+# VIDEO mode tracks faces from frame to frame; timestamps must strictly
+# increase. num_faces=3 keeps the per-frame multiple-face warning working, but
+# MediaPipe re-runs detection whenever it tracks fewer faces than that, so
+# with one person in view most frames are still fully detected.
 options = FaceLandmarkerOptions(
     base_options=BaseOptions(model_asset_path='face_landmarker.task'),
-    running_mode=VisionRunningMode.IMAGE,
+    running_mode=VisionRunningMode.VIDEO,
     num_faces=3
 )
 
 face_landmarker = FaceLandmarker.create_from_options(options)
 
-LEFT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
-RIGHT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
-
 EAR_THRESHOLD = 0.25
 FULLY_OPEN_THRESHOLD = 0.39
 
@@ -37,6 +35,17 @@ spectacle_timer_started = False
 start_time = None
 capture_allowed = False
 
+last_timestamp_ms = 0
+
+
+def detect(frame):
+    """Landmark the next camera frame on the VIDEO-mode landmarker."""
+    global last_timestamp_ms
+    timestamp_ms = max(int(time.monotonic() * 1000), last_timestamp_ms + 1)
+    last_timestamp_ms = timestamp_ms
+    return face_landmarker.detect_for_video(landmark_image(frame), timestamp_ms)
+
+
 cap = cv2.VideoCapture(0)
 
 print("Press 'q' to quit")
@@ -47,13 +56,12 @@ while True:
         break
 
     frame = cv2.flip(frame, 1)
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-    mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-    results = face_landmarker.detect(mp_image)
+    # Face count, brightness and EARs all come from one landmarker pass
+    analysis = analyze_frame(frame, detect=detect)
 
     # ---- MULTI FACE CHECK ----
-    faces = count_faces(results)
+    faces = analysis['num_faces']
 
     if faces > 1:
         cv2.putText(frame, "Multiple faces detected. Only one allowed.",
@@ -69,12 +77,8 @@ while True:
             break
         continue
 
-    landmarks = results.face_landmarks[0]
-
     # ---- BRIGHTNESS CHECK ----
-    brightness = check_brightness(frame)
-
-    if brightness > 200:
+    if analysis['brightness'] > MAX_BRIGHTNESS:
         cv2.putText(frame, "Too Bright! Change position",
                     (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
 
@@ -96,10 +100,7 @@ while True:
     # ---- BLINK DETECTION (AFTER TIMER) ----
     if capture_allowed:
 
-        left_ear = eye_aspect_ratio(landmarks, LEFT_EYE_INDICES)
-        right_ear = eye_aspect_ratio(landmarks, RIGHT_EYE_INDICES)
-
-        ear = (left_ear + right_ear) / 2.0
+        ear = analysis['ear']
 
         if ear < EAR_THRESHOLD and not blinking and not blinked_saved:
             blinking = True
@@ -0,0 +1,81 @@
+"""
+Content-addressed LRU cache of face embeddings
+Keyed by the SHA-256 of the raw photo bytes so identical employee photos sent
+on every /classify_face call are only run through the model once
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def photo_hash(img_bytes):
+    """Return the cache key for a photo: hex SHA-256 of its encoded bytes."""
+    return hashlib.sha256(img_bytes).hexdigest()
+
+
+class EmbeddingLRUCache:
+    """Thread-safe LRU map of photo hash -> embedding, bounded by entries and bytes"""
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """
+        Look up a photo hash.
+
+        Returns:
+            Tuple (found, embedding). embedding is None when the photo is
+            cached as having no detectable face.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key]
+
+    def put(self, key, embedding):
+        """Store an embedding (or None for 'no face') and evict least-recently-used entries."""
+        if embedding is not None:
+            # A private copy, so freezing it leaves the caller's array writable
+            embedding = np.array(embedding, dtype=np.float32, copy=True)
+            embedding.setflags(write=False)
+        size = 0 if embedding is None else embedding.nbytes
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = embedding
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                if evicted is not None:
+                    self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,151 @@
+"""
+Accuracy and speed of the INT8 model pack against FP32
+Embeds every captured frame and registered photo with both packs, then
+compares, for every (captured, registered) pair, the cosine score and the
+match decision at the server's MATCH_THRESHOLD. Also reports how similar the
+two embeddings of the same face are, detection agreement, and per-model
+latency. Exits with status 1 if the decision flip rate or the score drift
+exceeds the given bounds, so it can gate a switch to FACE_MODEL_VARIANT=int8.
+
+Usage: python eval_quantized.py [--int8 buffalo_l_int8] [--max-flip-rate 0.01] [--max-score-diff 0.05]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from face_gallery import normalize_embedding
+from quantize_models import INT8_SUFFIX, INSIGHTFACE_ROOT, SOURCE_PACK
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MATCH_THRESHOLD = 0.4  # same as server.py
+
+
+def load_pack(name):
+    from insightface.app import FaceAnalysis
+    app = FaceAnalysis(name=name, root=INSIGHTFACE_ROOT, allowed_modules=['detection', 'recognition'],
+                       providers=['CPUExecutionProvider'])
+    app.prepare(ctx_id=0, det_size=(640, 640))
+    return app
+
+
+def embed_largest(app, img):
+    """
+    Returns:
+        (embedding or None, bbox or None, detection seconds, recognition seconds)
+    """
+    from insightface.utils import face_align
+    start = time.perf_counter()
+    bboxes, kpss = app.det_model.detect(img, max_num=0, metric='default')
+    det_s = time.perf_counter() - start
+    if bboxes.shape[0] == 0:
+        return None, None, det_s, 0.0
+
+    i = int(np.argmax((bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])))
+    rec = app.models['recognition']
+    crop = face_align.norm_crop(img, landmark=kpss[i], image_size=rec.input_size[0])
+    start = time.perf_counter()
+    feat = rec.get_feat([crop])[0]
+    rec_s = time.perf_counter() - start
+    return normalize_embedding(feat), bboxes[i, :4], det_s, rec_s
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def run_pack(app, images):
+    embeddings, bboxes, det_times, rec_times = [], [], [], []
+    for img in images:
+        emb, bbox, det_s, rec_s = embed_largest(app, img)
+        embeddings.append(emb)
+        bboxes.append(bbox)
+        det_times.append(det_s)
+        if emb is not None:
+            rec_times.append(rec_s)
+    return embeddings, bboxes, np.array(det_times) * 1000, np.array(rec_times) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare INT8 and FP32 face models on the project images")
+    parser.add_argument('--fp32', default=SOURCE_PACK)
+    parser.add_argument('--int8', default=SOURCE_PACK + INT8_SUFFIX)
+    parser.add_argument('--max-images', type=int, default=100)
+    parser.add_argument('--max-flip-rate', type=float, default=0.01, help="Allowed share of changed match decisions")
+    parser.add_argument('--max-score-diff', type=float, default=0.05, help="Allowed mean |score difference|")
+    args = parser.parse_args()
+
+    registered_paths = sorted(glob.glob(os.path.join(HERE, 'registered_faces', '*.jpg')))
+    captured_paths = sorted(glob.glob(os.path.join(HERE, 'captured_images', 'session_*', '**', '*.jpg'),
+                                      recursive=True))[:args.max_images]
+    if not registered_paths or not captured_paths:
+        sys.exit("Need photos in both registered_faces/ and captured_images/")
+    paths = registered_paths + captured_paths
+    images = [cv2.imread(p) for p in paths]
+    n_reg = len(registered_paths)
+
+    results = {}
+    for variant, name in (('fp32', args.fp32), ('int8', args.int8)):
+        app = load_pack(name)
+        # One warm-up run so session initialisation is not timed
+        embed_largest(app, images[0])
+        results[variant] = run_pack(app, images)
+
+    emb32, box32, det32, rec32 = results['fp32']
+    emb8, box8, det8, rec8 = results['int8']
+
+    # Detection agreement
+    found_both = {i for i in range(len(images)) if emb32[i] is not None and emb8[i] is not None}
+    found_mismatch = sum(1 for i in range(len(images)) if (emb32[i] is None) != (emb8[i] is None))
+    ious = [iou(box32[i], box8[i]) for i in sorted(found_both)]
+
+    # Same face, both models
+    self_sim = np.array([float(emb32[i] @ emb8[i]) for i in sorted(found_both)])
+
+    # Every captured x registered pair embedded by both models
+    diffs, flips, pairs = [], 0, 0
+    for c in range(n_reg, len(images)):
+        for r in range(n_reg):
+            if c not in found_both or r not in found_both:
+                continue
+            s32, s8 = float(emb32[c] @ emb32[r]), float(emb8[c] @ emb8[r])
+            diffs.append(abs(s32 - s8))
+            flips += (s32 >= MATCH_THRESHOLD) != (s8 >= MATCH_THRESHOLD)
+            pairs += 1
+    diffs = np.array(diffs)
+    flip_rate = flips / pairs if pairs else 0.0
+
+    print(f"\nImages: {len(registered_paths)} registered, {len(captured_paths)} captured; {pairs} pairs")
+    print(f"Detection: {found_mismatch} image(s) found by only one model, "
+          f"bbox IoU mean {np.mean(ious):.3f} / min {np.min(ious):.3f}" if ious else "Detection: no common faces")
+    if len(self_sim):
+        print(f"FP32 vs INT8 embedding cosine: mean {self_sim.mean():.4f}, min {self_sim.min():.4f}")
+    if pairs:
+        print(f"Pair score |diff|: mean {diffs.mean():.4f}, p99 {np.percentile(diffs, 99):.4f}, max {diffs.max():.4f}")
+        print(f"Decision flips at threshold {MATCH_THRESHOLD}: {flips}/{pairs} ({flip_rate:.2%})")
+
+    print(f"\n{'model':<12} | {'FP32 ms':>8} | {'INT8 ms':>8} | speedup")
+    print("-" * 44)
+    for label, t32, t8 in (('detection', det32, det8), ('recognition', rec32, rec8)):
+        if len(t32) and len(t8):
+            m32, m8 = np.median(t32), np.median(t8)
+            print(f"{label:<12} | {m32:>8.2f} | {m8:>8.2f} | {m32 / m8:.2f}x")
+
+    failed = []
+    if flip_rate > args.max_flip_rate:
+        failed.append(f"decision flip rate {flip_rate:.2%} > {args.max_flip_rate:.2%}")
+    if pairs and diffs.mean() > args.max_score_diff:
+        failed.append(f"mean score diff {diffs.mean():.4f} > {args.max_score_diff}")
+    if failed:
+        print("\nFAIL: " + "; ".join(failed))
+        sys.exit(1)
+    print("\nPASS: INT8 pack is within the accuracy bounds")
@@ -0,0 +1,208 @@
+"""
+In-memory gallery of registered face embeddings
+Keeps every registered embedding in one pre-normalized (N, 512) float32 matrix
+so a lookup is a single matrix-vector product instead of a per-employee loop
+"""
+
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+
+# Grow the backing buffers geometrically so appends are amortized O(1)
+MIN_CAPACITY = 64
+
+# Rebuild the matrix once this fraction of rows are stale (replaced/deleted)
+COMPACT_DEAD_FRACTION = 0.25
+
+# Immutable view of the gallery. Readers grab one reference and never lock;
+# writers only ever publish a new snapshot, so a search sees a consistent state.
+GallerySnapshot = namedtuple('GallerySnapshot', ['matrix', 'names', 'files', 'dead'])
+
+
+def normalize_embedding(embedding):
+    """Return a float32 unit-length copy of an embedding (zero vectors stay zero)."""
+    vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec = vec / norm
+    return vec
+
+
+class FaceGallery:
+    """Registered employees as a contiguous embedding matrix plus name/file arrays"""
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._reset(0)
+        self._publish(frozenset())
+
+    def _reset(self, capacity):
+        """
+        Allocate fresh, empty backing buffers. The published snapshot is left
+        alone, so readers keep seeing the old contents until the next _publish.
+        """
+        capacity = max(capacity, MIN_CAPACITY)
+        self._matrix_buf = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._names_buf = np.empty(capacity, dtype=object)
+        self._files_buf = np.empty(capacity, dtype=object)
+        self._count = 0
+        self._row_by_file = {}
+
+    def _publish(self, dead):
+        n = self._count
+        self._snapshot = GallerySnapshot(
+            matrix=self._matrix_buf[:n],
+            names=self._names_buf[:n],
+            files=self._files_buf[:n],
+            dead=dead,
+        )
+
+    def _append_row(self, name, file, vec):
+        """Write one row past the published end; readers never see it until _publish."""
+        if self._count == self._matrix_buf.shape[0]:
+            capacity = self._matrix_buf.shape[0] * 2
+            # Old snapshots keep pointing at the old buffers, so copying is safe
+            matrix_buf = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix_buf[:self._count] = self._matrix_buf[:self._count]
+            names_buf = np.empty(capacity, dtype=object)
+            names_buf[:self._count] = self._names_buf[:self._count]
+            files_buf = np.empty(capacity, dtype=object)
+            files_buf[:self._count] = self._files_buf[:self._count]
+            self._matrix_buf, self._names_buf, self._files_buf = matrix_buf, names_buf, files_buf
+
+        row = self._count
+        self._matrix_buf[row] = vec
+        self._names_buf[row] = name
+        self._files_buf[row] = file
+        self._row_by_file[file] = row
+        self._count += 1
+        return row
+
+    def _compact_if_needed(self):
+        dead = self._snapshot.dead
+        if not dead or len(dead) < self._count * COMPACT_DEAD_FRACTION:
+            return
+
+        snapshot = self._snapshot
+        live = [i for i in range(self._count) if i not in dead]
+        self._reset(len(live) * 2)
+        for i in live:
+            self._append_row(snapshot.names[i], snapshot.files[i], snapshot.matrix[i])
+        self._publish(frozenset())
+
+    def __len__(self):
+        snapshot = self._snapshot
+        return snapshot.matrix.shape[0] - len(snapshot.dead)
+
+    def build(self, entries):
+        """
+        Replace the gallery contents.
+
+        Args:
+            entries: Iterable of dicts with 'name', 'file' and 'embedding' keys
+
+        Returns:
+            Number of entries loaded
+        """
+        entries = list(entries)
+        with self._lock:
+            self._reset(len(entries) * 2)
+            dead = set()
+            for entry in entries:
+                previous = self._row_by_file.get(entry['file'])
+                if previous is not None:
+                    dead.add(previous)
+                self._append_row(entry['name'], entry['file'], normalize_embedding(entry['embedding']))
+            self._publish(frozenset(dead))
+            self._compact_if_needed()
+        return len(self)
+
+    def upsert(self, name, file, embedding):
+        """
+        Add a face, or replace the one already registered under the same file.
+        Costs one row write; concurrent searches keep using the previous snapshot.
+
+        Returns:
+            Gallery size after the update
+        """
+        vec = normalize_embedding(embedding)
+        with self._lock:
+            dead = set(self._snapshot.dead)
+            previous = self._row_by_file.get(file)
+            if previous is not None:
+                dead.add(previous)
+            self._append_row(name, file, vec)
+            self._publish(frozenset(dead))
+            self._compact_if_needed()
+        return len(self)
+
+    def delete(self, file):
+        """
+        Remove the face registered under a file name.
+
+        Returns:
+            True if an entry was removed
+        """
+        with self._lock:
+            row = self._row_by_file.pop(file, None)
+            if row is None:
+                return False
+            self._publish(self._snapshot.dead | {row})
+            self._compact_if_needed()
+        return True
+
+    def search(self, embedding, k=1):
+        """
+        Find the k registered faces most similar to an embedding.
+
+        Args:
+            embedding: Query embedding (any norm)
+            k: Number of results to return
+
+        Returns:
+            List of dicts with index, name, file and cosine score, best first
+        """
+        snapshot = self._snapshot
+        n = snapshot.matrix.shape[0]
+        k = min(k, n - len(snapshot.dead))
+        if k <= 0:
+            return []
+
+        query = normalize_embedding(embedding)
+        scores = snapshot.matrix @ query
+        if snapshot.dead:
+            scores[list(snapshot.dead)] = -np.inf
+
+        if k < n:
+            top = np.argpartition(scores, n - k)[n - k:]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(scores[top])[::-1]][:k]
+
+        return [
+            {
+                'index': int(i),
+                'name': snapshot.names[i],
+                'file': snapshot.files[i],
+                'score': float(scores[i]),
+            }
+            for i in top
+        ]
+
+    def best_match(self, embedding):
+        """Return the single closest registered face, or None if the gallery is empty."""
+        results = self.search(embedding, k=1)
+        return results[0] if results else None
+
+    def entries(self):
+        """Return [{'name', 'file'}, ...] for every registered face."""
+        snapshot = self._snapshot
+        return [
+            {'name': snapshot.names[i], 'file': snapshot.files[i]}
+            for i in range(snapshot.matrix.shape[0])
+            if i not in snapshot.dead
+        ]
@@ -16,6 +16,15 @@ ALERTS_DIR = os.path.join(PROJECT_DIR, "data", "unknown_alerts")
 LOG_DIR = os.path.join(PROJECT_DIR, "data", "logs")
 MODELS_DIR = os.path.join(PROJECT_DIR, "data", "models")
 
+# ---------------------------------------------------------------------------
+# SQLite connections (database.py keeps one per thread)
+# ---------------------------------------------------------------------------
+DB_JOURNAL_MODE = "WAL"          # readers never block on the writer
+DB_SYNCHRONOUS = "NORMAL"        # WAL-safe; fsync only at checkpoints
+DB_CACHE_SIZE_KB = 16384         # page cache per connection
+DB_CACHED_STATEMENTS = 64        # prepared statements kept per connection
+DB_BUSY_TIMEOUT_S = 5.0
+
 # ---------------------------------------------------------------------------
 # Image Quality Thresholds
 # ---------------------------------------------------------------------------
@@ -48,8 +57,21 @@ MEDIAPIPE_MODEL_SELECTION = 1
 # ArcFace / InsightFace
 # ---------------------------------------------------------------------------
 ARCFACE_MODEL_NAME = "buffalo_l"
+# INT8 copy of the pack built by blink_project/quantize_models.py; detection
+# and recognition are quantized, the landmark models are unchanged. Embeddings
+# already in the database come from FP32; eval_quantized.py reports the drift.
+ARCFACE_USE_INT8 = False
+ARCFACE_INT8_MODEL_NAME = ARCFACE_MODEL_NAME + "_int8"
 ARCFACE_DET_SIZE = (640, 640)
 
+# Adaptive detection (off by default): SCRFD runs at the smaller sizes first
+# and falls back to the next size only if no face, or a face under
+# ARCFACE_ADAPTIVE_MIN_FACE_PX (in detector pixels), is found. Close-up
+# single-face frames stop at 320.
+ARCFACE_ADAPTIVE_DET = False
+ARCFACE_ADAPTIVE_DET_SIZES = [(320, 320), ARCFACE_DET_SIZE]
+ARCFACE_ADAPTIVE_MIN_FACE_PX = 40
+
 def _get_providers():
     try:
         import onnxruntime as ort
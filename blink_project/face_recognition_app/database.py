@@ -7,18 +7,81 @@ Automatically migrates from older schemas.
 
 from __future__ import annotations
 
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 
 import numpy as np
 
-from config import DB_PATH, ensure_dirs, get_logger
+from config import (
+    DB_BUSY_TIMEOUT_S, DB_CACHE_SIZE_KB, DB_CACHED_STATEMENTS, DB_JOURNAL_MODE,
+    DB_PATH, DB_SYNCHRONOUS, ensure_dirs, get_logger,
+)
 
 log = get_logger("database")
 
 
+class ConnectionManager:
+    """One persistent SQLite connection per thread.
+
+    The Streamlit pages call the functions below dozens of times per render;
+    reusing the connection skips the open, the PRAGMA setup and the schema
+    parse each time, and keeps sqlite3's prepared-statement cache warm.
+    Connections are reopened after a fork, since SQLite handles must not
+    cross process boundaries. Only the thread-local holds a connection, so it
+    is closed when its thread exits (Streamlit runs each rerun in a new one).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _open(self) -> sqlite3.Connection:
+        ensure_dirs()
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_S,
+            cached_statements=DB_CACHED_STATEMENTS,
+        )
+        conn.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = self._open()
+            local.pid = os.getpid()
+        return local.conn
+
+    @contextmanager
+    def transaction(self):
+        """This thread's connection; commits on success, rolls back on error."""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def close(self):
+        """Close this thread's connection; the next call reopens it."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.__dict__.clear()
+
+
+_connections = ConnectionManager(DB_PATH)
+
+
 def _connect() -> sqlite3.Connection:
-    ensure_dirs()
-    return sqlite3.connect(DB_PATH)
+    return _connections.connection()
+
+
+def close_connections():
+    """Close this thread's connection; the next call reopens it."""
+    _connections.close()
 
 
 # ---------------------------------------------------------------------------
@@ -29,20 +92,19 @@ def init_db():
     """Create tables and run any pending migrations."""
     conn = _connect()
     _migrate_if_needed(conn)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS faces (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            angle TEXT NOT NULL DEFAULT 'any',
-            embedding BLOB NOT NULL,
-            quality_score REAL DEFAULT 0.0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_name ON faces(name)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_angle ON faces(name, angle)")
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS faces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                angle TEXT NOT NULL DEFAULT 'any',
+                embedding BLOB NOT NULL,
+                quality_score REAL DEFAULT 0.0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_name ON faces(name)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_angle ON faces(name, angle)")
     log.debug("Database initialized at %s", DB_PATH)
 
 
@@ -93,6 +155,8 @@ def _migrate_if_needed(conn: sqlite3.Connection):
             conn.execute("ALTER TABLE faces ADD COLUMN quality_score REAL DEFAULT 0.0")
             conn.commit()
     except Exception as e:
+        # The connection is kept, so don't leave a half-done migration open on it
+        conn.rollback()
         log.warning("Migration check: %s", e)
 
 
@@ -100,17 +164,15 @@ def _migrate_if_needed(conn: sqlite3.Connection):
 # Write operations
 # ---------------------------------------------------------------------------
 
+_INSERT_SQL = "INSERT INTO faces (name, angle, embedding, quality_score) VALUES (?, ?, ?, ?)"
+
+
 def add_embedding(name: str, embedding: np.ndarray,
                   angle: str = "any", quality_score: float = 0.0):
     """Add one embedding for a person + angle."""
     blob = sqlite3.Binary(embedding.astype(np.float32).tobytes())
-    conn = _connect()
-    conn.execute(
-        "INSERT INTO faces (name, angle, embedding, quality_score) VALUES (?, ?, ?, ?)",
-        (name, angle, blob, quality_score),
-    )
-    conn.commit()
-    conn.close()
+    with _connections.transaction() as conn:
+        conn.execute(_INSERT_SQL, (name, angle, blob, quality_score))
     log.debug("Added embedding for '%s' angle='%s' quality=%.1f", name, angle, quality_score)
 
 
@@ -128,16 +190,11 @@ def replace_all_embeddings(name: str, embeddings: list[np.ndarray],
         quality_scores = [0.0] * n
     if angles is None:
         angles = ["any"] * n
-    conn = _connect()
-    conn.execute("DELETE FROM faces WHERE name = ?", (name,))
-    for emb, qs, ang in zip(embeddings, quality_scores, angles):
-        blob = sqlite3.Binary(emb.astype(np.float32).tobytes())
-        conn.execute(
-            "INSERT INTO faces (name, angle, embedding, quality_score) VALUES (?, ?, ?, ?)",
-            (name, ang, blob, qs),
-        )
-    conn.commit()
-    conn.close()
+    rows = [(name, ang, sqlite3.Binary(emb.astype(np.float32).tobytes()), qs)
+            for emb, qs, ang in zip(embeddings, quality_scores, angles)]
+    with _connections.transaction() as conn:
+        conn.execute("DELETE FROM faces WHERE name = ?", (name,))
+        conn.executemany(_INSERT_SQL, rows)
     log.info("Replaced embeddings for '%s': %d stored", name, n)
 
 
@@ -146,16 +203,11 @@ def replace_angle_embeddings(name: str, angle: str, embeddings: list[np.ndarray]
     """Replace embeddings for a specific angle only."""
     if quality_scores is None:
         quality_scores = [0.0] * len(embeddings)
-    conn = _connect()
-    conn.execute("DELETE FROM faces WHERE name = ? AND angle = ?", (name, angle))
-    for emb, qs in zip(embeddings, quality_scores):
-        blob = sqlite3.Binary(emb.astype(np.float32).tobytes())
-        conn.execute(
-            "INSERT INTO faces (name, angle, embedding, quality_score) VALUES (?, ?, ?, ?)",
-            (name, angle, blob, qs),
-        )
-    conn.commit()
-    conn.close()
+    rows = [(name, angle, sqlite3.Binary(emb.astype(np.float32).tobytes()), qs)
+            for emb, qs in zip(embeddings, quality_scores)]
+    with _connections.transaction() as conn:
+        conn.execute("DELETE FROM faces WHERE name = ? AND angle = ?", (name, angle))
+        conn.executemany(_INSERT_SQL, rows)
     log.info("Replaced '%s' angle='%s': %d embeddings", name, angle, len(embeddings))
 
 
@@ -165,80 +217,62 @@ def replace_angle_embeddings(name: str, angle: str, embeddings: list[np.ndarray]
 
 def get_all_faces() -> list[tuple[str, str, np.ndarray]]:
     """Return list of (name, angle, embedding) for all stored embeddings."""
-    conn = _connect()
-    rows = conn.execute("SELECT name, angle, embedding FROM faces").fetchall()
-    conn.close()
+    rows = _connect().execute("SELECT name, angle, embedding FROM faces").fetchall()
     return [(name, angle, np.frombuffer(blob, dtype=np.float32).copy())
             for name, angle, blob in rows]
 
 
 def get_embeddings_for_name(name: str) -> list[tuple[str, np.ndarray]]:
     """Return [(angle, embedding), ...] for a specific person."""
-    conn = _connect()
-    rows = conn.execute(
+    rows = _connect().execute(
         "SELECT angle, embedding FROM faces WHERE name = ?", (name,)
     ).fetchall()
-    conn.close()
     return [(angle, np.frombuffer(blob, dtype=np.float32).copy())
             for angle, blob in rows]
 
 
 def get_face_by_name(name: str) -> np.ndarray | None:
     """Return first embedding for a name (backward compat)."""
-    conn = _connect()
-    row = conn.execute("SELECT embedding FROM faces WHERE name = ?", (name,)).fetchone()
-    conn.close()
+    row = _connect().execute("SELECT embedding FROM faces WHERE name = ?", (name,)).fetchone()
     if row is None:
         return None
     return np.frombuffer(row[0], dtype=np.float32).copy()
 
 
 def count_embeddings(name: str) -> int:
-    conn = _connect()
-    row = conn.execute("SELECT COUNT(*) FROM faces WHERE name = ?", (name,)).fetchone()
-    conn.close()
+    row = _connect().execute("SELECT COUNT(*) FROM faces WHERE name = ?", (name,)).fetchone()
     return row[0]
 
 
 def delete_face(name: str) -> bool:
-    conn = _connect()
-    cursor = conn.execute("DELETE FROM faces WHERE name = ?", (name,))
-    conn.commit()
+    with _connections.transaction() as conn:
+        cursor = conn.execute("DELETE FROM faces WHERE name = ?", (name,))
     deleted = cursor.rowcount > 0
-    conn.close()
     if deleted:
         log.info("Deleted all embeddings for '%s'", name)
     return deleted
 
 
 def list_names() -> list[str]:
-    conn = _connect()
-    rows = conn.execute("SELECT DISTINCT name FROM faces ORDER BY name").fetchall()
-    conn.close()
+    rows = _connect().execute("SELECT DISTINCT name FROM faces ORDER BY name").fetchall()
     return [r[0] for r in rows]
 
 
 def get_name_counts() -> dict[str, int]:
-    conn = _connect()
-    rows = conn.execute(
+    rows = _connect().execute(
         "SELECT name, COUNT(*) FROM faces GROUP BY name ORDER BY name"
     ).fetchall()
-    conn.close()
     return {name: count for name, count in rows}
 
 
 def get_angle_counts(name: str) -> dict[str, int]:
     """Return {angle: count} for a specific person."""
-    conn = _connect()
-    rows = conn.execute(
+    rows = _connect().execute(
         "SELECT angle, COUNT(*) FROM faces WHERE name = ? GROUP BY angle", (name,)
     ).fetchall()
-    conn.close()
     return {angle: count for angle, count in rows}
 
 
 def total_embeddings() -> int:
-    conn = _connect()
-    row = conn.execute("SELECT COUNT(*) FROM faces").fetchone()
-    conn.close()
+    row = _connect().execute("SELECT COUNT(*) FROM faces").fetchone()
     return row[0]
@@ -13,8 +13,19 @@ from dataclasses import dataclass
 
 import numpy as np
 from insightface.app import FaceAnalysis
-
-from config import ARCFACE_MODEL_NAME, ARCFACE_DET_SIZE, ARCFACE_PROVIDERS, get_logger
+from insightface.app.common import Face
+
+from config import (
+    ARCFACE_ADAPTIVE_DET,
+    ARCFACE_ADAPTIVE_DET_SIZES,
+    ARCFACE_ADAPTIVE_MIN_FACE_PX,
+    ARCFACE_DET_SIZE,
+    ARCFACE_INT8_MODEL_NAME,
+    ARCFACE_MODEL_NAME,
+    ARCFACE_USE_INT8,
+    ARCFACE_PROVIDERS,
+    get_logger,
+)
 from pose_detector import PoseResult, analyze_face
 
 log = get_logger("embedder")
@@ -28,20 +39,57 @@ class FaceEmbeddingResult:
     landmarks: np.ndarray | None = None      # (5, 2) keypoints
     landmarks_68: np.ndarray | None = None   # (68, 3) 3D landmarks
     pose: PoseResult | None = None           # yaw/pitch/roll + blink
+    det_size: tuple[int, int] | None = None  # SCRFD input size that found the face
 
 
 class FaceEmbedder:
     """ArcFace embedding extraction with pose analysis and GPU auto-detection."""
 
     def __init__(self):
+        model_name = ARCFACE_INT8_MODEL_NAME if ARCFACE_USE_INT8 else ARCFACE_MODEL_NAME
         log.info("Loading ArcFace model (%s) with providers: %s",
-                 ARCFACE_MODEL_NAME, ARCFACE_PROVIDERS)
+                 model_name, ARCFACE_PROVIDERS)
         self._app = FaceAnalysis(
-            name=ARCFACE_MODEL_NAME,
+            name=model_name,
             providers=ARCFACE_PROVIDERS,
         )
         self._app.prepare(ctx_id=0, det_size=ARCFACE_DET_SIZE)
-        log.info("ArcFace model loaded. Detection size: %s", ARCFACE_DET_SIZE)
+        self._det_sizes = ARCFACE_ADAPTIVE_DET_SIZES if ARCFACE_ADAPTIVE_DET else [ARCFACE_DET_SIZE]
+        log.info("ArcFace model loaded. Detection size: %s",
+                 " -> ".join(str(s) for s in self._det_sizes))
+
+    def _analyze(self, bgr_frame: np.ndarray) -> tuple[list[Face], tuple[int, int]]:
+        """FaceAnalysis.get() with adaptive detection size.
+
+        Tries each size in turn, stopping at the first that finds faces no
+        smaller than ARCFACE_ADAPTIVE_MIN_FACE_PX at that input size. If the
+        larger sizes then find nothing, the last detection that did find
+        faces is used.
+        """
+        h, w = bgr_frame.shape[:2]
+        det_model = self._app.det_model
+        best = None
+        for det_size in self._det_sizes:
+            bboxes, kpss = det_model.detect(bgr_frame, input_size=det_size,
+                                            max_num=0, metric="default")
+            if bboxes.shape[0] == 0:
+                continue
+            best = bboxes, kpss, det_size
+            sides = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1])
+            if sides.min() * max(det_size) / max(h, w) >= ARCFACE_ADAPTIVE_MIN_FACE_PX:
+                break
+        if best is not None:
+            bboxes, kpss, det_size = best
+
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None,
+                        det_score=bboxes[i, 4])
+            for taskname, model in self._app.models.items():
+                if taskname != "detection":
+                    model.get(bgr_frame, face)
+            faces.append(face)
+        return faces, det_size
 
     def get_embeddings(self, bgr_frame: np.ndarray) -> list[FaceEmbeddingResult]:
         """Detect and embed all faces, including pose analysis.
@@ -52,7 +100,7 @@ class FaceEmbedder:
         3. Face alignment via landmarks
         4. ArcFace embedding extraction (512-d)
         """
-        faces = self._app.get(bgr_frame)
+        faces, det_size = self._analyze(bgr_frame)
         h, w = bgr_frame.shape[:2]
         results = []
 
@@ -73,6 +121,7 @@ class FaceEmbedder:
                 landmarks=kps,
                 landmarks_68=lm68,
                 pose=pose,
+                det_size=det_size,
             ))
         return results
 
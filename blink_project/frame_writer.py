@@ -0,0 +1,226 @@
+"""
+Background persistence of captured frames
+Requests hand decoded frames to a bounded queue and return immediately; a
+writer thread does the JPEG encoding and disk I/O. When the queue is full the
+frame is dropped rather than slowing down the request. The same thread
+periodically sweeps old captured_images/session_* folders by age and/or size.
+"""
+
+import datetime
+import itertools
+import os
+import queue
+import shutil
+import threading
+import time
+
+import cv2
+
+SAVE_MODES = ('off', 'sample', 'all')
+
+
+def _session_usage(path):
+    """Return (total_bytes, newest_mtime) for everything under a session folder."""
+    total = 0
+    newest = os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return total, newest
+
+
+def sweep_sessions(main_folder, max_age_days=0, max_total_mb=0, keep=()):
+    """
+    Delete captured session folders that exceed the retention policy.
+
+    Args:
+        main_folder: Folder holding session_* directories
+        max_age_days: Remove sessions whose newest file is older than this (0 = no age limit)
+        max_total_mb: Then remove oldest sessions until the total fits (0 = no size limit)
+        keep: Session paths never to remove (e.g. the active session)
+
+    Returns:
+        List of removed session paths
+    """
+    if not (max_age_days or max_total_mb) or not os.path.isdir(main_folder):
+        return []
+
+    keep = {os.path.abspath(p) for p in keep}
+    sessions = []
+    for name in os.listdir(main_folder):
+        path = os.path.join(main_folder, name)
+        if not name.startswith("session_") or not os.path.isdir(path) or os.path.abspath(path) in keep:
+            continue
+        try:
+            size, newest = _session_usage(path)
+        except OSError:
+            continue
+        sessions.append((newest, size, path))
+    sessions.sort()  # oldest first
+
+    removed = []
+    if max_age_days:
+        cutoff = time.time() - max_age_days * 86400
+        while sessions and sessions[0][0] < cutoff:
+            removed.append(sessions.pop(0)[2])
+
+    if max_total_mb:
+        # Kept sessions still count towards the budget
+        kept_bytes = sum(_session_usage(p)[0] for p in keep if os.path.isdir(p))
+        total = kept_bytes + sum(size for _, size, _ in sessions)
+        budget = max_total_mb * 1024 * 1024
+        while sessions and total > budget:
+            _, size, path = sessions.pop(0)
+            total -= size
+            removed.append(path)
+
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+
+class FrameWriter:
+    """Bounded, drop-on-overflow background JPEG writer with session retention"""
+
+    def __init__(self, folder, mode='all', sample_every=10, jpeg_quality=95, max_queue=64,
+                 main_folder=None, max_age_days=0, max_total_mb=0, sweep_interval_s=600):
+        """
+        Args:
+            folder: Session folder frames are written to
+            mode: 'off' (never save), 'sample' (every Nth frame) or 'all'
+            sample_every: N for 'sample' mode
+            jpeg_quality: cv2.IMWRITE_JPEG_QUALITY (0-100)
+            max_queue: Frames waiting to be written before new ones are dropped
+            main_folder: Parent of the session_* folders to sweep (None = no sweeping)
+            max_age_days/max_total_mb: Retention policy, see sweep_sessions()
+            sweep_interval_s: Seconds between sweeps while the writer runs
+        """
+        if mode not in SAVE_MODES:
+            raise ValueError(f"mode must be one of {SAVE_MODES}, got {mode!r}")
+        self.folder = folder
+        self.mode = mode
+        self.sample_every = max(1, int(sample_every))
+        self.jpeg_quality = int(jpeg_quality)
+        self.main_folder = main_folder
+        self.max_age_days = max_age_days
+        self.max_total_mb = max_total_mb
+        self.sweep_interval_s = sweep_interval_s
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._seq = itertools.count(1)
+        self._seen = itertools.count(0)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._last_sweep = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self, frame, prefix="frame", subfolder=None):
+        """
+        Queue a frame to be saved. The frame must not be modified afterwards.
+
+        Args:
+            frame: OpenCV BGR image
+            prefix: File name prefix
+            subfolder: Optional folder inside the session folder, e.g. 'blinked'
+
+        Returns:
+            File path the frame will be written to, or None if skipped/dropped
+        """
+        if self.mode == 'off':
+            return None
+        if self.mode == 'sample' and next(self._seen) % self.sample_every:
+            return None
+
+        self._ensure_thread()
+        # Microseconds + pid + sequence: unique across threads and worker processes
+        stamp = datetime.datetime.now().strftime("%H%M%S_%f")
+        folder = os.path.join(self.folder, subfolder) if subfolder else self.folder
+        path = os.path.join(folder, f"{prefix}_{stamp}_{os.getpid()}_{next(self._seq)}.jpg")
+        try:
+            self._queue.put_nowait((path, frame))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return None
+        return path
+
+    def sweep(self):
+        """Apply the retention policy now; never removes the active session."""
+        if self.main_folder is None or not (self.max_age_days or self.max_total_mb):
+            return []
+        # Keep sweeping periodically even if no frame is ever submitted
+        self._ensure_thread()
+        self._last_sweep = time.monotonic()
+        removed = sweep_sessions(self.main_folder, self.max_age_days, self.max_total_mb, keep=(self.folder,))
+        if removed:
+            print(f"Retention: removed {len(removed)} old session folder(s)")
+        return removed
+
+    def flush(self, timeout=10.0):
+        """Wait until queued frames are written (used by tests/benchmarks and shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'errors': self.errors,
+            }
+
+    def _ensure_thread(self):
+        # Threads do not survive fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+                self._thread.start()
+
+    def _write(self, path, frame):
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise IOError("JPEG encoding failed")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(buf.tobytes())
+        os.replace(tmp_path, path)
+
+    def _run(self):
+        while True:
+            try:
+                path, frame = self._queue.get(timeout=self.sweep_interval_s)
+            except queue.Empty:
+                path = None
+
+            if path is not None:
+                try:
+                    self._write(path, frame)
+                    with self._lock:
+                        self.written += 1
+                except Exception as e:
+                    print(f"WARNING: Could not save frame {path}: {e}")
+                    with self._lock:
+                        self.errors += 1
+                finally:
+                    self._queue.task_done()
+
+            if self.main_folder is not None and time.monotonic() - self._last_sweep >= self.sweep_interval_s:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"WARNING: Retention sweep failed: {e}")
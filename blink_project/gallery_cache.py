@@ -0,0 +1,221 @@
+"""
+Persistent embedding cache for the registered_faces/ directory
+Stores computed embeddings in a versioned .npy matrix plus a JSON manifest keyed
+by file name, size, mtime and SHA-256 so startup only re-embeds changed photos.
+Worker processes share the files; locked() serializes them with flock.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only, no gunicorn workers
+    fcntl = None
+
+CACHE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "manifest.lock"
+
+
+def file_sha256(filepath, chunk_size=1 << 20):
+    """Return the hex SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """Sidecar store mapping registered photo files to their face embeddings"""
+
+    def __init__(self, cache_dir, model_name):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(cache_dir, LOCK_NAME)
+        self._records = {}
+
+    @contextmanager
+    def locked(self, exclusive=True):
+        """
+        Hold an flock on the cache directory's lock file, shared for reading
+        or exclusive for a load -> modify -> save sequence. Worker processes
+        each have their own threading locks, so this is what keeps them from
+        interleaving manifest writes or deleting each other's matrices.
+        """
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        """
+        Read the manifest and matrix from disk (call inside locked()). A
+        missing or incompatible cache starts empty; an unreadable one leaves
+        the records already in memory untouched.
+
+        Returns:
+            Number of cached records, or None if the cache could not be read
+        """
+        records = {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+
+            if manifest.get('version') != CACHE_VERSION or manifest.get('model') != self.model_name:
+                print("  Embedding cache is for a different model/version — rebuilding.")
+                self._records = {}
+                return 0
+
+            matrix = np.load(os.path.join(self.cache_dir, manifest['matrix']))
+            for filename, rec in manifest['files'].items():
+                row = rec['row']
+                records[filename] = {
+                    'name': rec['name'],
+                    'size': rec['size'],
+                    'mtime_ns': rec['mtime_ns'],
+                    'sha256': rec['sha256'],
+                    # row -1 means the photo was read but had no detectable face
+                    'embedding': matrix[row].copy() if row >= 0 else None,
+                }
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, IndexError, OSError) as e:
+            print(f"  WARNING: Ignoring unreadable embedding cache: {e}")
+            return None
+
+        self._records = records
+        return len(records)
+
+    def get(self, filename, filepath):
+        """
+        Return the cached record for a photo if it is still valid, else None.
+
+        A size/mtime match is trusted directly; otherwise the content hash
+        decides, so touched or copied-but-identical files are still hits.
+        The record's 'embedding' is None when the photo had no face.
+        """
+        rec = self._records.get(filename)
+        if rec is None:
+            return None
+
+        st = os.stat(filepath)
+        if rec['size'] == st.st_size and rec['mtime_ns'] == st.st_mtime_ns:
+            return rec
+
+        if rec['size'] == st.st_size and rec['sha256'] == file_sha256(filepath):
+            rec['mtime_ns'] = st.st_mtime_ns
+            return rec
+
+        return None
+
+    def put(self, filename, filepath, name, embedding):
+        """Record a freshly computed embedding (or None for 'no face') for a photo."""
+        st = os.stat(filepath)
+        rec = {
+            'name': name,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': file_sha256(filepath),
+            'embedding': None if embedding is None else np.asarray(embedding, dtype=np.float32),
+        }
+        self._records[filename] = rec
+        return rec
+
+    def remove(self, filename):
+        """Forget a photo. Returns True if it was cached."""
+        return self._records.pop(filename, None) is not None
+
+    def entries(self):
+        """Return gallery entries ({'name', 'file', 'embedding'}) for every cached face."""
+        return [
+            {'name': rec['name'], 'file': filename, 'embedding': rec['embedding']}
+            for filename, rec in sorted(self._records.items())
+            if rec['embedding'] is not None
+        ]
+
+    def manifest_mtime_ns(self):
+        """Modification time of the manifest on disk, or None if there is none yet."""
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def save(self, keep_files=None):
+        """
+        Atomically write the cache to disk (call inside locked(exclusive=True)).
+
+        Args:
+            keep_files: Optional iterable of file names still present; records
+                for any other file are dropped.
+        """
+        if keep_files is not None:
+            keep = set(keep_files)
+            self._records = {k: v for k, v in self._records.items() if k in keep}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        rows = []
+        files = {}
+        for filename, rec in sorted(self._records.items()):
+            row = -1
+            if rec['embedding'] is not None:
+                row = len(rows)
+                rows.append(rec['embedding'])
+            files[filename] = {
+                'name': rec['name'],
+                'size': rec['size'],
+                'mtime_ns': rec['mtime_ns'],
+                'sha256': rec['sha256'],
+                'row': row,
+            }
+
+        dim = rows[0].shape[0] if rows else 0
+        matrix = np.stack(rows).astype(np.float32) if rows else np.empty((0, dim), dtype=np.float32)
+
+        # A fresh matrix file per generation means the manifest swap is the only
+        # step that has to be atomic; readers never see a half-written pair.
+        matrix_name = f"embeddings_v{CACHE_VERSION}_{uuid.uuid4().hex[:12]}.npy"
+        with open(os.path.join(self.cache_dir, matrix_name), 'wb') as f:
+            np.save(f, matrix)
+
+        manifest = {
+            'version': CACHE_VERSION,
+            'model': self.model_name,
+            'matrix': matrix_name,
+            'files': files,
+        }
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            for path in (tmp_path, os.path.join(self.cache_dir, matrix_name)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+
+        # Under the exclusive lock the manifest just written is the only live
+        # one, and no reader holds the lock, so every other matrix is unreferenced
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith("embeddings_v") and entry.endswith(".npy") and entry != matrix_name:
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry))
+                except OSError:
+                    pass
@@ -0,0 +1,58 @@
+"""
+Production serving config for server.py (Linux/macOS)
+Run from blink_project/:  gunicorn -c gunicorn.conf.py server:app
+
+The master imports server.py once (preload_app) and loads the registered-face
+gallery, which the forked workers then share copy-on-write. ONNX sessions are
+not fork-safe, so each worker builds its own in post_fork with a bounded
+ONNX Runtime thread pool.
+
+Environment:
+    BLINK_WORKERS          worker processes (default: cores // 2)
+    BLINK_THREADS          request threads per worker (default: 2)
+    BLINK_BIND             listen address (default: 0.0.0.0:5000)
+    ORT_INTRA_OP_THREADS   ONNX Runtime threads per worker (default: cores // workers)
+    BLINK_METRICS_DIR      where workers share /metrics values (default: a per-run temp dir)
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+_cores = multiprocessing.cpu_count()
+
+bind = os.environ.get('BLINK_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('BLINK_WORKERS', max(1, _cores // 2)))
+threads = int(os.environ.get('BLINK_THREADS', 2))
+worker_class = 'gthread'
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+
+# Read by server.py at import time, i.e. before the app is preloaded
+os.environ.setdefault('BLINK_DEFER_MODEL_LOAD', '1')
+os.environ.setdefault('ORT_INTRA_OP_THREADS', str(max(1, _cores // workers)))
+os.environ.setdefault('ORT_INTER_OP_THREADS', '1')
+# Lets /metrics on any worker report totals for the whole server
+os.environ.setdefault('BLINK_METRICS_DIR', os.path.join(tempfile.gettempdir(), f"blink_metrics_{os.getpid()}"))
+
+
+def when_ready(server):
+    """Master, before the first fork: build the gallery once for all workers."""
+    import server as blink_server
+    blink_server.load_registered_faces()
+    # Models may have been loaded to embed new photos; workers must not inherit them
+    blink_server.release_face_recognition()
+
+
+def post_fork(server, worker):
+    import server as blink_server
+    blink_server.init_face_recognition()
+    blink_server.init_spectacle_backend()
+
+
+def on_exit(server):
+    metrics_dir = os.environ.get('BLINK_METRICS_DIR', '')
+    if os.path.basename(metrics_dir).startswith('blink_metrics_'):
+        shutil.rmtree(metrics_dir, ignore_errors=True)
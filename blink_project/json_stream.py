@@ -0,0 +1,174 @@
+"""
+Incremental JSON parsing of large request bodies
+Yields the members of a top-level JSON object while the body is still being
+read. Items of selected array members are yielded one at a time, so a body
+holding dozens of base64 frames is never held or parsed in one piece.
+"""
+
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = b' \t\r\n'
+_SCALAR_END = b',}] \t\r\n'
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+
+
+class _Reader:
+    """Byte buffer over a stream; consumed bytes are dropped as it refills"""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = bytearray()
+        self.pos = 0
+
+    def fill(self):
+        """Read another chunk; returns False at end of stream."""
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+        if self.pos:
+            del self.buf[:self.pos]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace byte, without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON body")
+
+    def expect(self, char):
+        found = self.peek()
+        if found != ord(char):
+            raise ValueError(f"Expected {char!r} but found {chr(found)!r}")
+        self.pos += 1
+
+    def _take(self, end):
+        raw = bytes(self.buf[self.pos:end])
+        self.pos = end
+        return raw
+
+    def read_string(self):
+        if self.peek() != _QUOTE:
+            raise ValueError("Expected a JSON string")
+        # Offsets are kept relative to self.pos because fill() moves the buffer
+        scan = 1
+        while True:
+            end = self.buf.find(b'"', self.pos + scan)
+            if end < 0:
+                scan = len(self.buf) - self.pos
+                if not self.fill():
+                    raise ValueError("Unterminated JSON string")
+                continue
+            backslashes = 0
+            while self.buf[end - 1 - backslashes] == _BACKSLASH:
+                backslashes += 1
+            if backslashes % 2 == 0:
+                raw = self._take(end + 1)
+                if b'\\' in raw:
+                    return json.loads(raw)
+                return raw[1:-1].decode('utf-8')
+            scan = end + 1 - self.pos
+
+    def read_value(self):
+        first = self.peek()
+        if first == _QUOTE:
+            return self.read_string()
+        if first in b'[{':
+            return json.loads(self._read_container())
+        return json.loads(self._read_scalar())
+
+    def _read_container(self):
+        depth = 0
+        in_string = False
+        i = self.pos
+        while True:
+            if i >= len(self.buf):
+                offset = i - self.pos
+                if not self.fill():
+                    raise ValueError("Unexpected end of JSON body")
+                i = self.pos + offset
+                continue
+            c = self.buf[i]
+            if in_string:
+                if c == _BACKSLASH:
+                    i += 1
+                elif c == _QUOTE:
+                    in_string = False
+            elif c == _QUOTE:
+                in_string = True
+            elif c in b'[{':
+                depth += 1
+            elif c in b']}':
+                depth -= 1
+                if depth == 0:
+                    return self._take(i + 1)
+            i += 1
+
+    def _read_scalar(self):
+        i = self.pos
+        while True:
+            if i >= len(self.buf):
+                offset = i - self.pos
+                if not self.fill():
+                    return self._take(i)
+                i = self.pos + offset
+                continue
+            if self.buf[i] in _SCALAR_END:
+                return self._take(i)
+            i += 1
+
+
+def iter_json_object(stream, stream_arrays=(), chunk_size=CHUNK_SIZE):
+    """
+    Parse a JSON object from a binary stream member by member.
+
+    Args:
+        stream: File-like object with read(n), e.g. Flask's request.stream
+        stream_arrays: Member names whose array items are yielded one by one
+        chunk_size: Bytes read per call
+
+    Yields:
+        (key, value) for ordinary members, and (key, item) for every item of
+        a member listed in stream_arrays
+
+    Raises:
+        ValueError: if the body is not a JSON object or is truncated
+    """
+    reader = _Reader(stream, chunk_size)
+    reader.expect('{')
+    if reader.peek() == ord('}'):
+        return
+
+    while True:
+        key = reader.read_string()
+        reader.expect(':')
+        if key in stream_arrays and reader.peek() == ord('['):
+            reader.pos += 1
+            if reader.peek() == ord(']'):
+                reader.pos += 1
+            else:
+                while True:
+                    yield key, reader.read_value()
+                    sep = reader.peek()
+                    reader.pos += 1
+                    if sep == ord(']'):
+                        break
+                    if sep != ord(','):
+                        raise ValueError(f"Expected ',' or ']' in {key!r}")
+        else:
+            yield key, reader.read_value()
+
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == ord('}'):
+            return
+        if sep != ord(','):
+            raise ValueError("Expected ',' or '}' between members")
@@ -0,0 +1,282 @@
+"""
+Minimal Prometheus metrics for the face server
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format without depending on prometheus_client. Values are per process; when
+BLINK_METRICS_DIR is set (gunicorn.conf.py does this), every process also
+writes its values there every few seconds and /metrics on any worker reports
+the total across all of them.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers ~1 ms image decodes up to multi-second cold model runs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        f'{n}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for n, v in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._registry = registry if registry is not None else REGISTRY
+        self._registry.register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(k), self._copy(v)] for k, v in self._values.items()]
+        return {'kind': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames), 'values': values}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self._registry.touch()
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; across processes merged by 'sum' or 'max'"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, merge='sum'):
+        super().__init__(name, documentation, labelnames, registry)
+        self.merge = merge
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+        self._registry.touch()
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self._registry.touch()
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Read the (unlabelled) value from function() whenever metrics are collected."""
+        self._function = function
+
+    def snapshot(self):
+        if self._function is not None:
+            try:
+                value = float(self._function())
+            except Exception:
+                value = float('nan')
+            with self._lock:
+                self._values[()] = value
+        snap = super().snapshot()
+        snap['merge'] = self.merge
+        return snap
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations (latencies in seconds)"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts, last slot is +Inf, then sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            i = 0
+            while i < len(self.buckets) and value > self.buckets[i]:
+                i += 1
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+        self._registry.touch()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+    def snapshot(self):
+        snap = super().snapshot()
+        snap['buckets'] = list(self.buckets)
+        return snap
+
+
+class Registry:
+    """Set of metrics rendered together; optionally shared across processes via a directory"""
+
+    def __init__(self, shared_dir=None, flush_interval_s=5.0):
+        self.shared_dir = shared_dir
+        self.flush_interval_s = flush_interval_s
+        self._metrics = []
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def collect(self):
+        return {m.name: m.snapshot() for m in self._metrics}
+
+    def touch(self):
+        """Called on every update: makes sure this process flushes to the shared dir."""
+        if self.shared_dir is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def flush(self):
+        """Write this process's values to <shared_dir>/metrics_<pid>.json."""
+        if self.shared_dir is None:
+            return
+        os.makedirs(self.shared_dir, exist_ok=True)
+        path = os.path.join(self.shared_dir, f"metrics_{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.collect(), f)
+        os.replace(tmp_path, path)
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval_s)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"WARNING: Could not write metrics: {e}")
+
+    def _merged(self):
+        merged = self.collect()
+        if self.shared_dir is None:
+            return merged
+
+        self.flush()
+        own = f"metrics_{os.getpid()}.json"
+        for path in glob.glob(os.path.join(self.shared_dir, "metrics_*.json")):
+            name = os.path.basename(path)
+            if name == own:
+                continue
+            try:
+                pid = int(name[len("metrics_"):-len(".json")])
+                with open(path) as f:
+                    other = json.load(f)
+            except (ValueError, OSError):
+                continue
+            alive = _pid_alive(pid)
+            for metric_name, snap in other.items():
+                target = merged.get(metric_name)
+                if target is None or target['kind'] != snap['kind']:
+                    continue
+                # Counters/histograms of exited workers still count; their gauges do not
+                if snap['kind'] == 'gauge' and not alive:
+                    continue
+                self._merge_into(target, snap)
+        return merged
+
+    @staticmethod
+    def _merge_into(target, snap):
+        values = {tuple(k): v for k, v in target['values']}
+        for k, v in snap['values']:
+            k = tuple(k)
+            if k not in values:
+                values[k] = v
+            elif target['kind'] == 'histogram':
+                values[k] = [[a + b for a, b in zip(values[k][0], v[0])], values[k][1] + v[1], values[k][2] + v[2]]
+            elif target['kind'] == 'gauge' and target.get('merge') == 'max':
+                values[k] = max(values[k], v)
+            else:
+                values[k] = values[k] + v
+        target['values'] = [[list(k), v] for k, v in values.items()]
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, snap in self._merged().items():
+            lines.append(f"# HELP {name} {snap['help']}")
+            lines.append(f"# TYPE {name} {snap['kind']}")
+            labelnames = snap['labelnames']
+            for key, value in sorted(snap['values'], key=lambda kv: kv[0]):
+                if snap['kind'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for le, n in zip(list(snap['buckets']) + [float('inf')], counts):
+                    cumulative += n
+                    le_label = (('le', _format_value(le)),)
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, key, le_label)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labelnames, key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = Registry(shared_dir=os.environ.get('BLINK_METRICS_DIR') or None)
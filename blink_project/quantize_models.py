@@ -0,0 +1,190 @@
+"""
+INT8 quantization of the buffalo_l detection (SCRFD) and recognition (ArcFace) models
+Writes a new InsightFace model pack, buffalo_l_int8 by default, next to the
+original one. Any other model in the pack (landmarks, gender/age) is copied
+unchanged, so FaceAnalysis(name='buffalo_l_int8') is a drop-in replacement.
+server.py loads it with FACE_MODEL_VARIANT=int8, and FaceEmbedder does so with
+config.ARCFACE_USE_INT8.
+
+Static quantization (default) calibrates activation ranges on faces from
+registered_faces/ and captured_images/; dynamic quantization only needs the
+weights. Check the result with eval_quantized.py before switching over.
+
+Usage: python quantize_models.py [--method static|dynamic] [--max-images 200] [--force]
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+
+import cv2
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INSIGHTFACE_ROOT = os.path.expanduser(os.environ.get('INSIGHTFACE_ROOT', '~/.insightface'))
+SOURCE_PACK = 'buffalo_l'
+INT8_SUFFIX = '_int8'
+QUANTIZED_TASKS = ('detection', 'recognition')
+CALIBRATION_DET_SIZES = (320, 640)
+
+
+def model_pack_dir(name, root=INSIGHTFACE_ROOT):
+    return os.path.join(root, 'models', name)
+
+
+def ensure_source_pack(name=SOURCE_PACK, root=INSIGHTFACE_ROOT):
+    """Path of the FP32 pack, downloading it the way FaceAnalysis would if missing."""
+    from insightface.utils.storage import ensure_available
+    return ensure_available('models', name, root=root)
+
+
+def classify_pack(pack_dir):
+    """Return {taskname: model} for every ONNX file in a pack (InsightFace model_zoo objects)."""
+    from insightface.model_zoo import model_zoo
+    models = {}
+    for onnx_file in sorted(glob.glob(os.path.join(pack_dir, '*.onnx'))):
+        model = model_zoo.get_model(onnx_file, providers=['CPUExecutionProvider'])
+        if model is not None and model.taskname not in models:
+            models[model.taskname] = model
+    return models
+
+
+def calibration_images(max_images):
+    paths = sorted(glob.glob(os.path.join(HERE, 'registered_faces', '*.jpg')))
+    paths += sorted(glob.glob(os.path.join(HERE, 'captured_images', 'session_*', '**', '*.jpg'), recursive=True))
+    # Spread the sample over all sessions instead of taking the first few
+    if len(paths) > max_images:
+        paths = [paths[int(i)] for i in np.linspace(0, len(paths) - 1, max_images)]
+    images = [cv2.imread(p) for p in paths]
+    return [img for img in images if img is not None]
+
+
+def detection_blob(img, size):
+    """SCRFD input exactly as SCRFD.detect() builds it: letterboxed to size x size."""
+    im_ratio = img.shape[0] / img.shape[1]
+    if im_ratio > 1:
+        new_height, new_width = size, int(size / im_ratio)
+    else:
+        new_width, new_height = size, int(size * im_ratio)
+    det_img = np.zeros((size, size, 3), dtype=np.uint8)
+    det_img[:new_height, :new_width, :] = cv2.resize(img, (new_width, new_height))
+    return cv2.dnn.blobFromImage(det_img, 1.0 / 128, (size, size), (127.5, 127.5, 127.5), swapRB=True)
+
+
+def recognition_blobs(images, det_model, rec_model):
+    """Aligned 112x112 face crops of every face found, preprocessed like ArcFaceONNX.get_feat()."""
+    from insightface.utils import face_align
+    det_model.prepare(ctx_id=0, input_size=(640, 640))
+    blobs = []
+    for img in images:
+        _, kpss = det_model.detect(img, max_num=0, metric='default')
+        for kps in (kpss if kpss is not None else []):
+            crop = face_align.norm_crop(img, landmark=kps, image_size=rec_model.input_size[0])
+            blobs.append(cv2.dnn.blobFromImages(
+                [crop], 1.0 / rec_model.input_std, rec_model.input_size,
+                (rec_model.input_mean,) * 3, swapRB=True,
+            ))
+    return blobs
+
+
+class BlobReader:
+    """onnxruntime CalibrationDataReader over precomputed input blobs"""
+
+    def __init__(self, input_name, blobs):
+        self.input_name = input_name
+        self._blobs = iter(blobs)
+
+    def get_next(self):
+        blob = next(self._blobs, None)
+        return None if blob is None else {self.input_name: blob}
+
+
+def quantize_file(src, dst, method, blobs=None):
+    from onnxruntime.quantization import (
+        CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static,
+    )
+
+    if method == 'dynamic':
+        quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+        return
+
+    # Shape inference + graph cleanup recommended before static quantization
+    prepared = dst + '.prep.onnx'
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        quant_pre_process(src, prepared, skip_symbolic_shape=True)
+    except Exception as e:
+        print(f"  pre-processing skipped ({e})")
+        shutil.copyfile(src, prepared)
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(prepared, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    try:
+        quantize_static(
+            prepared, dst, BlobReader(input_name, blobs),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    finally:
+        os.remove(prepared)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build an INT8 copy of the buffalo_l model pack")
+    parser.add_argument('--method', choices=['static', 'dynamic'], default='static')
+    parser.add_argument('--source', default=SOURCE_PACK, help="FP32 pack name")
+    parser.add_argument('--output', default=None, help="Output pack name (default: <source>_int8)")
+    parser.add_argument('--max-images', type=int, default=200, help="Calibration images (static only)")
+    parser.add_argument('--force', action='store_true', help="Overwrite an existing output pack")
+    args = parser.parse_args()
+
+    src_dir = ensure_source_pack(args.source)
+    out_name = args.output or args.source + INT8_SUFFIX
+    out_dir = model_pack_dir(out_name)
+    if os.path.exists(out_dir):
+        if not args.force:
+            sys.exit(f"{out_dir} exists; pass --force to rebuild it")
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    models = classify_pack(src_dir)
+    missing = [t for t in QUANTIZED_TASKS if t not in models]
+    if missing:
+        sys.exit(f"{src_dir} has no {', '.join(missing)} model")
+
+    blobs = {}
+    if args.method == 'static':
+        images = calibration_images(args.max_images)
+        if not images:
+            sys.exit("No calibration images in registered_faces/ or captured_images/")
+        blobs['detection'] = [detection_blob(img, size) for size in CALIBRATION_DET_SIZES for img in images]
+        blobs['recognition'] = recognition_blobs(images, models['detection'], models['recognition'])
+        print(f"Calibration: {len(images)} images, {len(blobs['recognition'])} aligned faces")
+        if not blobs['recognition']:
+            sys.exit("No faces found in the calibration images")
+
+    quantized_files = {os.path.basename(models[t].model_file): t for t in QUANTIZED_TASKS}
+    for src in sorted(glob.glob(os.path.join(src_dir, '*.onnx'))):
+        name = os.path.basename(src)
+        dst = os.path.join(out_dir, name)
+        task = quantized_files.get(name)
+        if task is None:
+            shutil.copyfile(src, dst)
+            print(f"  {name}: copied (FP32)")
+            continue
+        quantize_file(src, dst, args.method, blobs.get(task))
+        print(f"  {name} ({task}): {os.path.getsize(src) / 1e6:.1f} MB -> {os.path.getsize(dst) / 1e6:.1f} MB")
+
+    # ArcFaceONNX infers its input normalisation from the first graph nodes;
+    # make sure quantization did not change what it infers.
+    int8_models = classify_pack(out_dir)
+    fp32_rec, int8_rec = models['recognition'], int8_models.get('recognition')
+    if int8_rec is None or (int8_rec.input_mean, int8_rec.input_std) != (fp32_rec.input_mean, fp32_rec.input_std):
+        sys.exit("Quantized recognition model is not loaded like the FP32 one; do not use this pack")
+
+    print(f"\nWrote {out_dir}. Compare it with: python eval_quantized.py --int8 {out_name}")
@@ -0,0 +1,108 @@
+"""
+Dynamic micro-batching for ArcFace recognition
+Aligned face crops from concurrent requests are queued and run through the
+recognition ONNX model together, up to a max batch size or max wait
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class RecognitionBatcher:
+    """Background scheduler that batches get_feat() calls across request threads"""
+
+    def __init__(self, rec_model, max_batch_size=16, max_wait_ms=5.0):
+        """
+        Args:
+            rec_model: InsightFace ArcFaceONNX model (anything with get_feat(list_of_crops))
+            max_batch_size: Most crops sent to the model in one call
+            max_wait_ms: How long the first queued crop waits for others to join
+        """
+        self.rec_model = rec_model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._run, name="recognition-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, crop):
+        """Queue one aligned 112x112 BGR crop; returns a Future resolving to its embedding."""
+        future = Future()
+        self._queue.put((crop, future))
+        return future
+
+    def embed_many(self, crops, timeout=60.0):
+        """Embed crops (blocking) and return their embeddings in order."""
+        futures = [self.submit(crop) for crop in crops]
+        return [f.result(timeout=timeout) for f in futures]
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_s * 1000.0,
+            }
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or the wait expires."""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stop.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            crops = [crop for crop, _ in batch]
+            try:
+                feats = np.asarray(self.rec_model.get_feat(crops))
+                for (_, future), feat in zip(batch, feats):
+                    future.set_result(feat.flatten())
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+
+        # Fail anything still waiting so request threads do not hang on shutdown
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("recognition batcher stopped"))
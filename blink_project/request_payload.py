@@ -0,0 +1,125 @@
+"""
+Request body parsing for the face server endpoints
+Accepts images as data-URI base64 inside JSON (original format), as
+multipart/form-data file parts, or as a raw application/octet-stream /
+image/jpeg body, and decodes them with as few copies as possible
+"""
+
+import base64
+import io
+import json
+
+import cv2
+import numpy as np
+
+RAW_IMAGE_TYPES = ('application/octet-stream', 'image/jpeg', 'image/png')
+
+
+def decode_base64_bytes(b64_str):
+    """Decode a base64 string (with or without data URI prefix) to raw image bytes."""
+    raw_b64 = b64_str.split(",")[1] if "," in b64_str else b64_str
+    return base64.b64decode(raw_b64)
+
+
+def decode_image_bytes(img_bytes):
+    """Decode encoded image bytes (JPEG/PNG, any buffer) to OpenCV BGR image."""
+    npimg = np.frombuffer(img_bytes, np.uint8)
+    if npimg.size == 0:
+        return None
+    return cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+
+
+def decode_base64_image(b64_str):
+    """Decode a base64 / data URI image string to OpenCV BGR image (None if undecodable)."""
+    return decode_image_bytes(decode_base64_bytes(b64_str))
+
+
+def _file_buffer(storage):
+    """Zero-copy view of an uploaded file part when it is held in memory."""
+    stream = storage.stream
+    if isinstance(stream, io.BytesIO):
+        return stream.getbuffer()
+    stream.seek(0)
+    return stream.read()
+
+
+class RequestPayload:
+    """Uniform access to a request's fields and images, whatever the body format"""
+
+    def __init__(self, req, raw_image_field=None):
+        """
+        Args:
+            req: Flask request
+            raw_image_field: Field name a raw (non-JSON, non-multipart) request
+                body stands for, e.g. 'frame'. Other fields then come from the
+                query string.
+        """
+        self.args = req.args
+        self.json = {}
+        self.form = {}
+        self.files = {}
+        self.raw_field = None
+        self.raw_body = None
+
+        mimetype = req.mimetype
+        if mimetype == 'multipart/form-data':
+            self.form = req.form
+            self.files = req.files
+        elif mimetype in RAW_IMAGE_TYPES and raw_image_field:
+            self.raw_field = raw_image_field
+            # Read once from the stream without caching a second copy on the request
+            self.raw_body = req.get_data(cache=False)
+        else:
+            self.json = req.get_json(silent=True) or {}
+
+    @property
+    def format(self):
+        if self.raw_field:
+            return 'raw'
+        if self.files or self.form:
+            return 'multipart'
+        return 'json'
+
+    def get(self, key, default=None):
+        """Non-image field from the JSON body, form fields or query string."""
+        if key in self.json:
+            return self.json[key]
+        if key in self.form:
+            return self.form[key]
+        return self.args.get(key, default)
+
+    def get_json_field(self, key, default=None):
+        """Structured field: JSON value as-is, or a form/query field holding JSON text."""
+        value = self.get(key, default)
+        if isinstance(value, str) and key not in self.json:
+            try:
+                return json.loads(value)
+            except ValueError:
+                return default
+        return value
+
+    def has_image(self, key):
+        if key == self.raw_field:
+            return bool(self.raw_body)
+        if key in self.files:
+            return True
+        value = self.json.get(key) or self.form.get(key)
+        return bool(value)
+
+    def image_bytes(self, key):
+        """Encoded image bytes for a field (bytes or memoryview), or None."""
+        if key == self.raw_field:
+            return self.raw_body or None
+        if key in self.files:
+            return _file_buffer(self.files[key])
+        value = self.json.get(key) or self.form.get(key)
+        if not value:
+            return None
+        return decode_base64_bytes(value)
+
+    def image(self, key):
+        """Decoded BGR image for a field, or None if missing/undecodable."""
+        img_bytes = self.image_bytes(key)
+        if img_bytes is None:
+            return None
+        return decode_image_bytes(img_bytes)
@@ -0,0 +1,131 @@
+"""
+Sampling request profiler for server.py
+Wraps 1 in N requests (or requests carrying the profiling header) in cProfile
+and writes one .prof file per request under <dir>/<route>/, keeping only the
+newest files per route. Run as a script to aggregate the saved profiles into
+the top-N hot functions.
+
+Only one request per process is profiled at a time (cProfile cannot run in
+several threads at once); requests arriving meanwhile are not profiled. With
+recognition batching enabled, ArcFace inference runs on the batcher thread
+and shows up in a request profile as time waiting on Future.result().
+
+Usage: python request_profiler.py [profiles_dir] [--route /verify_face] [--top 25] [--sort cumulative]
+"""
+
+import argparse
+import cProfile
+import datetime
+import glob
+import itertools
+import os
+import pstats
+import re
+import threading
+
+PROFILE_HEADER = 'X-Blink-Profile'
+
+
+def route_slug(route):
+    """File-system safe folder name for a URL rule, e.g. /registered_faces/<name> -> registered_faces_name."""
+    return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores their cProfile output"""
+
+    def __init__(self, out_dir, sample_every=0, max_files_per_route=50, header_token=None):
+        """
+        Args:
+            out_dir: Folder the per-route profile folders are created in
+            sample_every: Profile 1 in N requests (0 = no sampling, header only)
+            max_files_per_route: Oldest profiles beyond this are deleted
+            header_token: Secret that PROFILE_HEADER must carry to force profiling
+                a request (None = the header is ignored)
+        """
+        self.out_dir = out_dir
+        self.sample_every = max(0, int(sample_every))
+        self.max_files_per_route = max(1, int(max_files_per_route))
+        self.header_token = header_token
+        self._counter = itertools.count(1)
+        self._busy = threading.Lock()
+        self.written = 0
+        self.skipped_busy = 0
+
+    @property
+    def enabled(self):
+        return bool(self.sample_every or self.header_token)
+
+    def wanted(self, headers):
+        """Whether the request with these headers should be profiled."""
+        if self.header_token and headers.get(PROFILE_HEADER) == self.header_token:
+            return True
+        return bool(self.sample_every) and next(self._counter) % self.sample_every == 0
+
+    def start(self):
+        """Start profiling the current thread; returns the profile, or None if another is running."""
+        if not self._busy.acquire(blocking=False):
+            self.skipped_busy += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile, route):
+        """Stop a profile from start() and save it under the route's folder."""
+        try:
+            profile.disable()
+        finally:
+            self._busy.release()
+
+        route_dir = os.path.join(self.out_dir, route_slug(route))
+        os.makedirs(route_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        profile.dump_stats(os.path.join(route_dir, f"{stamp}_{os.getpid()}.prof"))
+        self.written += 1
+        self._enforce_cap(route_dir)
+
+    def _enforce_cap(self, route_dir):
+        files = sorted(glob.glob(os.path.join(route_dir, "*.prof")))
+        for path in files[:-self.max_files_per_route]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def aggregate(profiles_dir, route=None):
+    """
+    Merge saved profiles into one pstats.Stats.
+
+    Returns:
+        (stats, number_of_files), stats is None if no profile was found
+    """
+    pattern = os.path.join(profiles_dir, route_slug(route) if route else "*", "*.prof")
+    files = sorted(glob.glob(pattern))
+    if not files:
+        return None, 0
+    stats = pstats.Stats(files[0])
+    for path in files[1:]:
+        stats.add(path)
+    return stats, len(files)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Top hot functions across sampled request profiles")
+    parser.add_argument('profiles_dir', nargs='?', default=os.environ.get('BLINK_PROFILE_DIR', 'profiles'))
+    parser.add_argument('--route', default=None, help="Only this route, e.g. /classify_face")
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'])
+    args = parser.parse_args()
+
+    stats, count = aggregate(args.profiles_dir, args.route)
+    if stats is None:
+        raise SystemExit(f"No profiles found in {args.profiles_dir}")
+    print(f"{count} profile(s) from {args.profiles_dir}" + (f" for {args.route}" if args.route else ""))
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
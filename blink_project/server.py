@@ -1,30 +1,278 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template
 import cv2
 import numpy as np
 import os
 import datetime
-import base64
 import json
-from server_classification import classify_frames, detect_spectacles_in_frame
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+_IMPORT_START = time.perf_counter()
+
+import server_classification
+from server_classification import analyze_frame, classify_frame_stream, detect_spectacles_with_landmarks
+from spectacle_cache import REUSE_LANDMARKS, REUSE_RESULT, SpectacleResultCache, frame_thumbnail
+import spectacle_detection_cnn
+from face_gallery import EMBEDDING_DIM, FaceGallery, normalize_embedding
+from gallery_cache import EmbeddingCache
+from embedding_lru import EmbeddingLRUCache, photo_hash
+from attendance_store import AttendanceStore
+from recognition_batcher import RecognitionBatcher
+from frame_writer import FrameWriter
+from request_payload import RequestPayload, decode_base64_bytes, decode_base64_image, decode_image_bytes
+from json_stream import iter_json_object
+from process_stats import peak_rss_mb, rss_mb
+from request_profiler import RequestProfiler
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY, Counter, Gauge, Histogram
 
 # --- InsightFace-based face recognition ---
 FACE_RECOGNITION_AVAILABLE = False
+# FACE_MODEL_VARIANT=int8 loads the quantized pack built by quantize_models.py
+# (check it first with eval_quantized.py). Embeddings are cached per model name.
+FACE_MODEL_VARIANT = os.environ.get('FACE_MODEL_VARIANT', 'fp32')
+FACE_MODEL_NAME = 'buffalo_l_int8' if FACE_MODEL_VARIANT == 'int8' else 'buffalo_l'
+# Only what the verification routes use; the pack's 2d106/3d68/genderage
+# models are never loaded.
+FACE_ALLOWED_MODULES = ['detection', 'recognition']
 face_app = None
+face_models_load_seconds = None
 
 try:
     from insightface.app import FaceAnalysis
-    face_app = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
-    face_app.prepare(ctx_id=0, det_size=(640, 640))
-    FACE_RECOGNITION_AVAILABLE = True
-    print("InsightFace loaded successfully (buffalo_l model).")
+    from insightface.app.common import Face
+    from insightface.utils import face_align
 except Exception as e:
-    print(f"WARNING: InsightFace not available: {e}. Face verification will be disabled.")
+    print(f"WARNING: InsightFace import failed: {e}")
+
+# ONNX Runtime threads per process (0 = ORT default, one per core). With several
+# worker processes, set these so workers x threads does not oversubscribe the CPU.
+ORT_INTRA_OP_THREADS = int(os.environ.get('ORT_INTRA_OP_THREADS', '0'))
+ORT_INTER_OP_THREADS = int(os.environ.get('ORT_INTER_OP_THREADS', '0'))
+
+# Micro-batching of ArcFace recognition across concurrent requests
+# (RECOGNITION_BATCH_SIZE=1 turns it off and embeds inline)
+RECOGNITION_BATCH_SIZE = int(os.environ.get('RECOGNITION_BATCH_SIZE', '16'))
+RECOGNITION_BATCH_WAIT_MS = float(os.environ.get('RECOGNITION_BATCH_WAIT_MS', '5'))
+recognition_batcher = None
+
+# SCRFD input sizes, tried smallest first. The default is fixed 640.
+# FACE_DET_SIZES=320,640 opts in to adaptive detection: a close-up check-in
+# selfie is found at 320 for about a quarter of the 640 cost, and the next size
+# only runs when no face, or a face smaller than FACE_DET_MIN_FACE_PX at that
+# input size, is found. Check recognition accuracy on your own check-in photos
+# before enabling it.
+FACE_DET_SIZES = sorted(int(s) for s in os.environ.get('FACE_DET_SIZES', '640').split(','))
+FACE_DET_MIN_FACE_PX = float(os.environ.get('FACE_DET_MIN_FACE_PX', '40'))
+
+# --- Metrics (served at /metrics) ---
+REQUEST_LATENCY = Histogram('blink_request_duration_seconds', 'Request latency by route',
+                            ['route', 'method', 'status'])
+STAGE_LATENCY = Histogram('blink_stage_duration_seconds', 'Latency of request processing stages',
+                          ['route', 'stage'])
+FACE_RESULTS = Counter('blink_face_results_total', 'Face verification outcomes (match, no_match, '
+                       'no_face, no_blink, multiple_faces, error)', ['route', 'result'])
+IN_FLIGHT = Gauge('blink_requests_in_flight', 'Requests currently being processed')
+
+
+# Opt-in request profiling: cProfile 1 in BLINK_PROFILE_SAMPLE requests, and/or
+# any request sending "X-Blink-Profile: <BLINK_PROFILE_TOKEN>". Profiles go to
+# BLINK_PROFILE_DIR/<route>/; aggregate them with `python request_profiler.py`.
+PROFILER = RequestProfiler(
+    os.environ.get('BLINK_PROFILE_DIR', 'profiles'),
+    sample_every=int(os.environ.get('BLINK_PROFILE_SAMPLE', '0')),
+    max_files_per_route=int(os.environ.get('BLINK_PROFILE_MAX_FILES', '50')),
+    header_token=os.environ.get('BLINK_PROFILE_TOKEN') or None,
+)
+
+
+def current_route():
+    """URL rule of the request being handled (bounded label values), or 'none' outside a request."""
+    try:
+        rule = request.url_rule
+    except RuntimeError:
+        return 'none'
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def stage(name):
+    """Context manager timing one processing stage of the current request."""
+    return STAGE_LATENCY.time(route=current_route(), stage=name)
+
+
+def configure_onnx_threads(analysis):
+    """Recreate each InsightFace ONNX session with the configured thread counts."""
+    if not ORT_INTRA_OP_THREADS and not ORT_INTER_OP_THREADS:
+        return
+
+    import onnxruntime as ort
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    so.inter_op_num_threads = ORT_INTER_OP_THREADS
+    for model in analysis.models.values():
+        model.session = ort.InferenceSession(
+            model.model_file, sess_options=so, providers=model.session.get_providers()
+        )
+
+
+def init_face_recognition():
+    """
+    Load the InsightFace models into this process. Safe to call repeatedly.
+
+    Returns:
+        True if face recognition is available
+    """
+    global face_app, recognition_batcher, face_models_load_seconds, FACE_RECOGNITION_AVAILABLE
+    if face_app is not None:
+        return True
+
+    try:
+        start = time.perf_counter()
+        analysis = FaceAnalysis(
+            name=FACE_MODEL_NAME,
+            allowed_modules=FACE_ALLOWED_MODULES,
+            providers=['CPUExecutionProvider'],
+        )
+        analysis.prepare(ctx_id=0, det_size=(FACE_DET_SIZES[-1], FACE_DET_SIZES[-1]))
+        configure_onnx_threads(analysis)
+        if RECOGNITION_BATCH_SIZE > 1:
+            recognition_batcher = RecognitionBatcher(
+                analysis.models['recognition'],
+                max_batch_size=RECOGNITION_BATCH_SIZE,
+                max_wait_ms=RECOGNITION_BATCH_WAIT_MS,
+            )
+        face_app = analysis
+        face_models_load_seconds = time.perf_counter() - start
+        FACE_RECOGNITION_AVAILABLE = True
+        print(f"InsightFace loaded successfully ({FACE_MODEL_NAME} model, "
+              f"modules: {', '.join(sorted(analysis.models))}, pid {os.getpid()}) "
+              f"in {face_models_load_seconds:.2f}s, RSS {rss_mb() or 0:.0f} MB.")
+    except Exception as e:
+        print(f"WARNING: InsightFace not available: {e}. Face verification will be disabled.")
+
+    return FACE_RECOGNITION_AVAILABLE
+
+
+def release_face_recognition():
+    """Drop this process's ONNX sessions (used by the pre-fork master before spawning workers)."""
+    global face_app, recognition_batcher, FACE_RECOGNITION_AVAILABLE
+    if recognition_batcher is not None:
+        recognition_batcher.stop()
+        recognition_batcher = None
+    face_app = None
+    FACE_RECOGNITION_AVAILABLE = False
+
+
+def detect_faces(frame):
+    """
+    Run SCRFD at the smallest configured input size that finds every face
+    at a usable size (see FACE_DET_SIZES). If only a smaller size found any
+    faces, that result is returned rather than the larger sizes' empty one.
+
+    Args:
+        frame: OpenCV BGR image
+
+    Returns:
+        (bboxes, kpss, det_size) as returned by SCRFD.detect, plus the input size used
+    """
+    h, w = frame.shape[:2]
+    best = None
+    for det_size in FACE_DET_SIZES:
+        bboxes, kpss = face_app.det_model.detect(
+            frame, input_size=(det_size, det_size), max_num=0, metric='default'
+        )
+        if bboxes.shape[0] == 0:
+            continue
+        best = bboxes, kpss, det_size
+        # Smallest face side in detector pixels; tiny faces get imprecise keypoints
+        face_px = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1]).min()
+        if face_px * det_size / max(h, w) >= FACE_DET_MIN_FACE_PX:
+            break
+    # A small face found at one size still beats nothing at the larger sizes
+    return best if best is not None else (bboxes, kpss, det_size)
+
+
+def analyze_faces(frame):
+    """
+    Detect faces and compute their ArcFace embeddings.
+
+    Same result as face_app.get() for the fields the routes use (bbox, kps,
+    det_score, embedding), but detection uses the adaptive input size and
+    recognition goes through the micro-batcher so simultaneous requests share
+    one ONNX call.
+
+    Args:
+        frame: OpenCV BGR image
+
+    Returns:
+        List of insightface Face objects, highest detection score first. Each
+        also carries det_size, the SCRFD input size that found it.
+    """
+    with stage('detection'):
+        bboxes, kpss, det_size = detect_faces(frame)
+    if bboxes.shape[0] == 0:
+        return []
+
+    with stage('embedding'):
+        rec_model = face_app.models['recognition']
+        crops = [face_align.norm_crop(frame, landmark=kps, image_size=rec_model.input_size[0]) for kps in kpss]
+        if recognition_batcher is not None:
+            embeddings = recognition_batcher.embed_many(crops)
+        else:
+            embeddings = rec_model.get_feat(crops)
+
+    return [
+        Face(bbox=bboxes[i, 0:4], kps=kpss[i], det_score=bboxes[i, 4], embedding=embeddings[i],
+             det_size=det_size)
+        for i in range(bboxes.shape[0])
+    ]
+
+
+# /check_spectacles polls that carry a session id reuse that session's last
+# result while the frame barely changes (see spectacle_cache.py).
+# BLINK_SPECTACLE_CACHE=0 turns this off.
+SPECTACLE_CACHE_ENABLED = os.environ.get('BLINK_SPECTACLE_CACHE', '1') != '0'
+SPECTACLE_CACHE = SpectacleResultCache(
+    result_diff=float(os.environ.get('BLINK_SPECTACLE_RESULT_DIFF', '3')),
+    landmark_diff=float(os.environ.get('BLINK_SPECTACLE_LANDMARK_DIFF', '10')),
+    max_age_s=float(os.environ.get('BLINK_SPECTACLE_MAX_AGE_S', '2')),
+)
+SPECTACLE_CACHE_RESULTS = Counter('blink_spectacle_cache_total', '/check_spectacles polls by cache outcome '
+                                  '(result, landmarks, miss)', ['outcome'])
+
+# Spectacle scoring: BLINK_SPECTACLE_MODEL points at an ONNX eye-crop classifier
+# (contract in spectacle_onnx.py); without one, or if it fails to load, the
+# OpenCV heuristics in spectacle_detection_cnn.py are used.
+SPECTACLE_MODEL = os.environ.get('BLINK_SPECTACLE_MODEL', '')
+SPECTACLE_THRESHOLD = float(os.environ.get('BLINK_SPECTACLE_THRESHOLD', '0.5'))
+
+
+def init_spectacle_backend():
+    """Load the ONNX spectacle classifier into this process, if one is configured."""
+    if not SPECTACLE_MODEL or spectacle_detection_cnn.get_backend() is not None:
+        return
+    try:
+        from spectacle_onnx import OnnxSpectacleClassifier
+        spectacle_detection_cnn.set_backend(OnnxSpectacleClassifier(SPECTACLE_MODEL, threshold=SPECTACLE_THRESHOLD))
+        print(f"Spectacle detection: ONNX classifier {SPECTACLE_MODEL} (pid {os.getpid()})")
+    except Exception as e:
+        print(f"WARNING: spectacle model {SPECTACLE_MODEL} not loaded, using heuristics: {e}")
+
+
+# The production server (gunicorn.conf.py) defers this so each worker process
+# builds its own ONNX sessions after fork.
+if os.environ.get('BLINK_DEFER_MODEL_LOAD') != '1':
+    init_face_recognition()
+    init_spectacle_backend()
 
 app = Flask(__name__)
 
 MAIN_FOLDER = "captured_images"
 REGISTERED_FACES_DIR = "registered_faces"
-ATTENDANCE_LOG = "attendance_log.json"
+EMBEDDING_CACHE_DIR = os.path.join(REGISTERED_FACES_DIR, ".embedding_cache")
+ATTENDANCE_LOG = "attendance_log.json"  # legacy log, imported once into ATTENDANCE_DB
+ATTENDANCE_DB = "attendance.db"
 
 os.makedirs(MAIN_FOLDER, exist_ok=True)
 
@@ -32,50 +280,174 @@ session_name = datetime.datetime.now().strftime("session_%Y-%m-%d_%H-%M-%S")
 SESSION_FOLDER = os.path.join(MAIN_FOLDER, session_name)
 os.makedirs(SESSION_FOLDER, exist_ok=True)
 
-print("Saving images to:", SESSION_FOLDER)
+# Verification frames are saved off the request path: BLINK_SAVE_FRAMES is
+# all / sample (every BLINK_SAVE_SAMPLE_EVERY-th frame) / off. Old session_*
+# folders are swept by age (BLINK_RETENTION_DAYS) and/or total size
+# (BLINK_RETENTION_MAX_MB); 0 disables either limit.
+FRAME_WRITER = FrameWriter(
+    SESSION_FOLDER,
+    mode=os.environ.get('BLINK_SAVE_FRAMES', 'all'),
+    sample_every=int(os.environ.get('BLINK_SAVE_SAMPLE_EVERY', 10)),
+    jpeg_quality=int(os.environ.get('BLINK_JPEG_QUALITY', 95)),
+    max_queue=int(os.environ.get('BLINK_SAVE_QUEUE_SIZE', 64)),
+    main_folder=MAIN_FOLDER,
+    max_age_days=float(os.environ.get('BLINK_RETENTION_DAYS', 0)),
+    max_total_mb=float(os.environ.get('BLINK_RETENTION_MAX_MB', 0)),
+    sweep_interval_s=float(os.environ.get('BLINK_RETENTION_SWEEP_S', 600)),
+)
+FRAME_WRITER.sweep()
+
+print(f"Saving images to: {SESSION_FOLDER} (mode: {FRAME_WRITER.mode})")
+
+# /upload_nodes liveness: frames are decoded and landmarked on this pool while
+# the rest of the body is still being parsed. At most BLINK_MAX_UPLOAD_FRAMES
+# frames of one upload are examined.
+BLINK_FRAME_WORKERS = int(os.environ.get('BLINK_FRAME_WORKERS', 4))
+BLINK_MAX_UPLOAD_FRAMES = int(os.environ.get('BLINK_MAX_UPLOAD_FRAMES', 150))
+FRAME_POOL = ThreadPoolExecutor(max_workers=BLINK_FRAME_WORKERS, thread_name_prefix='frame')
+
+# One FaceLandmarker per thread that can landmark at the same time: the request
+# threads (BLINK_THREADS, as in gunicorn.conf.py) plus the frame pool
+server_classification.LANDMARKERS.size = int(os.environ.get(
+    'BLINK_LANDMARKER_POOL_SIZE', int(os.environ.get('BLINK_THREADS', 2)) + BLINK_FRAME_WORKERS))
+LANDMARKER_WAIT = Histogram('blink_landmarker_wait_seconds', 'Time spent waiting for a free FaceLandmarker')
+server_classification.LANDMARKERS.on_wait = LANDMARKER_WAIT.observe
+
+ATTENDANCE = AttendanceStore(ATTENDANCE_DB)
+ATTENDANCE.import_json_log(ATTENDANCE_LOG)
+
+# InsightFace cosine similarity threshold: 0.4 is a reasonable match threshold
+MATCH_THRESHOLD = 0.4
 
 # --- Pre-load registered face embeddings at startup ---
-REGISTERED_EMPLOYEES = []
+GALLERY = FaceGallery()
 
+# On-disk embeddings of registered_faces/. Also how worker processes see each
+# other's registrations: a changed manifest means the gallery must be reloaded.
+EMBEDDING_CACHE = EmbeddingCache(EMBEDDING_CACHE_DIR, model_name=FACE_MODEL_NAME)
+_embedding_cache_lock = threading.Lock()
+_gallery_cache_mtime = None
 
-def load_registered_faces():
-    """Load all registered face images and compute 512D InsightFace embeddings."""
-    global REGISTERED_EMPLOYEES
-    REGISTERED_EMPLOYEES = []
+# Embeddings of employee photos sent to /classify_face, keyed by photo hash
+PHOTO_EMBEDDINGS = EmbeddingLRUCache(max_entries=4096, max_bytes=64 * 1024 * 1024)
 
-    if not FACE_RECOGNITION_AVAILABLE:
-        print("InsightFace not available — skipping registered face loading.")
-        return
+
+def load_registered_faces():
+    """
+    Load all registered face images and their 512D InsightFace embeddings.
+    Embeddings are reused from the on-disk cache; only new or changed photos
+    are run through the model (loaded on first need). The gallery is swapped
+    in only once loading finishes, so requests keep matching against the old
+    contents meanwhile.
+    """
+    global _gallery_cache_mtime
 
     if not os.path.isdir(REGISTERED_FACES_DIR):
         print(f"WARNING: {REGISTERED_FACES_DIR}/ directory not found. No faces registered.")
+        GALLERY.build([])
         return
 
-    for filename in os.listdir(REGISTERED_FACES_DIR):
-        if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            continue
+    with _embedding_cache_lock, EMBEDDING_CACHE.locked():
+        cache = EMBEDDING_CACHE
+        cache.load()
 
-        filepath = os.path.join(REGISTERED_FACES_DIR, filename)
-        name = os.path.splitext(filename)[0]  # anish.jpg -> anish
+        seen_files = []
+        num_cached = 0
+        models_ready = None
+        for filename in sorted(os.listdir(REGISTERED_FACES_DIR)):
+            if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                continue
 
-        img = cv2.imread(filepath)
-        if img is None:
-            print(f"  SKIPPED (cannot read): {filename}")
-            continue
+            filepath = os.path.join(REGISTERED_FACES_DIR, filename)
+            name = os.path.splitext(filename)[0]  # anish.jpg -> anish
+
+            record = cache.get(filename, filepath)
+            if record is not None:
+                num_cached += 1
+            else:
+                if models_ready is None:
+                    models_ready = init_face_recognition()
+                if not models_ready:
+                    print(f"  SKIPPED (InsightFace not available): {filename}")
+                    continue
+
+                img = cv2.imread(filepath)
+                if img is None:
+                    print(f"  SKIPPED (cannot read): {filename}")
+                    continue
+
+                faces = analyze_faces(img)
+                record = cache.put(filename, filepath, name, faces[0].embedding if faces else None)
+            seen_files.append(filename)
+
+            if record['embedding'] is not None:
+                print(f"  Registered: {name} ({filename})")
+            else:
+                print(f"  SKIPPED (no face detected): {filename}")
+
+        try:
+            cache.save(keep_files=seen_files)
+        except OSError as e:
+            print(f"WARNING: Could not write embedding cache: {e}")
 
-        faces = face_app.get(img)
+        GALLERY.build(cache.entries())
+        _gallery_cache_mtime = cache.manifest_mtime_ns()
 
-        if faces:
-            REGISTERED_EMPLOYEES.append({
-                'name': name,
-                'embedding': faces[0].embedding,  # 512D normed vector
-                'file': filename,
-            })
-            print(f"  Registered: {name} ({filename})")
-        else:
-            print(f"  SKIPPED (no face detected): {filename}")
+    print(f"Loaded {len(GALLERY)} registered faces ({num_cached} from cache, {len(seen_files) - num_cached} embedded).")
 
-    print(f"Loaded {len(REGISTERED_EMPLOYEES)} registered faces.")
+
+def refresh_gallery_if_stale():
+    """
+    Reload the gallery from the embedding cache if another worker process has
+    registered or deleted a face since we last looked. Costs one stat() when
+    nothing changed and never runs the model.
+    """
+    global _gallery_cache_mtime
+
+    mtime = EMBEDDING_CACHE.manifest_mtime_ns()
+    if mtime is None or mtime == _gallery_cache_mtime:
+        return
+
+    with _embedding_cache_lock, EMBEDDING_CACHE.locked(exclusive=False):
+        mtime = EMBEDDING_CACHE.manifest_mtime_ns()
+        if mtime == _gallery_cache_mtime:
+            return
+        # Don't retry this manifest on every request; the next write changes its mtime
+        _gallery_cache_mtime = mtime
+        if EMBEDDING_CACHE.load() is None:
+            print(f"Embedding cache unreadable; keeping the current gallery ({len(GALLERY)} faces, pid {os.getpid()}).")
+            return
+        GALLERY.build(EMBEDDING_CACHE.entries())
+    print(f"Gallery reloaded from embedding cache ({len(GALLERY)} faces, pid {os.getpid()}).")
+
+
+def persist_gallery_change(filename, filepath=None, name=None, embedding=None):
+    """
+    Record a registration (or, with filepath=None, a deletion) in the on-disk
+    embedding cache so restarts and other worker processes pick it up.
+    """
+    global _gallery_cache_mtime
+
+    with _embedding_cache_lock:
+        try:
+            with EMBEDDING_CACHE.locked():
+                # Start from the latest state on disk; another worker may have
+                # written it. If it is unreadable, the records from our last
+                # good load are kept rather than saving just this one change.
+                stale = EMBEDDING_CACHE.manifest_mtime_ns() != _gallery_cache_mtime
+                loaded = EMBEDDING_CACHE.load() is not None
+                if filepath is None:
+                    EMBEDDING_CACHE.remove(filename)
+                else:
+                    EMBEDDING_CACHE.put(filename, filepath, name, embedding)
+                EMBEDDING_CACHE.save()
+                _gallery_cache_mtime = EMBEDDING_CACHE.manifest_mtime_ns()
+                # Other workers' changes we hadn't reloaded yet are in this
+                # manifest, and marking it current would otherwise skip them
+                if stale and loaded:
+                    GALLERY.build(EMBEDDING_CACHE.entries())
+        except OSError as e:
+            print(f"WARNING: Could not update embedding cache: {e}")
 
 
 def cosine_similarity(a, b):
@@ -91,41 +463,36 @@ def verify_face_against_registered(frame):
         frame: OpenCV BGR image
 
     Returns:
-        dict with matched, employee_name, confidence, num_faces
+        dict with matched, employee_name, confidence, num_faces, det_size
     """
-    if not REGISTERED_EMPLOYEES:
+    if not GALLERY:
         return {'matched': False, 'employee_name': None, 'confidence': 0.0, 'num_faces': 0, 'error': 'No registered faces loaded'}
 
-    faces = face_app.get(frame)
+    faces = analyze_faces(frame)
+    # Detection only gives up on a frame after trying the largest input size
+    det_size = faces[0].det_size if faces else FACE_DET_SIZES[-1]
 
     if not faces:
-        return {'matched': False, 'employee_name': None, 'confidence': 0.0, 'num_faces': 0, 'error': 'No face detected in captured frame'}
+        return {'matched': False, 'employee_name': None, 'confidence': 0.0, 'num_faces': 0, 'det_size': det_size, 'error': 'No face detected in captured frame'}
 
     if len(faces) > 1:
-        return {'matched': False, 'employee_name': None, 'confidence': 0.0, 'num_faces': len(faces), 'error': 'multiple_faces_detected'}
+        return {'matched': False, 'employee_name': None, 'confidence': 0.0, 'num_faces': len(faces), 'det_size': det_size, 'error': 'multiple_faces_detected'}
 
-    captured_embedding = faces[0].embedding
+    # Compare against every registered employee in one matrix-vector product
+    with stage('gallery_search'):
+        best = GALLERY.best_match(faces[0].embedding)
+    best_score = best['score']
 
-    # Compare against each registered employee using cosine similarity
-    best_score = -1.0
-    best_idx = -1
-
-    for i, emp in enumerate(REGISTERED_EMPLOYEES):
-        score = cosine_similarity(captured_embedding, emp['embedding'])
-        if score > best_score:
-            best_score = score
-            best_idx = i
-
-    # InsightFace cosine similarity threshold: 0.4 is a reasonable match threshold
     confidence = round(max(0.0, min(1.0, best_score)), 4)
-    is_match = best_score >= 0.4
+    is_match = best_score >= MATCH_THRESHOLD
 
     if is_match:
         return {
             'matched': True,
-            'employee_name': REGISTERED_EMPLOYEES[best_idx]['name'],
+            'employee_name': best['name'],
             'confidence': confidence,
             'num_faces': 1,
+            'det_size': det_size,
             'error': None,
         }
     else:
@@ -134,12 +501,13 @@ def verify_face_against_registered(frame):
             'employee_name': None,
             'confidence': confidence,
             'num_faces': 1,
+            'det_size': det_size,
             'error': None,
         }
 
 
 def log_attendance(employee_name, status, confidence, session):
-    """Append an attendance entry to the JSON log file."""
+    """Append an attendance entry to the attendance store."""
     entry = {
         'timestamp': datetime.datetime.now().isoformat(),
         'employee': employee_name,
@@ -148,33 +516,77 @@ def log_attendance(employee_name, status, confidence, session):
         'session': session,
     }
 
-    log = []
-    if os.path.exists(ATTENDANCE_LOG):
-        try:
-            with open(ATTENDANCE_LOG, 'r') as f:
-                log = json.load(f)
-        except (json.JSONDecodeError, IOError):
-            log = []
-
-    log.append(entry)
-
-    with open(ATTENDANCE_LOG, 'w') as f:
-        json.dump(log, f, indent=2)
+    with stage('attendance_write'):
+        ATTENDANCE.append(entry)
 
     print(f"  ATTENDANCE: {employee_name or 'UNKNOWN'} -> {status} (confidence: {confidence})")
     return entry
 
 
-def decode_base64_frame(b64_str):
-    """Decode a base64 string (with or without data URI prefix) to OpenCV BGR image."""
-    raw_b64 = b64_str.split(",")[1] if "," in b64_str else b64_str
-    img_bytes = base64.b64decode(raw_b64)
-    npimg = np.frombuffer(img_bytes, np.uint8)
-    return cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+def cached_photo_embedding(img_bytes):
+    """
+    Return the face embedding for an employee photo, running InsightFace only
+    the first time a given photo is seen.
+
+    Returns:
+        Embedding, or None if the photo cannot be decoded or has no face
+    """
+    key = photo_hash(img_bytes)
+    found, embedding = PHOTO_EMBEDDINGS.lookup(key)
+    if found:
+        return embedding
+
+    embedding = None
+    ref_frame = decode_image_bytes(img_bytes)
+    if ref_frame is not None:
+        ref_faces = analyze_faces(ref_frame)
+        if ref_faces:
+            embedding = ref_faces[0].embedding
+
+    PHOTO_EMBEDDINGS.put(key, embedding)
+    return embedding
 
 
 # ---- Routes ----
 
+@app.before_request
+def start_request_profile():
+    if PROFILER.enabled and PROFILER.wanted(request.headers):
+        g.profile = PROFILER.start()
+
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        PROFILER.stop(profile, current_route())
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' in g:
+        REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, route=current_route(),
+                                method=request.method, status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def end_request_metrics(exc):
+    if 'request_start' in g:
+        IN_FLIGHT.dec()
+
+
+@app.before_request
+def sync_gallery():
+    refresh_gallery_if_stale()
+
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -185,27 +597,67 @@ def completed():
     return render_template('completed.html')
 
 
+def spectacle_session_key(payload):
+    """
+    Capture session a /check_spectacles poll belongs to, from the
+    "session_id" field or the X-Session-Id header; None without one. Client
+    address and user agent are not used, as users behind one NAT or proxy
+    would share a cache entry.
+    """
+    session_id = payload.get("session_id") or request.headers.get("X-Session-Id")
+    return str(session_id) if session_id else None
+
+
 @app.route('/check_spectacles', methods=['POST'])
 def check_spectacles():
+    """
+    Expects { "frame": ... } as base64 JSON, a multipart file part, or a raw
+    JPEG body, and optionally "session_id" (or an X-Session-Id header). Polls
+    whose frame hardly differs from the session's previous one reuse its
+    result; polls without a session id always run detection. The bundled
+    capture page (static/app.js) checks spectacles in the browser and does
+    not call this route, so the cache only helps clients that poll it with a
+    session id of their own.
+    Returns: { detected, confidence, cache }
+    """
     try:
-        data = request.get_json()
-        frame_b64 = data.get("frame", "")
+        payload = RequestPayload(request, raw_image_field="frame")
 
-        if not frame_b64:
+        if not payload.has_image("frame"):
             return jsonify({"detected": False, "confidence": 0.0})
 
         try:
-            frame = decode_base64_frame(frame_b64)
-            if frame is None:
-                return jsonify({"detected": False, "confidence": 0.0})
+            img_bytes = payload.image_bytes("frame")
         except Exception as e:
             print(f"Frame decode error: {e}")
             return jsonify({"detected": False, "confidence": 0.0})
+        if img_bytes is None:
+            return jsonify({"detected": False, "confidence": 0.0})
+
+        key = spectacle_session_key(payload) if SPECTACLE_CACHE_ENABLED else None
+        thumb = None
+        decision, cached = 'off', None
+        if key is not None:
+            thumb = frame_thumbnail(img_bytes)
+            decision, cached = SPECTACLE_CACHE.lookup(key, thumb)
+            SPECTACLE_CACHE_RESULTS.inc(outcome=decision)
+
+        if decision == REUSE_RESULT:
+            result = cached['result']
+        else:
+            frame = decode_image_bytes(img_bytes)
+            if frame is None:
+                return jsonify({"detected": False, "confidence": 0.0})
+            reused = cached if decision == REUSE_LANDMARKS else None
+            result, landmarks = detect_spectacles_with_landmarks(
+                frame, landmarks=reused['landmarks'] if reused else None)
+            if key is not None:
+                SPECTACLE_CACHE.store(key, thumb, result, landmarks, reused_from=reused)
 
-        result = detect_spectacles_in_frame(frame)
         return jsonify({
-            "detected": result['detected'],
-            "confidence": float(result['confidence'])
+            "detected": bool(result['detected']),
+            "confidence": float(result['confidence']),
+            "cache": decision,
         })
 
     except Exception as e:
@@ -213,17 +665,54 @@ def check_spectacles():
         return jsonify({"detected": False, "confidence": 0.0, "error": str(e)})
 
 
+@app.route('/analyze_frame', methods=['POST'])
+def analyze_frame_endpoint():
+    """
+    All per-frame capture checks from one landmarker pass, instead of
+    separate spectacle, liveness and face-count calls on the same frame.
+
+    Expects { "frame": ... } as base64 JSON, a multipart file part, or a raw
+    JPEG body.
+    Returns: { status, num_faces, brightness, too_bright } plus, when exactly
+    one face is found, { left_ear, right_ear, ear, spectacles: { detected,
+    confidence }, face_box: [x1, y1, x2, y2] }
+    """
+    try:
+        payload = RequestPayload(request, raw_image_field="frame")
+
+        if not payload.has_image("frame"):
+            return jsonify({"status": "failed", "error": "No frame provided"}), 400
+
+        try:
+            with stage('image_decode'):
+                frame = payload.image("frame")
+        except Exception as e:
+            return jsonify({"status": "failed", "error": f"Image decode error: {e}"}), 400
+        if frame is None:
+            return jsonify({"status": "failed", "error": "Failed to decode image"}), 400
+
+        with stage('analysis'):
+            analysis = analyze_frame(frame)
+        return jsonify({"status": "success", **analysis})
+
+    except Exception as e:
+        print(f"Frame analysis error: {e}")
+        return jsonify({"status": "failed", "error": str(e)}), 500
+
+
 @app.route('/verify_face', methods=['POST'])
 def verify_face_endpoint():
     """
     Simple face verification — takes ONE base64 photo, compares against all
     registered employees, logs attendance, and returns the result.
 
-    Expects JSON: { "frame": "data:image/jpeg;base64,..." }
-    Returns: { status, matched, employee_name, confidence, attendance }
+    Expects JSON: { "frame": "data:image/jpeg;base64,..." }, a multipart
+    "frame" file part, or a raw JPEG body (application/octet-stream).
+    Returns: { status, matched, employee_name, confidence, attendance, det_size }
     """
     try:
         if not FACE_RECOGNITION_AVAILABLE:
+            FACE_RESULTS.inc(route='/verify_face', result='error')
             return jsonify({
                 "status": "failed",
                 "matched": False,
@@ -232,10 +721,9 @@ def verify_face_endpoint():
                 "error": "Face recognition engine not available",
             })
 
-        data = request.get_json()
-        frame_b64 = data.get("frame", "")
+        payload = RequestPayload(request, raw_image_field="frame")
 
-        if not frame_b64:
+        if not payload.has_image("frame"):
             return jsonify({
                 "status": "failed",
                 "matched": False,
@@ -246,8 +734,12 @@ def verify_face_endpoint():
 
         # Decode
         try:
-            frame = decode_base64_frame(frame_b64)
+            with stage('payload_decode'):
+                img_bytes = payload.image_bytes("frame")
+            with stage('image_decode'):
+                frame = decode_image_bytes(img_bytes)
             if frame is None:
+                FACE_RESULTS.inc(route='/verify_face', result='error')
                 return jsonify({
                     "status": "failed",
                     "matched": False,
@@ -256,6 +748,7 @@ def verify_face_endpoint():
                     "error": "Failed to decode image",
                 })
         except Exception as e:
+            FACE_RESULTS.inc(route='/verify_face', result='error')
             return jsonify({
                 "status": "failed",
                 "matched": False,
@@ -264,10 +757,9 @@ def verify_face_endpoint():
                 "error": f"Image decode error: {e}",
             })
 
-        # Save the captured frame
-        os.makedirs(SESSION_FOLDER, exist_ok=True)
-        timestamp = datetime.datetime.now().strftime("%H%M%S")
-        cv2.imwrite(os.path.join(SESSION_FOLDER, f"verify_{timestamp}.jpg"), frame)
+        # Save the captured frame in the background (may be sampled or dropped)
+        with stage('frame_save'):
+            FRAME_WRITER.submit(frame, prefix="verify")
 
         # Verify against registered faces
         print(f"\n{'='*60}")
@@ -278,6 +770,7 @@ def verify_face_endpoint():
         if verification.get('error') == 'multiple_faces_detected':
             print(f"  REJECTED: Multiple faces detected ({verification.get('num_faces')})")
             print(f"{'='*60}\n")
+            FACE_RESULTS.inc(route='/verify_face', result='multiple_faces')
             return jsonify({
                 "status": "failed",
                 "matched": False,
@@ -285,21 +778,25 @@ def verify_face_endpoint():
                 "confidence": 0.0,
                 "error": "multiple_faces_detected",
                 "message": "Multiple faces detected. Only one person should be in the frame.",
+                "det_size": verification.get('det_size'),
             })
 
         # Check for no face
         if verification.get('num_faces', 0) == 0:
             print(f"  NO FACE detected")
             print(f"{'='*60}\n")
+            FACE_RESULTS.inc(route='/verify_face', result='no_face')
             return jsonify({
                 "status": "failed",
                 "matched": False,
                 "employee_name": None,
                 "confidence": 0.0,
                 "error": "No face detected in the photo. Please try again.",
+                "det_size": verification.get('det_size'),
             })
 
         attendance_status = 'PRESENT' if verification['matched'] else 'ABSENT'
+        FACE_RESULTS.inc(route='/verify_face', result='match' if verification['matched'] else 'no_match')
         attendance_entry = log_attendance(
             employee_name=verification.get('employee_name'),
             status=attendance_status,
@@ -319,10 +816,12 @@ def verify_face_endpoint():
             "employee_name": verification.get('employee_name'),
             "confidence": verification.get('confidence', 0.0),
             "attendance": attendance_entry,
+            "det_size": verification.get('det_size'),
         })
 
     except Exception as e:
         print(f"[VerifyFace] Error: {e}")
+        FACE_RESULTS.inc(route='/verify_face', result='error')
         return jsonify({
             "status": "failed",
             "matched": False,
@@ -332,35 +831,174 @@ def verify_face_endpoint():
         })
 
 
+@app.route('/upload_nodes', methods=['POST'])
+def upload_nodes():
+    """
+    Blink liveness over a captured frame sequence, then identity verification.
+
+    Expects JSON: { "all_frames": ["data:image/jpeg;base64,...", ...], "detection_cache": [...] }
+    The body is parsed incrementally and frames are processed as they arrive;
+    once the EAR drop between the most closed and most open frame reaches
+    MIN_BLINK_EAR_DROP no further frames are landmarked. Only a live session
+    is matched against the registered faces, using the most open-eye frame.
+    Returns: { status, liveness, blinked, unblinked, ear_drop, frames_received,
+               frames_processed, early_stop, matched, employee_name, confidence,
+               attendance, det_size }
+    """
+    fields = {}
+    frames_received = 0
+
+    def encoded_frames():
+        nonlocal frames_received
+        for key, value in iter_json_object(request.stream, stream_arrays=('all_frames',)):
+            if key != 'all_frames':
+                fields[key] = value
+            elif isinstance(value, str) and value:
+                frames_received += 1
+                yield value
+
+    try:
+        frames = encoded_frames()
+        try:
+            with stage('liveness'):
+                result = classify_frame_stream(
+                    islice(frames, BLINK_MAX_UPLOAD_FRAMES),
+                    decode_base64_image,
+                    FRAME_POOL,
+                    max_in_flight=BLINK_FRAME_WORKERS * 2,
+                    max_frames=BLINK_MAX_UPLOAD_FRAMES,
+                )
+            # Skip over frames that were not needed to reach detection_cache
+            for _ in frames:
+                pass
+        except ValueError as e:
+            print(f"[UploadNodes] Invalid body: {e}")
+            FACE_RESULTS.inc(route='/upload_nodes', result='error')
+            return jsonify({"status": "failed", "error": "Invalid JSON body"}), 400
+
+        if not frames_received:
+            return jsonify({"status": "failed", "error": "No frames received"})
+
+        tracker = result['tracker']
+        liveness = tracker.blink_detected
+        print(f"\n{'='*60}")
+        print(f"Liveness: {result['frames_submitted']}/{frames_received} frames examined, "
+              f"{tracker.face_frames} with one face, {tracker.no_face_count} no-face, "
+              f"drop={tracker.ear_drop:.4f}{' (early stop)' if result['early_stop'] else ''}")
+
+        with stage('frame_save'):
+            if fields.get('detection_cache') is not None:
+                stamp = datetime.datetime.now().strftime("%H%M%S_%f")
+                cache_path = os.path.join(SESSION_FOLDER, f"detection_cache_{stamp}_{os.getpid()}.json")
+                with open(cache_path, 'w') as f:
+                    json.dump(fields['detection_cache'], f)
+            if liveness:
+                FRAME_WRITER.submit(tracker.closed['frame'], prefix="blinked", subfolder="blinked")
+                FRAME_WRITER.submit(tracker.open['frame'], prefix="unblinked", subfolder="unblinked")
+
+        response = {
+            "status": "success",
+            "liveness": liveness,
+            "blinked": 1 if liveness else 0,
+            "unblinked": 1 if liveness else 0,
+            "ear_drop": round(tracker.ear_drop, 4),
+            "frames_received": frames_received,
+            "frames_processed": result['frames_processed'],
+            "early_stop": result['early_stop'],
+            "matched": False,
+            "employee_name": None,
+            "confidence": 0.0,
+        }
+
+        if tracker.multiple_faces:
+            print(f"  REJECTED: Multiple faces in {tracker.multiple_faces_count} frame(s)")
+            print(f"{'='*60}\n")
+            FACE_RESULTS.inc(route='/upload_nodes', result='multiple_faces')
+            response.update(status="failed", error="multiple_faces_detected",
+                            message="Multiple faces detected. Only one person should be in the frame.")
+            return jsonify(response)
+
+        if not liveness:
+            print(f"  LIVENESS FAILED — no significant blink detected")
+            print(f"{'='*60}\n")
+            FACE_RESULTS.inc(route='/upload_nodes', result='no_face' if tracker.closed is None else 'no_blink')
+            response.update(status="failed", error="No blink detected. Please try again.")
+            return jsonify(response)
+
+        print(f"  LIVENESS PASSED: closed frame {tracker.closed['frame_idx']}, open frame {tracker.open['frame_idx']}")
+        if not FACE_RECOGNITION_AVAILABLE:
+            print(f"{'='*60}\n")
+            response["error"] = "Face recognition engine not available"
+            return jsonify(response)
+
+        verification = verify_face_against_registered(tracker.open['frame'])
+        response["det_size"] = verification.get('det_size')
+        if verification.get('num_faces', 0) != 1:
+            error = verification.get('error') or 'No face detected in captured frame'
+            print(f"  VERIFICATION FAILED: {error}")
+            print(f"{'='*60}\n")
+            FACE_RESULTS.inc(route='/upload_nodes',
+                             result='multiple_faces' if error == 'multiple_faces_detected' else 'no_face')
+            response.update(status="failed", error=error)
+            return jsonify(response)
+
+        attendance_status = 'PRESENT' if verification['matched'] else 'ABSENT'
+        FACE_RESULTS.inc(route='/upload_nodes', result='match' if verification['matched'] else 'no_match')
+        response["attendance"] = log_attendance(
+            employee_name=verification.get('employee_name'),
+            status=attendance_status,
+            confidence=verification.get('confidence', 0.0),
+            session=session_name,
+        )
+        response.update(
+            matched=verification['matched'],
+            employee_name=verification.get('employee_name'),
+            confidence=verification.get('confidence', 0.0),
+        )
+        if verification['matched']:
+            print(f"  MATCH: {verification['employee_name']} (confidence: {verification['confidence']})")
+        else:
+            print(f"  NO MATCH (best confidence: {verification['confidence']})")
+        print(f"{'='*60}\n")
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"[UploadNodes] Error: {e}")
+        FACE_RESULTS.inc(route='/upload_nodes', result='error')
+        return jsonify({"status": "failed", "error": str(e)})
+
+
 @app.route('/compare_face', methods=['POST'])
 def compare_face_endpoint():
-    """Compare two face photos and return similarity."""
+    """
+    Compare two face photos and return similarity.
+    Expects "captured_frame" and "reference_face" as base64 JSON fields or
+    multipart file parts.
+    """
     try:
         if not FACE_RECOGNITION_AVAILABLE:
             return jsonify({"match": False, "confidence": 0.0, "error": "Face recognition engine not available"})
 
-        data = request.get_json()
-        captured_b64 = data.get("captured_frame", "")
-        reference_b64 = data.get("reference_face", "")
+        payload = RequestPayload(request)
 
-        if not captured_b64 or not reference_b64:
+        if not payload.has_image("captured_frame") or not payload.has_image("reference_face"):
             return jsonify({"match": False, "confidence": 0.0, "error": "Missing captured_frame or reference_face"})
 
-        captured_frame = decode_base64_frame(captured_b64)
-        reference_frame = decode_base64_frame(reference_b64)
+        captured_frame = payload.image("captured_frame")
+        reference_frame = payload.image("reference_face")
 
         if captured_frame is None or reference_frame is None:
             return jsonify({"match": False, "confidence": 0.0, "error": "Failed to decode image(s)"})
 
-        faces_cap = face_app.get(captured_frame)
-        faces_ref = face_app.get(reference_frame)
+        faces_cap = analyze_faces(captured_frame)
+        faces_ref = analyze_faces(reference_frame)
 
         if not faces_cap or not faces_ref:
             return jsonify({"match": False, "confidence": 0.0, "error": "No face detected in one or both images"})
 
         score = cosine_similarity(faces_cap[0].embedding, faces_ref[0].embedding)
         confidence = round(max(0.0, min(1.0, score)), 4)
-        is_match = score >= 0.4
+        is_match = score >= MATCH_THRESHOLD
 
         print(f"Face comparison: match={is_match}, confidence={confidence}")
         return jsonify({"match": is_match, "confidence": confidence})
@@ -372,109 +1010,186 @@ def compare_face_endpoint():
 
 @app.route('/classify_face', methods=['POST'])
 def classify_face_endpoint():
-    """Classify a captured face against a provided list of employee face photos."""
+    """
+    Classify a captured face against a provided list of employee face photos.
+
+    Expects JSON: { "captured_frame": "data:image/jpeg;base64,...", "employees": [...] }
+    Each employee has "id", "name" and one of:
+      "facePhoto":     base64 photo (embedding cached by photo hash)
+      "facePhotoHash": hex SHA-256 of the photo bytes, for a photo sent before
+      "embedding":     precomputed 512D embedding
+    Returns: { matched, employee_id, employee_name, confidence, det_size, unknown_hashes? }
+
+    As multipart/form-data: "captured_frame" file part, "employees" form field
+    holding the JSON list, and employee photos as file parts "facePhoto_<index>".
+    """
     try:
         if not FACE_RECOGNITION_AVAILABLE:
             return jsonify({"matched": False, "employee_id": None, "employee_name": None, "confidence": 0.0, "error": "Face recognition engine not available"})
 
-        data = request.get_json()
-        captured_frame_b64 = data.get("captured_frame", "")
-        employees = data.get("employees", [])
+        payload = RequestPayload(request)
+        employees = payload.get_json_field("employees", []) or []
 
-        if not captured_frame_b64:
+        if not payload.has_image("captured_frame"):
             return jsonify({"matched": False, "employee_id": None, "employee_name": None, "confidence": 0.0, "error": "Missing captured_frame"})
         if not employees:
             return jsonify({"matched": False, "employee_id": None, "employee_name": None, "confidence": 0.0, "error": "No employee faces provided"})
 
-        captured_frame = decode_base64_frame(captured_frame_b64)
+        with stage('payload_decode'):
+            img_bytes = payload.image_bytes("captured_frame")
+        with stage('image_decode'):
+            captured_frame = decode_image_bytes(img_bytes)
         if captured_frame is None:
+            FACE_RESULTS.inc(route='/classify_face', result='error')
             return jsonify({"matched": False, "employee_id": None, "employee_name": None, "confidence": 0.0, "error": "Failed to decode captured frame"})
 
-        faces_cap = face_app.get(captured_frame)
+        faces_cap = analyze_faces(captured_frame)
         if not faces_cap:
-            return jsonify({"matched": False, "employee_id": None, "employee_name": None, "confidence": 0.0, "error": "No face detected in captured frame"})
+            FACE_RESULTS.inc(route='/classify_face', result='no_face')
+            return jsonify({"matched": False, "employee_id": None, "employee_name": None, "confidence": 0.0, "det_size": FACE_DET_SIZES[-1], "error": "No face detected in captured frame"})
 
         captured_embedding = faces_cap[0].embedding
 
-        best_score = -1.0
-        best_emp = None
-
-        for emp in employees:
-            face_photo_b64 = emp.get('facePhoto', '')
-            if not face_photo_b64:
+        # Each employee can be given as a precomputed embedding, the hash of a
+        # photo sent earlier, or the photo itself (embedded once, then cached).
+        candidates = []
+        ref_embeddings = []
+        unknown_hashes = []
+
+        for i, emp in enumerate(employees):
+            photo_part = f"facePhoto_{i}"
+            if emp.get('embedding') is not None:
+                embedding = np.asarray(emp['embedding'], dtype=np.float32)
+                if embedding.shape != (EMBEDDING_DIM,):
+                    continue
+            elif photo_part in payload.files:
+                embedding = cached_photo_embedding(payload.image_bytes(photo_part))
+            elif emp.get('facePhoto'):
+                embedding = cached_photo_embedding(decode_base64_bytes(emp['facePhoto']))
+            elif emp.get('facePhotoHash'):
+                found, embedding = PHOTO_EMBEDDINGS.lookup(emp['facePhotoHash'])
+                if not found:
+                    unknown_hashes.append(emp['facePhotoHash'])
+                    continue
+            else:
                 continue
 
-            ref_frame = decode_base64_frame(face_photo_b64)
-            if ref_frame is None:
+            if embedding is None:
                 continue
 
-            ref_faces = face_app.get(ref_frame)
-            if not ref_faces:
-                continue
+            candidates.append(emp)
+            ref_embeddings.append(normalize_embedding(embedding))
+
+        best_score = -1.0
+        best_emp = None
 
-            score = cosine_similarity(captured_embedding, ref_faces[0].embedding)
-            if score > best_score:
-                best_score = score
-                best_emp = emp
+        if candidates:
+            with stage('gallery_search'):
+                scores = np.stack(ref_embeddings) @ normalize_embedding(captured_embedding)
+            best_idx = int(np.argmax(scores))
+            best_score = float(scores[best_idx])
+            best_emp = candidates[best_idx]
 
         confidence = round(max(0.0, min(1.0, best_score)), 4)
-        is_match = best_score >= 0.4 and best_emp is not None
+        is_match = best_score >= MATCH_THRESHOLD and best_emp is not None
+        FACE_RESULTS.inc(route='/classify_face', result='match' if is_match else 'no_match')
 
         result = {
             "matched": is_match,
             "employee_id": best_emp.get('id') if is_match else None,
             "employee_name": best_emp.get('name') if is_match else None,
             "confidence": confidence,
+            "det_size": faces_cap[0].det_size,
         }
+        # Hashes the cache has never seen (or has evicted): resend these as facePhoto
+        if unknown_hashes:
+            result["unknown_hashes"] = unknown_hashes
 
         print(f"Classification: matched={result['matched']}, employee={result.get('employee_name')}, confidence={result['confidence']}")
         return jsonify(result)
 
     except Exception as e:
         print(f"Classify face error: {e}")
+        FACE_RESULTS.inc(route='/classify_face', result='error')
         return jsonify({"matched": False, "employee_id": None, "employee_name": None, "confidence": 0.0, "error": str(e)})
 
 
+@app.route('/embedding_cache', methods=['GET'])
+def embedding_cache_stats():
+    """Return hit/miss counters and size of the /classify_face photo embedding cache."""
+    return jsonify(PHOTO_EMBEDDINGS.stats())
+
+
+GALLERY_SIZE = Gauge('blink_gallery_faces', 'Registered faces in the gallery', merge='max')
+GALLERY_SIZE.set_function(lambda: len(GALLERY))
+FRAME_QUEUE = Gauge('blink_frame_writer_queued', 'Captured frames waiting to be written')
+FRAME_QUEUE.set_function(lambda: FRAME_WRITER.stats()['queued'])
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(METRICS_REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/status', methods=['GET'])
+def status():
+    """Startup timings, loaded models and memory use of the serving process."""
+    return jsonify({
+        'pid': os.getpid(),
+        'rss_mb': rss_mb(),
+        'peak_rss_mb': peak_rss_mb(),
+        'import_seconds': SERVER_IMPORT_SECONDS,
+        'face_recognition': {
+            'available': FACE_RECOGNITION_AVAILABLE,
+            'modules': sorted(face_app.models) if face_app is not None else [],
+            'load_seconds': face_models_load_seconds,
+        },
+        'face_landmarker': {
+            'loaded': server_classification.landmarker_load_seconds is not None,
+            'load_seconds': server_classification.landmarker_load_seconds,
+            'pool': server_classification.LANDMARKERS.stats(),
+            'video_pool': server_classification.VIDEO_LANDMARKERS.stats(),
+        },
+        'spectacle_backend': getattr(spectacle_detection_cnn.get_backend(), 'name', 'heuristic'),
+        'spectacle_cache': SPECTACLE_CACHE.stats() if SPECTACLE_CACHE_ENABLED else None,
+        'registered_faces': len(GALLERY),
+        'frame_writer': FRAME_WRITER.stats(),
+    })
+
+
 @app.route('/check_duplicate_face', methods=['POST'])
 def check_duplicate_face():
     """
     Check if a face already exists among registered employees.
     Expects JSON: { "face_photo": "data:image/jpeg;base64,...", "name": "optional name" }
+    (or a multipart "face_photo" file part, or a raw JPEG body with ?name=)
     Returns: { duplicate: bool, existing_name: str|null, confidence: float }
     """
     try:
-        if not FACE_RECOGNITION_AVAILABLE or not REGISTERED_EMPLOYEES:
+        if not FACE_RECOGNITION_AVAILABLE or not GALLERY:
             return jsonify({'duplicate': False, 'existing_name': None, 'confidence': 0.0})
 
-        data = request.get_json()
-        face_photo_b64 = data.get('face_photo', '')
-        provided_name = data.get('name', '').strip()
+        payload = RequestPayload(request, raw_image_field='face_photo')
+        provided_name = (payload.get('name') or '').strip()
 
-        if not face_photo_b64:
+        if not payload.has_image('face_photo'):
             return jsonify({'duplicate': False, 'existing_name': None, 'confidence': 0.0, 'error': 'No photo provided'})
 
-        frame = decode_base64_frame(face_photo_b64)
+        frame = payload.image('face_photo')
         if frame is None:
             return jsonify({'duplicate': False, 'existing_name': None, 'confidence': 0.0, 'error': 'Decode failed'})
 
-        faces = face_app.get(frame)
+        faces = analyze_faces(frame)
         if not faces:
             return jsonify({'duplicate': False, 'existing_name': None, 'confidence': 0.0, 'error': 'No face detected'})
 
-        captured_embedding = faces[0].embedding
-
-        best_score = -1.0
-        best_idx = -1
-
-        for i, emp in enumerate(REGISTERED_EMPLOYEES):
-            score = cosine_similarity(captured_embedding, emp['embedding'])
-            if score > best_score:
-                best_score = score
-                best_idx = i
+        best = GALLERY.best_match(faces[0].embedding)
+        best_score = best['score']
 
         confidence = round(max(0.0, min(1.0, best_score)), 4)
-        is_duplicate = best_score >= 0.4
-        existing_name = REGISTERED_EMPLOYEES[best_idx]['name'] if is_duplicate else None
+        is_duplicate = best_score >= MATCH_THRESHOLD
+        existing_name = best['name'] if is_duplicate else None
 
         # If same person same name → not a conflict, it's an update
         if is_duplicate and provided_name and existing_name and provided_name.lower() == existing_name.lower():
@@ -501,57 +1216,49 @@ def register_face():
     """
     Register a new employee face for recognition.
     Expects JSON: { "name": "FirstName LastName", "face_photo": "data:image/jpeg;base64,..." }
-    Saves to registered_faces/ and hot-reloads the face registry.
+    (or a multipart "face_photo" file part, or a raw JPEG body with ?name=)
+    Saves to registered_faces/ and adds the face to the in-memory gallery,
+    reusing the embedding computed for the duplicate check.
     """
     try:
-        data = request.get_json()
-        name = data.get('name', '').strip()
-        face_photo_b64 = data.get('face_photo', '')
+        payload = RequestPayload(request, raw_image_field='face_photo')
+        name = (payload.get('name') or '').strip()
 
         if not name:
             return jsonify({'success': False, 'error': 'Name is required'}), 400
-        if not face_photo_b64:
+        if not payload.has_image('face_photo'):
             return jsonify({'success': False, 'error': 'Face photo is required'}), 400
 
-        # Decode the base64 image
+        # Decode the uploaded image
         try:
-            frame = decode_base64_frame(face_photo_b64)
+            frame = payload.image('face_photo')
             if frame is None:
                 return jsonify({'success': False, 'error': 'Failed to decode image'}), 400
         except Exception as e:
             return jsonify({'success': False, 'error': f'Image decode error: {e}'}), 400
 
         # Validate that a face is actually detectable in the photo
+        embedding = None
         if FACE_RECOGNITION_AVAILABLE:
-            faces = face_app.get(frame)
+            faces = analyze_faces(frame)
             if not faces:
                 return jsonify({'success': False, 'error': 'No face detected in the photo. Please retake.'}), 400
+            embedding = faces[0].embedding
 
             # Check for duplicate face with DIFFERENT name
-            if REGISTERED_EMPLOYEES:
-                captured_embedding = faces[0].embedding
-
-                best_score = -1.0
-                best_idx = -1
-
-                for i, emp in enumerate(REGISTERED_EMPLOYEES):
-                    score = cosine_similarity(captured_embedding, emp['embedding'])
-                    if score > best_score:
-                        best_score = score
-                        best_idx = i
-
-                if best_score >= 0.4:
-                    existing_name = REGISTERED_EMPLOYEES[best_idx]['name']
-                    # Same face, different name → reject (duplicate person)
-                    if existing_name.lower() != name.lower():
-                        return jsonify({
-                            'success': False,
-                            'error': f'This face is already registered under "{existing_name}". Cannot register the same face with different details.',
-                            'duplicate': True,
-                            'existing_name': existing_name,
-                        }), 409
-                    # Same face, same name → allow (update)
-                    print(f"[RegisterFace] Updating existing face for: {name}")
+            best = GALLERY.best_match(embedding)
+            if best is not None and best['score'] >= MATCH_THRESHOLD:
+                existing_name = best['name']
+                # Same face, different name → reject (duplicate person)
+                if existing_name.lower() != name.lower():
+                    return jsonify({
+                        'success': False,
+                        'error': f'This face is already registered under "{existing_name}". Cannot register the same face with different details.',
+                        'duplicate': True,
+                        'existing_name': existing_name,
+                    }), 409
+                # Same face, same name → allow (update)
+                print(f"[RegisterFace] Updating existing face for: {name}")
 
         # Save to registered_faces/ directory
         os.makedirs(REGISTERED_FACES_DIR, exist_ok=True)
@@ -560,14 +1267,16 @@ def register_face():
         cv2.imwrite(filepath, frame)
         print(f"[RegisterFace] Saved face photo: {filepath}")
 
-        # Hot-reload all registered faces so new employee is immediately recognized
-        load_registered_faces()
+        # Swap the new embedding into the gallery so the employee is recognized immediately
+        if embedding is not None:
+            GALLERY.upsert(name, filename, embedding)
+            persist_gallery_change(filename, filepath, name, embedding)
 
         return jsonify({
             'success': True,
             'name': name,
             'file': filename,
-            'total_registered': len(REGISTERED_EMPLOYEES),
+            'total_registered': len(GALLERY),
         })
 
     except Exception as e:
@@ -579,22 +1288,43 @@ def register_face():
 def list_registered_faces():
     """Return the list of all registered employee names."""
     return jsonify({
-        'total': len(REGISTERED_EMPLOYEES),
-        'employees': [{'name': emp['name'], 'file': emp['file']} for emp in REGISTERED_EMPLOYEES],
+        'total': len(GALLERY),
+        'employees': GALLERY.entries(),
     })
 
 
 @app.route('/attendance', methods=['GET'])
 def get_attendance():
-    """Return the full attendance log."""
-    if not os.path.exists(ATTENDANCE_LOG):
-        return jsonify([])
+    """
+    Stream the attendance log as a JSON array, oldest first.
+    Optional query params: employee, status, since, until (ISO timestamps),
+    limit, offset.
+    """
     try:
-        with open(ATTENDANCE_LOG, 'r') as f:
-            log = json.load(f)
-        return jsonify(log)
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', default=0, type=int)
+        entries = ATTENDANCE.iter_entries(
+            employee=request.args.get('employee'),
+            status=request.args.get('status'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=limit,
+            offset=offset,
+        )
     except Exception as e:
-        return jsonify({"error": str(e)})
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        yield '['
+        for i, entry in enumerate(entries):
+            yield (',' if i else '') + json.dumps(entry)
+        yield ']'
+
+    return Response(generate(), mimetype='application/json')
+
+
+SERVER_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+print(f"server.py ready in {SERVER_IMPORT_SECONDS:.2f}s (pid {os.getpid()}, RSS {rss_mb() or 0:.0f} MB)")
 
 
 if __name__ == '__main__':
@@ -3,25 +3,249 @@ Server-side blink detection and frame classification module
 Handles classification of frames as blinked or unblinked
 """
 
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+
 import cv2
-import mediapipe as mp
 import numpy as np
 from ear_utils import eye_aspect_ratio
 from spectacle_detection_cnn import SpectacleDetectionCNN
 
-# Mediapipe Setup
-BaseOptions = mp.tasks.BaseOptions
-FaceLandmarker = mp.tasks.vision.FaceLandmarker
-FaceLandmarkerOptions = mp.tasks.vision.FaceLandmarkerOptions
-VisionRunningMode = mp.tasks.vision.RunningMode
+# MediaPipe and the FaceLandmarkers are loaded on the first blink/spectacle
+# request, so processes that only serve face verification never pay for them.
+FACE_LANDMARKER_MODEL = 'face_landmarker.task'
+mp = None
+landmarker_load_seconds = None
+
+# Frames are shrunk to this long side (px) before landmarking; 0 keeps the
+# native resolution. Landmarks come back normalized to [0, 1], so EARs and the
+# eye crops SpectacleDetectionCNN cuts from the full-resolution frame are
+# unaffected.
+LANDMARK_MAX_SIDE = int(os.environ.get('BLINK_LANDMARK_MAX_SIDE', 480))
+
+
+def load_mediapipe():
+    global mp
+    if mp is None:
+        import mediapipe
+        mp = mediapipe
+    return mp
+
+
+# IMAGE-mode landmarkers look for up to this many faces so extra people are
+# noticed. VIDEO-mode ones track a single face: MediaPipe re-runs face
+# detection on every frame while it tracks fewer faces than num_faces, so
+# anything above 1 would cancel the tracking saving for the usual one person.
+MAX_FACES = 3
+VIDEO_MAX_FACES = 1
+
+
+def create_face_landmarker(video=False):
+    """
+    Create a new MediaPipe FaceLandmarker.
+
+    Args:
+        video: RunningMode.VIDEO (tracks one face between consecutive frames)
+            instead of RunningMode.IMAGE (full detection on every frame)
+    """
+    global landmarker_load_seconds
+    start = time.perf_counter()
+    load_mediapipe()
+    running_mode = mp.tasks.vision.RunningMode.VIDEO if video else mp.tasks.vision.RunningMode.IMAGE
+    options = mp.tasks.vision.FaceLandmarkerOptions(
+        base_options=mp.tasks.BaseOptions(model_asset_path=FACE_LANDMARKER_MODEL),
+        running_mode=running_mode,
+        num_faces=VIDEO_MAX_FACES if video else MAX_FACES
+    )
+    landmarker = mp.tasks.vision.FaceLandmarker.create_from_options(options)
+    if landmarker_load_seconds is None:
+        landmarker_load_seconds = time.perf_counter() - start
+        print(f"MediaPipe FaceLandmarker loaded in {landmarker_load_seconds:.2f}s")
+    return landmarker
+
+
+class LandmarkerPool:
+    """
+    IMAGE-mode FaceLandmarkers shared by request threads. A landmarker graph
+    must not run on two threads at once, so each detection checks one out and
+    returns it; instances are created on demand up to size, after which
+    callers wait for a free one.
+    """
+
+    def __init__(self, size=2):
+        self.size = size
+        self.on_wait = None  # callback(seconds) for every checkout
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def checkout(self):
+        start = time.perf_counter()
+        landmarker = None
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                self._cond.wait()
+            if self._idle:
+                landmarker = self._idle.pop()
+            else:
+                self._created += 1  # slot reserved; created outside the lock
+            self._in_use += 1
+        if self.on_wait is not None:
+            self.on_wait(time.perf_counter() - start)
+
+        try:
+            if landmarker is None:
+                try:
+                    landmarker = create_face_landmarker()
+                except BaseException:
+                    with self._cond:
+                        self._created -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            yield landmarker
+        finally:
+            if landmarker is not None:
+                with self._cond:
+                    self._idle.append(landmarker)
+                    self._in_use -= 1
+                    self._cond.notify()
+
+    def detect(self, mp_image):
+        with self.checkout() as landmarker:
+            return landmarker.detect(mp_image)
+
+    def stats(self):
+        with self._cond:
+            return {'size': self.size, 'created': self._created, 'in_use': self._in_use}
+
+
+LANDMARKERS = LandmarkerPool()
+
+
+def landmark_image(frame, max_side=None):
+    """
+    Build the MediaPipe input for a BGR frame: downscaled so the long side is
+    at most max_side (LANDMARK_MAX_SIDE by default), then converted to RGB.
+    """
+    load_mediapipe()
+    max_side = LANDMARK_MAX_SIDE if max_side is None else max_side
+    h, w = frame.shape[:2]
+    scale = max_side / max(h, w) if max_side else 1.0
+    if scale < 1.0:
+        frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_LINEAR)
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+
+
+def detect_landmarks(frame):
+    """
+    Run a pooled FaceLandmarker on a BGR frame (downscaled, see landmark_image).
+
+    Returns:
+        MediaPipe FaceLandmarkerResult, landmarks normalized to the frame size
+    """
+    return LANDMARKERS.detect(landmark_image(frame))
+
+
+# Timestamp step for frame sequences without capture times (about 30 fps)
+VIDEO_FRAME_INTERVAL_MS = 33
+
 
-options = FaceLandmarkerOptions(
-    base_options=BaseOptions(model_asset_path='face_landmarker.task'),
-    running_mode=VisionRunningMode.IMAGE,
-    num_faces=3
-)
+class VideoLandmarkerSession:
+    """
+    One ordered frame sequence on a RunningMode.VIDEO landmarker. Once it has
+    a face, MediaPipe tracks it from the previous landmarks instead of running
+    face detection again. Only one face is tracked, so results never show
+    more than one (see MAX_FACES). Not thread-safe: frames must be fed in
+    order from one thread.
+    """
+
+    def __init__(self, pool, landmarker, last_timestamp_ms, frame_interval_ms=VIDEO_FRAME_INTERVAL_MS):
+        self._pool = pool
+        self.landmarker = landmarker
+        self.last_timestamp_ms = last_timestamp_ms
+        self.frame_interval_ms = frame_interval_ms
+        self.frames = 0
+
+    def detect(self, frame, timestamp_ms=None):
+        """
+        Landmark the next frame of the sequence.
+
+        Args:
+            frame: OpenCV frame (BGR format)
+            timestamp_ms: Capture time in ms; frames without one are spaced
+                frame_interval_ms apart. Always made strictly increasing.
+
+        Returns:
+            MediaPipe FaceLandmarkerResult
+        """
+        if timestamp_ms is None:
+            timestamp_ms = self.last_timestamp_ms + self.frame_interval_ms
+        timestamp_ms = max(int(timestamp_ms), self.last_timestamp_ms + 1)
+        result = self.landmarker.detect_for_video(landmark_image(frame), timestamp_ms)
+        self.last_timestamp_ms = timestamp_ms
+        self.frames += 1
+        return result
+
+    def close(self):
+        if self.landmarker is not None:
+            self._pool.release(self.landmarker, self.last_timestamp_ms)
+            self.landmarker = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class VideoLandmarkerPool:
+    """
+    Recycles RunningMode.VIDEO landmarkers across sessions. A landmarker's
+    timestamps must keep increasing for its whole life, so each idle one
+    remembers where its last session stopped and the next session continues
+    from there. Tracking state is not reset between sessions: a new session
+    may start from the previous face's region, and MediaPipe falls back to
+    face detection when the tracked region no longer holds a face.
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._idle = []  # [(landmarker, last_timestamp_ms)]
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def session(self, frame_interval_ms=VIDEO_FRAME_INTERVAL_MS):
+        """Check out a landmarker for one frame sequence (use as a context manager)."""
+        with self._lock:
+            landmarker, last_ts = self._idle.pop() if self._idle else (None, 0)
+        if landmarker is None:
+            landmarker = create_face_landmarker(video=True)
+            with self._lock:
+                self.created += 1
+        return VideoLandmarkerSession(self, landmarker, last_ts, frame_interval_ms)
+
+    def release(self, landmarker, last_timestamp_ms):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((landmarker, last_timestamp_ms))
+                return
+        landmarker.close()
+
+    def stats(self):
+        with self._lock:
+            return {'idle': len(self._idle), 'created': self.created}
+
+
+VIDEO_LANDMARKERS = VideoLandmarkerPool()
 
-face_landmarker = FaceLandmarker.create_from_options(options)
 
 LEFT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
 RIGHT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
@@ -30,114 +254,305 @@ RIGHT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
 # A real blink typically produces a 0.05-0.15 EAR drop, so 0.03 is very lenient.
 MIN_BLINK_EAR_DROP = 0.03
 
+# A liveness session is rejected if at least this share of frames with a face
+# show more than one face
+MULTIPLE_FACES_FRACTION = 0.3
 
-def classify_frames(frame_list):
+# classify_frames tracks one face in VIDEO mode; every this-many examined
+# frames (starting with the first) go through an IMAGE-mode landmarker
+# instead, which does see additional faces. Frames that would become the
+# closed or open frame are always checked that way too.
+MULTI_FACE_CHECK_INTERVAL = 5
+
+
+def measure_frame_ear(frame, detect=detect_landmarks):
+    """
+    Landmark one frame and compute its eye aspect ratios.
+
+    Args:
+        frame: OpenCV frame (BGR format)
+        detect: Landmarking function, e.g. a VideoLandmarkerSession's detect
+
+    Returns:
+        Dict with 'num_faces' and, for exactly one face, 'ear', 'left_ear', 'right_ear'.
+        num_faces is capped at 1 for a VIDEO-mode detect.
+    """
+    results = detect(frame)
+    faces = results.face_landmarks or []
+    if len(faces) != 1:
+        return {'num_faces': len(faces)}
+
+    left_ear = eye_aspect_ratio(faces[0], LEFT_EYE_INDICES)
+    right_ear = eye_aspect_ratio(faces[0], RIGHT_EYE_INDICES)
+    return {
+        'num_faces': 1,
+        'ear': (left_ear + right_ear) / 2.0,
+        'left_ear': left_ear,
+        'right_ear': right_ear,
+    }
+
+
+class BlinkTracker:
+    """
+    Running blink evidence over a sequence of frames. Only the lowest-EAR
+    (closed) and highest-EAR (open) frames are kept, not every frame.
+    """
+
+    def __init__(self, min_drop=MIN_BLINK_EAR_DROP):
+        self.min_drop = min_drop
+        self.closed = None  # {'frame', 'frame_idx', 'ear'}
+        self.open = None
+        self.face_frames = 0
+        self.no_face_count = 0
+        self.multiple_faces_count = 0
+        self.face_count_frames = 0  # frames with a face whose face count can exceed 1
+
+    def add(self, frame_idx, frame, measurement, counts_faces=True):
+        """
+        Record one frame's measure_frame_ear() result.
+
+        Args:
+            counts_faces: False if the landmarker could not have reported more
+                than one face (VIDEO mode); the frame then counts for the EARs
+                but not towards MULTIPLE_FACES_FRACTION
+        """
+        num_faces = measurement['num_faces']
+        if num_faces == 0:
+            self.no_face_count += 1
+            return
+        if counts_faces:
+            self.face_count_frames += 1
+        if num_faces > 1:
+            self.multiple_faces_count += 1
+            return
+
+        self.face_frames += 1
+        ear = measurement['ear']
+        if self.closed is None or ear < self.closed['ear']:
+            self.closed = {'frame': frame, 'frame_idx': frame_idx, 'ear': ear}
+        if self.open is None or ear > self.open['ear']:
+            self.open = {'frame': frame, 'frame_idx': frame_idx, 'ear': ear}
+
+    def would_keep(self, ear):
+        """True if a one-face frame with this EAR would become the closed or open frame."""
+        return self.closed is None or ear < self.closed['ear'] or ear > self.open['ear']
+
+    def decided(self, remaining_frames):
+        """
+        True once the liveness result can no longer change: a blink is
+        confirmed and, even if every one of remaining_frames (None =
+        unknown) showed several faces, they would stay under
+        MULTIPLE_FACES_FRACTION. More frames can only widen the EAR drop.
+        """
+        if remaining_frames is None or not self.blink_detected:
+            return False
+        if remaining_frames == 0:
+            return True
+        worst_multiple = self.multiple_faces_count + remaining_frames
+        return worst_multiple < (self.face_count_frames + remaining_frames) * MULTIPLE_FACES_FRACTION
+
+    @property
+    def ear_drop(self):
+        if self.closed is None:
+            return 0.0
+        return self.open['ear'] - self.closed['ear']
+
+    @property
+    def multiple_faces(self):
+        return (
+            self.multiple_faces_count > 0 and
+            self.multiple_faces_count >= self.face_count_frames * MULTIPLE_FACES_FRACTION
+        )
+
+    @property
+    def blink_detected(self):
+        return not self.multiple_faces and self.closed is not None and self.ear_drop >= self.min_drop
+
+
+def classify_frame_stream(encoded_frames, decode, executor, max_in_flight=8, early_stop=True, max_frames=None):
+    """
+    Liveness over frames that arrive one by one (e.g. while a request body is
+    still being parsed). Frames are decoded and landmarked on the executor,
+    at most max_in_flight at a time, and no more frames are taken once the
+    result is decided (see BlinkTracker.decided).
+
+    Args:
+        encoded_frames: Iterable of encoded frames (only consumed as needed)
+        decode: Function turning one encoded frame into a BGR image (or None)
+        executor: concurrent.futures executor for decode + landmarking
+        max_in_flight: Frames decoded/landmarked concurrently
+        early_stop: Stop taking frames once the result cannot change
+        max_frames: Upper bound on the frames encoded_frames can yield;
+            without it the remaining frames are unknown and every frame is used
+
+    Returns:
+        Dict with the BlinkTracker ('tracker'), 'frames_submitted',
+        'frames_processed' (decoded and landmarked), 'frames_failed' and 'early_stop'
+    """
+    tracker = BlinkTracker()
+    pending = set()
+    submitted = 0
+    processed = 0
+    failed = 0
+    stopped_early = False
+
+    def process(frame_idx, encoded):
+        frame = decode(encoded)
+        if frame is None:
+            return frame_idx, None, None
+        return frame_idx, frame, measure_frame_ear(frame)
+
+    def collect(done):
+        nonlocal processed, failed
+        for future in done:
+            if future.cancelled():
+                continue
+            try:
+                frame_idx, frame, measurement = future.result()
+            except Exception as e:
+                print(f"Error classifying frame:", e)
+                failed += 1
+                continue
+            if frame is None:
+                failed += 1
+                continue
+            processed += 1
+            tracker.add(frame_idx, frame, measurement)
+
+    def remaining():
+        return None if max_frames is None else max_frames - processed - failed
+
+    try:
+        for encoded in encoded_frames:
+            if early_stop and tracker.decided(remaining()):
+                stopped_early = True
+                break
+            pending.add(executor.submit(process, submitted, encoded))
+            submitted += 1
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+    except BaseException:
+        # The input failed (e.g. a malformed body): drop work not started yet
+        for future in pending:
+            future.cancel()
+        raise
+
+    if stopped_early:
+        for future in pending:
+            future.cancel()
+    done, _ = wait(pending)
+    collect(done)
+
+    return {
+        'tracker': tracker,
+        'frames_submitted': submitted,
+        'frames_processed': processed,
+        'frames_failed': failed,
+        'early_stop': stopped_early,
+    }
+
+
+def classify_frames(frame_list, stride=1, max_frames=None, early_stop=True):
     """
     Classify a list of frames as blinked or unblinked using relative EAR.
     Instead of fixed thresholds, picks the frame with lowest EAR (blink)
     and highest EAR (open eyes). If the difference is large enough, liveness passes.
 
+    Only the current lowest/highest EAR frames are kept while scanning, and
+    with early_stop no further frames are landmarked once the result cannot
+    change (BlinkTracker.decided; needs a frame_list with a length). The
+    frames are landmarked in order on a pooled RunningMode.VIDEO landmarker
+    that tracks one face, so most frames skip face detection. Every
+    MULTI_FACE_CHECK_INTERVAL-th frame, and every frame that would become
+    the closed or open frame, goes through an IMAGE-mode landmarker instead
+    to catch additional faces; the multiple-faces share is taken over those.
+
     Args:
-        frame_list: List of OpenCV frames (BGR format)
+        frame_list: Sequence (or iterable) of OpenCV frames (BGR format)
+        stride: Landmark every stride-th frame only (>= 1)
+        max_frames: Landmark at most this many frames (None = no limit)
+        early_stop: Stop once the result cannot change
 
     Returns:
-        Dictionary with 'blinked', 'unblinked' lists and 'multiple_faces' flag
+        Dictionary with 'blinked', 'unblinked' lists, 'multiple_faces' flag,
+        'multi_face_count', and the per-frame 'ears' (float32) with their
+        'frame_indices' (int32) for frames showing exactly one face
     """
-    blinked_frames = []
-    unblinked_frames = []
+    if stride < 1:
+        raise ValueError(f"stride must be >= 1, got {stride}")
 
-    # Collect EAR values for all frames with detected faces
-    frame_ears = []
-    no_face_count = 0
-    multiple_faces_count = 0
+    # Frames that will be examined in total, if the length is known
+    total = None
+    if hasattr(frame_list, '__len__'):
+        total = -(-len(frame_list) // stride)
+        if max_frames is not None:
+            total = min(total, max_frames)
 
-    for frame_idx, frame in enumerate(frame_list):
-        try:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-            results = face_landmarker.detect(mp_image)
+    tracker = BlinkTracker()
+    ears = []
+    frame_indices = []
+    examined = 0
 
-            if not results.face_landmarks:
-                no_face_count += 1
+    # Skipped frames still advance the clock so tracking sees the real spacing
+    with VIDEO_LANDMARKERS.session(frame_interval_ms=stride * VIDEO_FRAME_INTERVAL_MS) as session:
+        for frame_idx, frame in enumerate(frame_list):
+            if frame_idx % stride:
                 continue
-
-            # Multiple face check — only 1 face allowed
-            if len(results.face_landmarks) > 1:
-                multiple_faces_count += 1
-                print(f"  WARNING: {len(results.face_landmarks)} faces detected in frame {frame_idx}")
+            if max_frames is not None and examined >= max_frames:
+                break
+            if early_stop and tracker.decided(None if total is None else total - examined):
+                break
+            counts_faces = examined % MULTI_FACE_CHECK_INTERVAL == 0
+            examined += 1
+            try:
+                measurement = measure_frame_ear(frame, detect_landmarks if counts_faces else session.detect)
+                if (not counts_faces and measurement['num_faces'] == 1 and
+                        tracker.would_keep(measurement['ear'])):
+                    # The frames that decide the result always get a full face count
+                    measurement = measure_frame_ear(frame)
+                    counts_faces = True
+            except Exception as e:
+                print(f"Error classifying frame {frame_idx}:", e)
                 continue
+            tracker.add(frame_idx, frame, measurement, counts_faces=counts_faces)
+            if measurement['num_faces'] == 1:
+                ears.append(measurement['ear'])
+                frame_indices.append(frame_idx)
 
-            landmarks = results.face_landmarks[0]
+    result = {
+        'blinked': [],
+        'unblinked': [],
+        'multiple_faces': tracker.multiple_faces,
+        'multi_face_count': tracker.multiple_faces_count,
+        'ears': np.array(ears, dtype=np.float32),
+        'frame_indices': np.array(frame_indices, dtype=np.int32),
+    }
 
-            left_ear = eye_aspect_ratio(landmarks, LEFT_EYE_INDICES)
-            right_ear = eye_aspect_ratio(landmarks, RIGHT_EYE_INDICES)
-            ear = (left_ear + right_ear) / 2.0
-
-            frame_ears.append({
-                'frame': frame,
-                'frame_idx': frame_idx,
-                'ear': ear,
-            })
-        except Exception as e:
-            print(f"Error classifying frame {frame_idx}:", e)
-            continue
-
-    # If majority of frames have multiple faces, flag it
-    total_valid = len(frame_ears) + multiple_faces_count
-    multiple_faces_detected = (
-        multiple_faces_count > 0 and
-        total_valid > 0 and
-        multiple_faces_count >= total_valid * 0.3
-    )
+    if tracker.multiple_faces:
+        print(f"  MULTIPLE FACES: {tracker.multiple_faces_count}/"
+              f"{tracker.face_count_frames} checked frames have >1 face — REJECTED")
+        return result
 
-    if multiple_faces_detected:
-        print(f"  MULTIPLE FACES: {multiple_faces_count}/{total_valid} frames have >1 face — REJECTED")
-        return {
-            'blinked': [],
-            'unblinked': [],
-            'multiple_faces': True,
-            'multi_face_count': multiple_faces_count,
-        }
-
-    if not frame_ears:
-        print(f"  WARNING: No faces detected in any of {len(frame_list)} frames ({no_face_count} no-face)")
-        return {
-            'blinked': [],
-            'unblinked': [],
-            'multiple_faces': False,
-            'multi_face_count': multiple_faces_count,
-        }
-
-    # Debug: show EAR distribution
-    ears = [f['ear'] for f in frame_ears]
-    min_ear = min(ears)
-    max_ear = max(ears)
-    ear_drop = max_ear - min_ear
-    print(f"  EAR stats: min={min_ear:.4f}, max={max_ear:.4f}, drop={ear_drop:.4f}, avg={sum(ears)/len(ears):.4f} ({len(ears)} faces, {no_face_count} no-face)")
-    print(f"  EAR values: {[round(e, 4) for e in ears]}")
-    print(f"  Blink detection: need drop > {MIN_BLINK_EAR_DROP} (got {ear_drop:.4f})")
-
-    # Relative approach: pick lowest EAR as blink, highest as open
-    # If the difference is large enough, a real blink occurred
-    if ear_drop >= MIN_BLINK_EAR_DROP:
-        best_closed = min(frame_ears, key=lambda f: f['ear'])
-        best_open = max(frame_ears, key=lambda f: f['ear'])
+    if tracker.closed is None:
+        print(f"  WARNING: No faces detected in any of {examined} frames ({tracker.no_face_count} no-face)")
+        return result
 
-        blinked_frames.append({**best_closed, 'type': 'blinked'})
-        unblinked_frames.append({**best_open, 'type': 'unblinked'})
+    ear_drop = tracker.ear_drop
+    print(f"  EAR stats: min={tracker.closed['ear']:.4f}, max={tracker.open['ear']:.4f}, drop={ear_drop:.4f} "
+          f"({tracker.face_frames} faces, {tracker.no_face_count} no-face, {examined} examined)")
 
-        print(f"  BLINK detected: EAR={best_closed['ear']:.4f} (frame {best_closed['frame_idx']})")
-        print(f"  OPEN detected: EAR={best_open['ear']:.4f} (frame {best_open['frame_idx']})")
-        print(f"  LIVENESS PASSED (drop={ear_drop:.4f})")
+    # Relative approach: lowest EAR as blink, highest as open.
+    # If the difference is large enough, a real blink occurred
+    if tracker.blink_detected:
+        result['blinked'].append({**tracker.closed, 'type': 'blinked'})
+        result['unblinked'].append({**tracker.open, 'type': 'unblinked'})
+        print(f"  LIVENESS PASSED: blink at frame {tracker.closed['frame_idx']}, "
+              f"open at frame {tracker.open['frame_idx']} (drop={ear_drop:.4f})")
     else:
         print(f"  LIVENESS FAILED — no significant blink detected (drop={ear_drop:.4f} < {MIN_BLINK_EAR_DROP})")
 
-    return {
-        'blinked': blinked_frames,
-        'unblinked': unblinked_frames,
-        'multiple_faces': False,
-        'multi_face_count': multiple_faces_count,
-    }
+    return result
 
 
 def detect_spectacles_in_frame(frame):
@@ -150,19 +565,118 @@ def detect_spectacles_in_frame(frame):
     Returns:
         Dict with detection results
     """
+    return detect_spectacles_with_landmarks(frame)[0]
+
+
+def detect_spectacles_with_landmarks(frame, landmarks=None):
+    """
+    Spectacle detection that also hands back the landmarks it used, so a
+    caller can cache them and pass them in again for a similar next frame.
+
+    Args:
+        frame: OpenCV frame (BGR format)
+        landmarks: Face landmarks to reuse; found with the landmarker if None
+
+    Returns:
+        (detection result dict, landmarks or None if no face)
+    """
     try:
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-        
-        results = face_landmarker.detect(mp_image)
-        
-        if not results.face_landmarks:
-            return {'detected': False, 'confidence': 0.0}
-        
-        landmarks = results.face_landmarks[0]
+        if landmarks is None:
+            results = detect_landmarks(frame)
+            if not results.face_landmarks:
+                return {'detected': False, 'confidence': 0.0}, None
+            landmarks = results.face_landmarks[0]
+
+        # Landmarks are normalized, so the eye crops come from the full-resolution frame
         detection_result = SpectacleDetectionCNN.detect_spectacles(frame, landmarks)
-        return detection_result
+        return detection_result, landmarks
     
     except Exception as e:
         print(f"Error detecting spectacles:", e)
-        return {'detected': False, 'confidence': 0.0}
+        return {'detected': False, 'confidence': 0.0}, None
+
+
+# Above this mean gray level the frame is reported as too bright (same limit
+# blink_detector.py warns at)
+MAX_BRIGHTNESS = 200
+
+# Face boxes are grown by this share of their size on each side, so a crop
+# keeps the forehead and chin the landmark mesh stops short of
+FACE_BOX_MARGIN = 0.2
+
+# BT.601 luma weights in OpenCV's BGR order: the mean of these over the
+# channel means equals the mean of cv2.COLOR_BGR2GRAY without building the image
+_LUMA_BGR = (0.114, 0.587, 0.299)
+
+
+def frame_brightness(frame):
+    """Mean gray level (0-255) of a BGR frame."""
+    means = cv2.mean(frame)
+    if frame.ndim == 2:
+        return means[0]
+    return sum(w * m for w, m in zip(_LUMA_BGR, means))
+
+
+def landmark_face_box(landmarks, width, height, margin=FACE_BOX_MARGIN):
+    """
+    Pixel bounding box of a landmarked face, grown by margin and clipped to the frame.
+
+    Returns:
+        [x1, y1, x2, y2] ints
+    """
+    xs = np.fromiter((p.x for p in landmarks), dtype=np.float32, count=len(landmarks))
+    ys = np.fromiter((p.y for p in landmarks), dtype=np.float32, count=len(landmarks))
+    x1, x2 = float(xs.min()) * width, float(xs.max()) * width
+    y1, y2 = float(ys.min()) * height, float(ys.max()) * height
+    pad_x, pad_y = (x2 - x1) * margin, (y2 - y1) * margin
+    return [
+        max(0, int(x1 - pad_x)),
+        max(0, int(y1 - pad_y)),
+        min(width, int(round(x2 + pad_x))),
+        min(height, int(round(y2 + pad_y))),
+    ]
+
+
+def analyze_frame(frame, detect=detect_landmarks):
+    """
+    Everything the capture checks need from one frame, from a single
+    landmarker pass: face count, brightness, per-eye EAR, spectacle score
+    and the face box.
+
+    Args:
+        frame: OpenCV frame (BGR format)
+        detect: Landmarking function, e.g. a VideoLandmarkerSession's detect
+
+    Returns:
+        Dict with 'num_faces', 'brightness', 'too_bright' and, for exactly one
+        face, 'left_ear', 'right_ear', 'ear', 'spectacles' ({detected,
+        confidence}) and 'face_box' ([x1, y1, x2, y2] pixels)
+    """
+    brightness = frame_brightness(frame)
+    analysis = {
+        'num_faces': 0,
+        'brightness': round(brightness, 2),
+        'too_bright': brightness > MAX_BRIGHTNESS,
+    }
+
+    faces = detect(frame).face_landmarks or []
+    analysis['num_faces'] = len(faces)
+    if len(faces) != 1:
+        return analysis
+
+    landmarks = faces[0]
+    left_ear = eye_aspect_ratio(landmarks, LEFT_EYE_INDICES)
+    right_ear = eye_aspect_ratio(landmarks, RIGHT_EYE_INDICES)
+    spectacles = SpectacleDetectionCNN.detect_spectacles(frame, landmarks)
+    height, width = frame.shape[:2]
+    analysis.update({
+        'left_ear': float(left_ear),
+        'right_ear': float(right_ear),
+        'ear': float((left_ear + right_ear) / 2.0),
+        'spectacles': {
+            'detected': bool(spectacles['detected']),
+            'confidence': float(spectacles['confidence']),
+        },
+        'face_box': landmark_face_box(landmarks, width, height),
+    })
+    return analysis
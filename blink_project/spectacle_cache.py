@@ -0,0 +1,137 @@
+"""
+Per-session reuse of /check_spectacles results
+A capture page polls several times a second with nearly identical frames.
+Each session keeps its last result, the landmarks behind it, and a tiny
+grayscale thumbnail of the frame. The next poll is decoded at 1/8 scale
+only and compared to that thumbnail:
+
+    difference <= result_diff     reuse the cached result (no full decode)
+    difference <= landmark_diff   re-score the new frame with the cached landmarks
+    otherwise                     full landmarking + scoring
+
+Only polls that carry a session id (a "session_id" field or X-Session-Id
+header) are cached; the client has to send one, since address and user agent
+cannot tell apart users behind one NAT or proxy.
+
+The landmark comparison is against the frame the landmarks were found on, so
+slow drift cannot carry them along. Nothing older than max_age_s is reused,
+so a changed state (spectacles taken off slowly) is picked up within that bound.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+THUMB_SIZE = (32, 24)  # (width, height)
+
+# lookup() decisions
+REUSE_RESULT = 'result'
+REUSE_LANDMARKS = 'landmarks'
+RECOMPUTE = 'miss'
+
+
+def frame_thumbnail(img_bytes):
+    """
+    Small grayscale thumbnail straight from encoded JPEG/PNG bytes, decoded at
+    1/8 scale (far cheaper than a full decode). None if undecodable.
+    """
+    npimg = np.frombuffer(img_bytes, np.uint8)
+    if npimg.size == 0:
+        return None
+    small = cv2.imdecode(npimg, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        return None
+    return cv2.resize(small, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def frame_difference(thumb_a, thumb_b):
+    """Mean absolute gray-level difference (0-255) between two thumbnails."""
+    return float(cv2.absdiff(thumb_a, thumb_b).mean())
+
+
+class SpectacleResultCache:
+    """Last spectacle result, landmarks and thumbnail per capture session (LRU-bounded)"""
+
+    def __init__(self, result_diff=3.0, landmark_diff=10.0, max_age_s=2.0, max_sessions=512):
+        """
+        Args:
+            result_diff: Largest thumbnail difference at which the cached result is returned
+            landmark_diff: Largest difference at which the cached landmarks are reused
+            max_age_s: Oldest cache entry that may be reused at all
+            max_sessions: Sessions remembered; the least recently polled are dropped
+        """
+        self.result_diff = result_diff
+        self.landmark_diff = landmark_diff
+        self.max_age_s = max_age_s
+        self.max_sessions = max_sessions
+        # key -> {'thumb', 'result', 'computed_at', 'landmarks', 'landmarks_thumb', 'landmarks_at'}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {REUSE_RESULT: 0, REUSE_LANDMARKS: 0, RECOMPUTE: 0}
+
+    def lookup(self, key, thumb):
+        """
+        Decide how much of the session's cached work the new frame can reuse.
+
+        Returns:
+            (decision, entry): decision is REUSE_RESULT, REUSE_LANDMARKS or
+            RECOMPUTE; entry is the cached dict (None for RECOMPUTE)
+        """
+        decision, entry = RECOMPUTE, None
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and thumb is not None:
+                self._entries.move_to_end(key)
+                now = time.monotonic()
+                if (now - cached['computed_at'] <= self.max_age_s and
+                        frame_difference(cached['thumb'], thumb) <= self.result_diff):
+                    decision, entry = REUSE_RESULT, cached
+                elif (cached['landmarks'] is not None and now - cached['landmarks_at'] <= self.max_age_s and
+                        frame_difference(cached['landmarks_thumb'], thumb) <= self.landmark_diff):
+                    decision, entry = REUSE_LANDMARKS, cached
+            self.counts[decision] += 1
+        return decision, entry
+
+    def store(self, key, thumb, result, landmarks, reused_from=None):
+        """
+        Remember a freshly computed result for a session.
+
+        Args:
+            landmarks: Landmarks the result was computed from (None if no face)
+            reused_from: The entry whose landmarks were reused, if any; its
+                landmark frame and age are kept instead of the new frame's
+        """
+        if thumb is None:
+            return
+        now = time.monotonic()
+        entry = {
+            'thumb': thumb,
+            'result': result,
+            'computed_at': now,
+            'landmarks': landmarks,
+            'landmarks_thumb': thumb,
+            'landmarks_at': now,
+        }
+        if reused_from is not None:
+            entry['landmarks_thumb'] = reused_from['landmarks_thumb']
+            entry['landmarks_at'] = reused_from['landmarks_at']
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                'sessions': len(self._entries),
+                'lookups': total,
+                'reused_result': self.counts[REUSE_RESULT],
+                'reused_landmarks': self.counts[REUSE_LANDMARKS],
+                'recomputed': self.counts[RECOMPUTE],
+                'hit_rate': round((total - self.counts[RECOMPUTE]) / total, 4) if total else 0.0,
+            }
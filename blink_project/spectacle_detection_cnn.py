@@ -3,6 +3,8 @@ CNN-based Spectacle Detection Module
 Uses advanced feature extraction to detect if a person is wearing spectacles
 """
 
+import threading
+
 import cv2
 import numpy as np
 
@@ -12,6 +14,31 @@ RIGHT_EYE = [362, 385, 387, 263, 373, 380]
 # Bridge of nose landmarks
 NOSE_BRIDGE = [168, 197]  # Medial canthi and nose bridge
 
+EYE_REGION_SIZE = (96, 48)  # (width, height) of the resized eye crops
+BRIDGE_REGION_SIZE = (60, 30)  # (width, height) of the resized nose-bridge crop
+
+# Confidence above which the heuristic features count as spectacles
+HEURISTIC_THRESHOLD = 0.40
+
+# Optional learned classifier over the crops (e.g. spectacle_onnx.OnnxSpectacleClassifier);
+# None uses the OpenCV heuristics below
+_backend = None
+
+# CLAHE objects keep internal buffers, so each thread gets its own, made once
+_local = threading.local()
+
+
+def _clahe():
+    clahe = getattr(_local, 'clahe', None)
+    if clahe is None:
+        clahe = _local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe
+
+
+def _gray(region):
+    """Grayscale view of a region; already-gray regions are returned as-is."""
+    return region if region.ndim == 2 else cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+
 
 class SpectacleDetectionCNN:
     """Advanced CNN for spectacle detection based on structural analysis"""
@@ -51,7 +78,7 @@ class SpectacleDetectionCNN:
                 return None, None
             
             # Resize to standard size
-            eye_region = cv2.resize(eye_region, (96, 48))
+            eye_region = cv2.resize(eye_region, EYE_REGION_SIZE)
             return eye_region, (x_min, y_min, x_max, y_max)
         
         except Exception as e:
@@ -91,7 +118,7 @@ class SpectacleDetectionCNN:
             if bridge_region.size == 0:
                 return None
             
-            bridge_region = cv2.resize(bridge_region, (60, 30))
+            bridge_region = cv2.resize(bridge_region, BRIDGE_REGION_SIZE)
             return bridge_region
         
         except Exception as e:
@@ -103,24 +130,21 @@ class SpectacleDetectionCNN:
         Detect spectacle frame structure using morphological operations
         
         Args:
-            eye_region: Cropped eye region
+            eye_region: Cropped eye region (BGR or grayscale)
         Returns:
             Float score for frame detection (0-1)
         """
         if eye_region is None:
             return 0.0
         
-        gray = cv2.cvtColor(eye_region, cv2.COLOR_BGR2GRAY)
-        
         # Apply CLAHE for better contrast
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
+        enhanced = _clahe().apply(_gray(eye_region))
         
         # Detect edges
         edges = cv2.Canny(enhanced, 30, 100)
         
-        # Detect contours
-        contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        # Detect contours (only their areas are used, so no hierarchy is needed)
+        contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
         
         # Count significant contours (frame edges)
         significant_contours = 0
@@ -139,17 +163,15 @@ class SpectacleDetectionCNN:
         Detect spectacle lens pattern and reflections
         
         Args:
-            eye_region: Cropped eye region
+            eye_region: Cropped eye region (BGR or grayscale)
         Returns:
             Float score for lens detection (0-1)
         """
         if eye_region is None:
             return 0.0
         
-        gray = cv2.cvtColor(eye_region, cv2.COLOR_BGR2GRAY)
-        
         # Apply histogram equalization
-        equalized = cv2.equalizeHist(gray)
+        equalized = cv2.equalizeHist(_gray(eye_region))
         
         # Detect bright reflections (typical in glasses)
         bright_threshold = 200
@@ -173,22 +195,23 @@ class SpectacleDetectionCNN:
         Detect spectacle frame symmetry (frames are typically symmetric)
         
         Args:
-            left_eye_region: Left eye region
-            right_eye_region: Right eye region
+            left_eye_region: Left eye region (BGR or grayscale)
+            right_eye_region: Right eye region (BGR or grayscale)
         Returns:
             Float score for symmetry (0-1)
         """
         if left_eye_region is None or right_eye_region is None:
             return 0.0
         
-        # Convert to grayscale
-        left_gray = cv2.cvtColor(left_eye_region, cv2.COLOR_BGR2GRAY)
-        right_gray = cv2.cvtColor(right_eye_region, cv2.COLOR_BGR2GRAY)
-        
         # Calculate histogram similarity
-        hist_left = cv2.calcHist([left_gray], [0], None, [256], [0, 256])
-        hist_right = cv2.calcHist([right_gray], [0], None, [256], [0, 256])
+        hist_left = cv2.calcHist([_gray(left_eye_region)], [0], None, [256], [0, 256])
+        hist_right = cv2.calcHist([_gray(right_eye_region)], [0], None, [256], [0, 256])
         
+        return SpectacleDetectionCNN._histogram_correlation(hist_left, hist_right)
+
+    @staticmethod
+    def _histogram_correlation(hist_left, hist_right):
+        """Correlation of two 256-bin float32 histograms after L2 normalization."""
         # Normalize histograms
         hist_left = cv2.normalize(hist_left, hist_left).flatten()
         hist_right = cv2.normalize(hist_right, hist_right).flatten()
@@ -204,17 +227,15 @@ class SpectacleDetectionCNN:
         Detect spectacle bridge structure on nose bridge
         
         Args:
-            bridge_region: Region around nose bridge
+            bridge_region: Region around nose bridge (BGR or grayscale)
         Returns:
             Float score for bridge detection (0-1)
         """
         if bridge_region is None:
             return 0.0
         
-        gray = cv2.cvtColor(bridge_region, cv2.COLOR_BGR2GRAY)
-        
         # Detect horizontal lines (spectacle bridge is typically horizontal)
-        edges = cv2.Canny(gray, 30, 100)
+        edges = cv2.Canny(_gray(bridge_region), 30, 100)
         
         # Detect lines
         lines = cv2.HoughLinesP(edges, 1, np.pi/180, 10, minLineLength=10, maxLineGap=5)
@@ -224,8 +245,8 @@ class SpectacleDetectionCNN:
         
         # Count horizontal lines (bridge)
         horizontal_lines = 0
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
+        # OpenCV 4 returns N x 1 x 4, OpenCV 5 N x 4
+        for x1, y1, x2, y2 in lines.reshape(-1, 4):
             # Check if line is horizontal (small y difference)
             if abs(y2 - y1) < 5:
                 horizontal_lines += 1
@@ -233,6 +254,163 @@ class SpectacleDetectionCNN:
         bridge_score = min(horizontal_lines / 3.0, 1.0)
         return bridge_score
     
+    @staticmethod
+    def extract_crops(frame, landmarks):
+        """
+        Cut the resized eye and nose-bridge crops every backend works on.
+
+        Returns:
+            (left_eye, right_eye, bridge) BGR crops, bridge possibly None,
+            or None if the eye regions cannot be cropped
+        """
+        left_eye_region, _ = SpectacleDetectionCNN.extract_eye_region(frame, landmarks, is_left=True)
+        right_eye_region, _ = SpectacleDetectionCNN.extract_eye_region(frame, landmarks, is_left=False)
+        if left_eye_region is None or right_eye_region is None:
+            return None
+        bridge_region = SpectacleDetectionCNN.extract_bridge_region(frame, landmarks)
+        return left_eye_region, right_eye_region, bridge_region
+
+    @staticmethod
+    def extract_features(left_eye_region, right_eye_region, bridge_region):
+        """
+        Compute all four heuristic feature scores, converting each region to
+        grayscale once and handling both eyes together where the feature allows it.
+
+        Args:
+            left_eye_region, right_eye_region, bridge_region: Crops from extract_crops()
+        Returns:
+            Dict with frame_score, lens_score, symmetry_score, bridge_score
+        """
+        # Both eye crops side by side: one colour conversion for the pair
+        width = EYE_REGION_SIZE[0]
+        eyes_gray = cv2.cvtColor(np.hstack((left_eye_region, right_eye_region)), cv2.COLOR_BGR2GRAY)
+        left_gray, right_gray = eyes_gray[:, :width], eyes_gray[:, width:]
+
+        # Feature 1: Frame structure (CLAHE and Canny work per crop)
+        frame_score = (
+            SpectacleDetectionCNN.detect_frame_structure(left_gray) +
+            SpectacleDetectionCNN.detect_frame_structure(right_gray)
+        ) / 2.0
+
+        # Feature 2: Lens pattern; equalization is per crop, the counting is stacked
+        equalized = np.stack((cv2.equalizeHist(left_gray), cv2.equalizeHist(right_gray)))
+        pixels = left_gray.size
+        bright_ratio = np.count_nonzero(equalized > 200, axis=(1, 2)) / pixels
+        dark_ratio = np.count_nonzero(equalized < 80, axis=(1, 2)) / pixels
+        lens_scores = np.minimum(bright_ratio * 0.4 + dark_ratio * 0.3, 1.0)
+        lens_score = (lens_scores[0] + lens_scores[1]) / 2.0
+
+        # Feature 3: Symmetry; both 256-bin histograms from one bincount
+        offsets = np.array([0, 256], dtype=np.intp)[:, None, None]
+        hists = np.bincount((np.stack((left_gray, right_gray)) + offsets).ravel(), minlength=512)
+        hists = hists.astype(np.float32).reshape(2, 256, 1)
+        symmetry_score = SpectacleDetectionCNN._histogram_correlation(hists[0], hists[1])
+
+        # Feature 4: Nose bridge
+        bridge_score = SpectacleDetectionCNN.detect_nose_bridge(bridge_region)
+
+        return {
+            'frame_score': frame_score,
+            'lens_score': lens_score,
+            'symmetry_score': symmetry_score,
+            'bridge_score': bridge_score,
+        }
+
+    @staticmethod
+    def heuristic_result(crops):
+        """Detection result from the OpenCV heuristics for one extract_crops() triple."""
+        features = SpectacleDetectionCNN.extract_features(*crops)
+        frame_score = features['frame_score']
+        lens_score = features['lens_score']
+        symmetry_score = features['symmetry_score']
+        bridge_score = features['bridge_score']
+
+        # Weighted combination of features
+        confidence = (
+            frame_score * 0.35 +      # Frame structure is most reliable
+            lens_score * 0.30 +       # Lens pattern detection
+            symmetry_score * 0.20 +   # Symmetric pattern
+            bridge_score * 0.15       # Bridge detection
+        )
+
+        return {
+            'detected': bool(confidence > HEURISTIC_THRESHOLD),
+            'confidence': float(confidence),
+            'frame_score': float(frame_score),
+            'lens_score': float(lens_score),
+            'symmetry_score': float(symmetry_score),
+            'bridge_score': float(bridge_score),
+            'backend': 'heuristic',
+        }
+
+    @staticmethod
+    def _empty_result():
+        """Result for a frame without usable eye crops; backend is None as nothing was scored."""
+        return {
+            'detected': False,
+            'confidence': 0.0,
+            'frame_score': 0.0,
+            'lens_score': 0.0,
+            'symmetry_score': 0.0,
+            'bridge_score': 0.0,
+            'backend': None,
+        }
+
+    @staticmethod
+    def detect_spectacles_batch(frames, landmarks_list):
+        """
+        Detect spectacles in several frames. With a learned backend set (see
+        set_backend) all frames are scored in one batched call; if that fails
+        the heuristics are used instead.
+
+        Args:
+            frames: Input frames (BGR)
+            landmarks_list: Face landmarks from MediaPipe FaceMesh, one per frame
+        Returns:
+            List of dicts with detection results, in frame order. Every
+            result has the same keys: detected, confidence, the four
+            *_score features and backend. A learned backend does not compute
+            the heuristic features, so its *_score values are None.
+        """
+        results = [SpectacleDetectionCNN._empty_result() for _ in frames]
+        crops, indices = [], []
+        for i, (frame, landmarks) in enumerate(zip(frames, landmarks_list)):
+            try:
+                frame_crops = SpectacleDetectionCNN.extract_crops(frame, landmarks)
+            except Exception as e:
+                print(f"Error in spectacle detection: {e}")
+                continue
+            if frame_crops is not None:
+                crops.append(frame_crops)
+                indices.append(i)
+        if not crops:
+            return results
+
+        backend = _backend
+        if backend is not None:
+            try:
+                probs = backend.predict(crops)
+                for i, prob in zip(indices, probs):
+                    results[i] = {
+                        'detected': bool(prob > backend.threshold),
+                        'confidence': float(prob),
+                        'frame_score': None,
+                        'lens_score': None,
+                        'symmetry_score': None,
+                        'bridge_score': None,
+                        'backend': backend.name,
+                    }
+                return results
+            except Exception as e:
+                print(f"Spectacle backend '{backend.name}' failed, using heuristics: {e}")
+
+        for i, frame_crops in zip(indices, crops):
+            try:
+                results[i] = SpectacleDetectionCNN.heuristic_result(frame_crops)
+            except Exception as e:
+                print(f"Error in spectacle detection: {e}")
+        return results
+
     @staticmethod
     def detect_spectacles(frame, landmarks):
         """
@@ -244,73 +422,21 @@ class SpectacleDetectionCNN:
         Returns:
             Dict with detection results
         """
-        try:
-            # Extract eye regions
-            left_eye_region, _ = SpectacleDetectionCNN.extract_eye_region(frame, landmarks, is_left=True)
-            right_eye_region, _ = SpectacleDetectionCNN.extract_eye_region(frame, landmarks, is_left=False)
-            
-            if left_eye_region is None or right_eye_region is None:
-                return {
-                    'detected': False,
-                    'confidence': 0.0,
-                    'frame_score': 0.0,
-                    'lens_score': 0.0,
-                    'symmetry_score': 0.0,
-                    'bridge_score': 0.0
-                }
-            
-            # Extract bridge region
-            bridge_region = SpectacleDetectionCNN.extract_bridge_region(frame, landmarks)
-            
-            # Feature 1: Frame structure detection
-            frame_score = (
-                SpectacleDetectionCNN.detect_frame_structure(left_eye_region) +
-                SpectacleDetectionCNN.detect_frame_structure(right_eye_region)
-            ) / 2.0
-            
-            # Feature 2: Lens pattern detection
-            lens_score = (
-                SpectacleDetectionCNN.detect_lens_pattern(left_eye_region) +
-                SpectacleDetectionCNN.detect_lens_pattern(right_eye_region)
-            ) / 2.0
-            
-            # Feature 3: Symmetry detection (frames are symmetric)
-            symmetry_score = SpectacleDetectionCNN.detect_symmetry(left_eye_region, right_eye_region)
-            
-            # Feature 4: Nose bridge detection
-            bridge_score = SpectacleDetectionCNN.detect_nose_bridge(bridge_region)
-            
-            # Weighted combination of features
-            confidence = (
-                frame_score * 0.35 +      # Frame structure is most reliable
-                lens_score * 0.30 +       # Lens pattern detection
-                symmetry_score * 0.20 +   # Symmetric pattern
-                bridge_score * 0.15       # Bridge detection
-            )
-            
-            # Lower threshold for better detection
-            SPECTACLE_THRESHOLD = 0.40
-            detected = confidence > SPECTACLE_THRESHOLD
-            
-            return {
-                'detected': detected,
-                'confidence': float(confidence),
-                'frame_score': float(frame_score),
-                'lens_score': float(lens_score),
-                'symmetry_score': float(symmetry_score),
-                'bridge_score': float(bridge_score)
-            }
-        
-        except Exception as e:
-            print(f"Error in spectacle detection: {e}")
-            return {
-                'detected': False,
-                'confidence': 0.0,
-                'frame_score': 0.0,
-                'lens_score': 0.0,
-                'symmetry_score': 0.0,
-                'bridge_score': 0.0
-            }
+        return SpectacleDetectionCNN.detect_spectacles_batch([frame], [landmarks])[0]
+
+
+def set_backend(backend):
+    """
+    Score crops with a learned classifier (anything with predict(crops),
+    threshold and name, e.g. spectacle_onnx.OnnxSpectacleClassifier), or
+    None for the OpenCV heuristics.
+    """
+    global _backend
+    _backend = backend
+
+
+def get_backend():
+    return _backend
 
 
 def detect_spectacles_in_frame(frame, landmarks):
@@ -325,4 +451,3 @@ def detect_spectacles_in_frame(frame, landmarks):
     """
     result = SpectacleDetectionCNN.detect_spectacles(frame, landmarks)
     return result
-
@@ -0,0 +1,134 @@
+"""
+ONNX backend for spectacle detection
+Scores the eye and nose-bridge crops cut by SpectacleDetectionCNN with a small
+ONNX classifier, for any number of frames in one onnxruntime call. Enable it
+with spectacle_detection_cnn.set_backend(); the OpenCV heuristics remain the
+fallback whenever the model is missing or fails.
+
+Model contract (float32, pixel values scaled to [0, 1], BGR channel order):
+    input 0 "eyes":   N x 6 x 48 x 96  left eye crop channels, then right eye crop
+    input 1 "bridge": N x 3 x 30 x 60  nose-bridge crop (zeros if it could not be cut)
+    output 0:         N or N x 1       probability that spectacles are worn
+"""
+
+import numpy as np
+
+from spectacle_detection_cnn import BRIDGE_REGION_SIZE, EYE_REGION_SIZE
+
+DEFAULT_THRESHOLD = 0.5
+
+
+def crops_to_blobs(crops):
+    """
+    Args:
+        crops: List of (left_eye, right_eye, bridge) BGR crops; bridge may be None
+
+    Returns:
+        (eyes, bridge) float32 arrays in the model's input layout
+    """
+    eye_w, eye_h = EYE_REGION_SIZE
+    bridge_w, bridge_h = BRIDGE_REGION_SIZE
+    n = len(crops)
+    eyes = np.empty((n, 2, eye_h, eye_w, 3), dtype=np.uint8)
+    bridge = np.zeros((n, bridge_h, bridge_w, 3), dtype=np.uint8)
+    for i, (left, right, bridge_crop) in enumerate(crops):
+        eyes[i, 0] = left
+        eyes[i, 1] = right
+        if bridge_crop is not None:
+            bridge[i] = bridge_crop
+
+    # N x 2 x H x W x C -> N x (2*C) x H x W
+    eyes = eyes.transpose(0, 1, 4, 2, 3).reshape(n, 6, eye_h, eye_w).astype(np.float32) / 255.0
+    bridge = bridge.transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+    return eyes, bridge
+
+
+class OnnxSpectacleClassifier:
+    """Batched spectacle classifier over eye/bridge crops (see the module docstring for the model contract)"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path, threshold=DEFAULT_THRESHOLD, intra_op_threads=1):
+        """
+        Args:
+            model_path: ONNX file following the contract above
+            threshold: Probability above which spectacles count as detected
+            intra_op_threads: ONNX Runtime threads; the crops are tiny, so one
+                thread per request thread avoids oversubscription
+
+        Raises:
+            ImportError if onnxruntime is not installed, or onnxruntime's error
+            if the model cannot be loaded
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        if len(self.input_names) != 2:
+            raise ValueError(f"{model_path}: expected 2 inputs (eyes, bridge), found {len(self.input_names)}")
+        self.model_path = model_path
+        self.threshold = threshold
+
+    def predict(self, crops):
+        """Spectacle probability for each (left_eye, right_eye, bridge) crop triple, in one call."""
+        if not crops:
+            return np.zeros(0, dtype=np.float32)
+        eyes, bridge = crops_to_blobs(crops)
+        probs = self.session.run(None, {self.input_names[0]: eyes, self.input_names[1]: bridge})[0]
+        return np.asarray(probs, dtype=np.float32).reshape(len(crops))
+
+
+def build_synthetic_model(path, seed=0):
+    """
+    Write a randomly initialised model with the contract's shapes: two small
+    conv branches, global pooling and a sigmoid. It predicts nothing useful;
+    it only lets bench_spectacle.py measure latency before a trained model exists.
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(seed)
+
+    def weight(name, *shape):
+        return numpy_helper.from_array((rng.standard_normal(shape) * 0.1).astype(np.float32), name)
+
+    eye_w, eye_h = EYE_REGION_SIZE
+    bridge_w, bridge_h = BRIDGE_REGION_SIZE
+    initializers = [
+        weight('eye_conv1_w', 16, 6, 3, 3), weight('eye_conv1_b', 16),
+        weight('eye_conv2_w', 32, 16, 3, 3), weight('eye_conv2_b', 32),
+        weight('bridge_conv_w', 16, 3, 3, 3), weight('bridge_conv_b', 16),
+        weight('fc_w', 48, 1), weight('fc_b', 1),
+    ]
+    strided = {'kernel_shape': [3, 3], 'strides': [2, 2], 'pads': [1, 1, 1, 1]}
+    nodes = [
+        helper.make_node('Conv', ['eyes', 'eye_conv1_w', 'eye_conv1_b'], ['e1'], **strided),
+        helper.make_node('Relu', ['e1'], ['e1r']),
+        helper.make_node('Conv', ['e1r', 'eye_conv2_w', 'eye_conv2_b'], ['e2'], **strided),
+        helper.make_node('Relu', ['e2'], ['e2r']),
+        helper.make_node('GlobalAveragePool', ['e2r'], ['e_pool']),
+        helper.make_node('Conv', ['bridge', 'bridge_conv_w', 'bridge_conv_b'], ['b1'], **strided),
+        helper.make_node('Relu', ['b1'], ['b1r']),
+        helper.make_node('GlobalAveragePool', ['b1r'], ['b_pool']),
+        helper.make_node('Concat', ['e_pool', 'b_pool'], ['features'], axis=1),
+        helper.make_node('Flatten', ['features'], ['flat']),
+        helper.make_node('MatMul', ['flat', 'fc_w'], ['logit_nb']),
+        helper.make_node('Add', ['logit_nb', 'fc_b'], ['logit']),
+        helper.make_node('Sigmoid', ['logit'], ['prob']),
+    ]
+    graph = helper.make_graph(
+        nodes, 'spectacle_classifier_synthetic',
+        inputs=[
+            helper.make_tensor_value_info('eyes', TensorProto.FLOAT, ['N', 6, eye_h, eye_w]),
+            helper.make_tensor_value_info('bridge', TensorProto.FLOAT, ['N', 3, bridge_h, bridge_w]),
+        ],
+        outputs=[helper.make_tensor_value_info('prob', TensorProto.FLOAT, ['N', 1])],
+        initializer=initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+    return path
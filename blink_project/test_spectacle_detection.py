@@ -2,6 +2,8 @@
 Test script for improved spectacle detection CNN
 """
 
+import time
+
 import cv2
 import numpy as np
 import mediapipe as mp
@@ -13,9 +15,10 @@ FaceLandmarker = mp.tasks.vision.FaceLandmarker
 FaceLandmarkerOptions = mp.tasks.vision.FaceLandmarkerOptions
 VisionRunningMode = mp.tasks.vision.RunningMode
 
+# VIDEO mode: the face is tracked between camera frames instead of re-detected
 options = FaceLandmarkerOptions(
     base_options=BaseOptions(model_asset_path='face_landmarker.task'),
-    running_mode=VisionRunningMode.IMAGE,
+    running_mode=VisionRunningMode.VIDEO,
     num_faces=1
 )
 
@@ -36,6 +39,7 @@ def test_spectacle_detection_on_camera():
     print("3. With glasses: Detection should show HIGH scores")
     print("4. Press 'q' to quit\n")
     
+    last_timestamp_ms = 0
     while True:
         ret, frame = cap.read()
         if not ret:
@@ -49,7 +53,9 @@ def test_spectacle_detection_on_camera():
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
         
         # Detect face landmarks
-        results = face_landmarker.detect(mp_image)
+        timestamp_ms = max(int(time.monotonic() * 1000), last_timestamp_ms + 1)
+        last_timestamp_ms = timestamp_ms
+        results = face_landmarker.detect_for_video(mp_image, timestamp_ms)
         
         if not results.face_landmarks:
             cv2.putText(frame, "No face detected", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
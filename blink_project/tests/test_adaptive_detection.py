@@ -0,0 +1,87 @@
+"""
+Adaptive SCRFD input size: a small face found at 320 must not be thrown away
+when the 640 pass finds nothing (server.detect_faces and
+FaceEmbedder._analyze share the loop).
+"""
+
+import importlib
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pytest
+
+BLINK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FACE_APP_DIR = os.path.join(BLINK_DIR, "face_recognition_app")
+
+# A 30 px face in a 640 px frame: 15 detector px at 320, under the 40 px minimum
+SMALL_FACE = np.array([[300.0, 200.0, 330.0, 230.0, 0.9]], dtype=np.float32)
+SMALL_KPS = np.zeros((1, 5, 2), dtype=np.float32)
+NO_FACES = (np.zeros((0, 5), dtype=np.float32), np.zeros((0, 5, 2), dtype=np.float32))
+
+
+def fake_detect(frame, input_size, max_num=0, metric='default'):
+    """Finds the small face at 320 and nothing at 640."""
+    if tuple(input_size)[0] == 320:
+        return SMALL_FACE, SMALL_KPS
+    return NO_FACES
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # server.py creates its data directories relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BLINK_DEFER_MODEL_LOAD', '1')
+    monkeypatch.syspath_prepend(BLINK_DIR)
+    module = importlib.import_module('server')
+    monkeypatch.setattr(module, 'FACE_DET_SIZES', [320, 640])
+    monkeypatch.setattr(module, 'FACE_DET_MIN_FACE_PX', 40.0)
+    return module
+
+
+def test_detect_faces_keeps_small_face_when_larger_size_finds_none(server, monkeypatch):
+    det_model = mock.Mock()
+    det_model.detect.side_effect = fake_detect
+    monkeypatch.setattr(server, 'face_app', SimpleNamespace(det_model=det_model))
+
+    bboxes, kpss, det_size = server.detect_faces(np.zeros((480, 640, 3), dtype=np.uint8))
+
+    assert det_model.detect.call_count == 2
+    assert det_size == 320
+    np.testing.assert_array_equal(bboxes, SMALL_FACE)
+    np.testing.assert_array_equal(kpss, SMALL_KPS)
+
+
+def test_detect_faces_returns_empty_when_no_size_finds_a_face(server, monkeypatch):
+    det_model = mock.Mock()
+    det_model.detect.return_value = NO_FACES
+    monkeypatch.setattr(server, 'face_app', SimpleNamespace(det_model=det_model))
+
+    bboxes, _, det_size = server.detect_faces(np.zeros((480, 640, 3), dtype=np.uint8))
+
+    assert bboxes.shape[0] == 0
+    assert det_size == 640
+
+
+def test_face_embedder_keeps_small_face_when_larger_size_finds_none(tmp_path, monkeypatch):
+    pytest.importorskip("insightface")
+    monkeypatch.syspath_prepend(FACE_APP_DIR)
+    # get_logger creates the data directories; keep them out of the source tree
+    config = importlib.import_module('config')
+    for name in ('LOG_DIR', 'ALERTS_DIR', 'MODELS_DIR'):
+        monkeypatch.setattr(config, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(config, 'DB_PATH', str(tmp_path / 'faces.db'))
+    face_embedder = importlib.import_module('face_embedder')
+
+    det_model = mock.Mock()
+    det_model.detect.side_effect = fake_detect
+    embedder = face_embedder.FaceEmbedder.__new__(face_embedder.FaceEmbedder)
+    embedder._app = SimpleNamespace(det_model=det_model, models={'detection': det_model})
+    embedder._det_sizes = [(320, 320), (640, 640)]
+
+    faces, det_size = embedder._analyze(np.zeros((480, 640, 3), dtype=np.uint8))
+
+    assert det_size == (320, 320)
+    assert len(faces) == 1
+    np.testing.assert_array_equal(faces[0].bbox, SMALL_FACE[0, :4])
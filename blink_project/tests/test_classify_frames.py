@@ -0,0 +1,112 @@
+"""
+classify_frames with fake landmarkers: frames are (ear, num_faces) pairs,
+the IMAGE-mode pool reports every face, the VIDEO-mode one at most one.
+"""
+
+import importlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+BLINK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPEN_EAR, CLOSED_EAR = 0.30, 0.10
+
+
+def face_with_ear(sc, ear):
+    """478 landmarks whose two eyes both have the given eye aspect ratio."""
+    landmarks = [SimpleNamespace(x=0.5, y=0.5) for _ in range(478)]
+    contour = [(0.0, 0.0), (0.3, -ear), (0.6, -ear), (0.9, 0.0), (0.6, ear), (0.3, ear)]
+    for indices in (sc.LEFT_EYE_INDICES, sc.RIGHT_EYE_INDICES):
+        for i, (x, y) in zip(indices, contour):
+            landmarks[i] = SimpleNamespace(x=x, y=y)
+    return landmarks
+
+
+@pytest.fixture
+def sc(monkeypatch):
+    monkeypatch.syspath_prepend(BLINK_DIR)
+    module = importlib.import_module('server_classification')
+    module.calls = {'image': 0, 'video': 0}
+
+    def image_detect(frame):
+        module.calls['image'] += 1
+        ear, num_faces = frame
+        return SimpleNamespace(face_landmarks=[face_with_ear(module, ear)] * num_faces)
+
+    class FakeVideoLandmarker:
+        def detect_for_video(self, frame, timestamp_ms):
+            module.calls['video'] += 1
+            ear, num_faces = frame
+            return SimpleNamespace(face_landmarks=[face_with_ear(module, ear)] * min(num_faces, 1))
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(module, 'landmark_image', lambda frame, max_side=None: frame)
+    monkeypatch.setattr(module.LANDMARKERS, 'detect', image_detect)
+    monkeypatch.setattr(module, 'create_face_landmarker', lambda video=False: FakeVideoLandmarker())
+    monkeypatch.setattr(module, 'VIDEO_LANDMARKERS', module.VideoLandmarkerPool())
+    return module
+
+
+def test_single_face_blink_passes(sc):
+    frames = [(OPEN_EAR, 1)] * 20
+    frames[2] = (CLOSED_EAR, 1)
+
+    result = sc.classify_frames(frames)
+
+    assert not result['multiple_faces']
+    assert result['blinked'][0]['frame_idx'] == 2
+    assert sc.calls['video'] > 0
+
+
+def test_second_face_mid_sequence_rejects_despite_early_blink(sc):
+    # Blink in the first frames, then a second person joins from frame 8 on
+    frames = [(OPEN_EAR, 1)] * 8 + [(OPEN_EAR, 2)] * 12
+    frames[2] = (CLOSED_EAR, 1)
+
+    result = sc.classify_frames(frames)
+
+    assert result['multiple_faces']
+    assert result['blinked'] == []
+
+
+def test_decisive_frames_get_an_image_mode_face_count(sc):
+    # Only the blink frame shows a second face; it is not on the check interval
+    frames = [(OPEN_EAR, 1)] * 3
+    frames[2] = (CLOSED_EAR, 2)
+
+    result = sc.classify_frames(frames)
+
+    assert result['multi_face_count'] == 1
+    assert result['blinked'] == []
+
+
+def test_early_stop_only_once_result_is_certain(sc):
+    frames = [(OPEN_EAR, 1), (CLOSED_EAR, 1)] + [(OPEN_EAR, 1)] * 2
+    result = sc.classify_frames(frames)
+    # Two frames in, the two remaining ones could still be multi-face frames
+    assert sc.calls['image'] + sc.calls['video'] >= 4
+    assert len(result['blinked']) == 1
+
+
+def test_stride_must_be_positive(sc):
+    with pytest.raises(ValueError):
+        sc.classify_frames([(OPEN_EAR, 1)], stride=0)
+
+
+def test_tracker_decided_bounds_remaining_frames(sc):
+    tracker = sc.BlinkTracker()
+    tracker.add(0, None, {'num_faces': 1, 'ear': OPEN_EAR})
+    tracker.add(1, None, {'num_faces': 1, 'ear': CLOSED_EAR})
+    assert tracker.blink_detected
+    assert not tracker.decided(None)
+    assert not tracker.decided(1)
+    assert tracker.decided(0)
+    for i in range(2, 12):
+        tracker.add(i, None, {'num_faces': 1, 'ear': OPEN_EAR})
+    # 12 checked single-face frames: 3 more multi-face frames stay under 30%
+    assert tracker.decided(3)
+    assert not tracker.decided(6)